@@ -0,0 +1,39 @@
+"""Create refresh_tokens table as UNLOGGED
+
+Refresh tokens are short-lived and can be re-issued by logging in again, so
+on PostgreSQL the table skips the WAL. Its contents are truncated after a
+crash, which signs every user out.
+
+Revision ID: 002
+Revises: 001
+Create Date: 2024-01-02 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '002'
+down_revision = '001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    unlogged = op.get_context().dialect.name == 'postgresql'
+    op.create_table('refresh_tokens',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('token', sa.String(length=255), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('is_revoked', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.Index('ix_refresh_tokens_token', 'token', unique=True),
+        prefixes=['UNLOGGED'] if unlogged else []
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('refresh_tokens')
@@ -0,0 +1,32 @@
+"""Add denormalized reply_count to posts
+
+Counts live (not soft-deleted) replies so the reply count of a post is a
+primary-key lookup instead of an aggregate over its replies.
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-01-03 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('reply_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.execute(
+        "UPDATE posts SET reply_count = ("
+        "SELECT COUNT(*) FROM replies "
+        "WHERE replies.post_id = posts.id AND replies.deleted_at IS NULL"
+        ")"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'reply_count')
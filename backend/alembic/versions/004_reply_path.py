@@ -0,0 +1,40 @@
+"""Add materialized path to replies
+
+Each reply stores the ids of its ancestors, root first ("/1/4/"), so
+subtree, ancestor and depth lookups no longer walk the tree row by row.
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-01-04 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('replies', sa.Column('path', sa.String(length=255), server_default='/', nullable=False))
+    op.execute(
+        "WITH RECURSIVE tree (id, path) AS ("
+        "SELECT id, CAST('/' AS VARCHAR(255)) FROM replies WHERE parent_id IS NULL "
+        "UNION ALL "
+        "SELECT replies.id, CAST(tree.path || CAST(tree.id AS VARCHAR(20)) || '/' AS VARCHAR(255)) "
+        "FROM replies JOIN tree ON replies.parent_id = tree.id"
+        ") "
+        "UPDATE replies SET path = (SELECT tree.path FROM tree WHERE tree.id = replies.id)"
+    )
+    op.create_index(
+        'ix_replies_path', 'replies', ['path'],
+        postgresql_ops={'path': 'text_pattern_ops'}
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_replies_path', table_name='replies')
+    op.drop_column('replies', 'path')
@@ -0,0 +1,47 @@
+"""Add denormalized vote counts to posts and replies
+
+upvote_count/downvote_count are kept in step by the vote write paths so
+vote totals and rankings read columns instead of aggregating votes.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-01-05 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def _backfill(table: str, target_column: str) -> None:
+    # Rows without votes keep the server default of 0
+    op.execute(
+        f"UPDATE {table} SET "
+        "upvote_count = agg.upvotes, downvote_count = agg.downvotes "
+        "FROM ("
+        f"SELECT {target_column} AS target_id, "
+        "COUNT(*) FILTER (WHERE vote_type = 'upvote') AS upvotes, "
+        "COUNT(*) FILTER (WHERE vote_type = 'downvote') AS downvotes "
+        f"FROM votes WHERE {target_column} IS NOT NULL GROUP BY {target_column}"
+        ") AS agg "
+        f"WHERE {table}.id = agg.target_id"
+    )
+
+
+def upgrade() -> None:
+    for table in ('posts', 'replies'):
+        op.add_column(table, sa.Column('upvote_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+        op.add_column(table, sa.Column('downvote_count', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    _backfill('posts', 'post_id')
+    _backfill('replies', 'reply_id')
+
+
+def downgrade() -> None:
+    for table in ('replies', 'posts'):
+        op.drop_column(table, 'downvote_count')
+        op.drop_column(table, 'upvote_count')
@@ -0,0 +1,29 @@
+"""Maintain post and reply vote counts with a trigger on votes
+
+Moves upkeep of upvote_count/downvote_count into the database so every
+write to votes (ORM, bulk statements, FK cascades) keeps them current.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2024-01-06 00:00:00.000000
+
+"""
+from alembic import op
+from app.models.models import VOTE_COUNT_FUNCTION, VOTE_COUNT_TRIGGER
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Same DDL that create_all runs, so the two cannot drift
+    op.execute(VOTE_COUNT_FUNCTION)
+    op.execute(VOTE_COUNT_TRIGGER)
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS votes_count ON votes")
+    op.execute("DROP FUNCTION IF EXISTS vote_count_trigger()")
@@ -0,0 +1,41 @@
+"""Add one-vote-per-user unique constraints on votes
+
+create_vote upserts with ON CONFLICT (user_id, post_id) / (user_id,
+reply_id), which PostgreSQL only accepts against a matching unique
+constraint. Duplicate votes are removed first, keeping the latest one.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2024-01-07 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+# Constraint name -> target column
+_CONSTRAINTS = {
+    'unique_user_post_vote': 'post_id',
+    'unique_user_reply_vote': 'reply_id',
+}
+
+
+def upgrade() -> None:
+    for name, target_column in _CONSTRAINTS.items():
+        # The vote count trigger takes the deleted duplicates off the totals
+        op.execute(
+            "DELETE FROM votes AS older USING votes AS newer "
+            "WHERE older.user_id = newer.user_id "
+            f"AND older.{target_column} = newer.{target_column} "
+            "AND older.id < newer.id"
+        )
+        op.create_unique_constraint(name, 'votes', ['user_id', target_column])
+
+
+def downgrade() -> None:
+    for name in reversed(list(_CONSTRAINTS)):
+        op.drop_constraint(name, 'votes', type_='unique')
@@ -0,0 +1,89 @@
+"""Replace single-column indexes with the composite and partial ones the queries use
+
+Keyset pages, conversation and unread lookups, vote breakdowns, user
+histories, moderation listings and full-text search each read one index
+in order. The single-column indexes those replace are dropped. On
+PostgreSQL the indexes are built CONCURRENTLY, so writes are not blocked.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2024-01-08 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+LIVE = sa.text('deleted_at IS NULL')
+
+# (name, table, columns, options) added by this revision
+NEW_INDEXES = [
+    ('ix_users_banned', 'users', ['id'], {'postgresql_where': sa.text('is_active = false')}),
+    ('ix_posts_channel_created', 'posts', ['channel_id', sa.text('created_at DESC'), sa.text('id DESC')], {}),
+    ('ix_replies_post_created', 'replies', ['post_id', 'created_at', 'id'], {'postgresql_where': LIVE}),
+    ('ix_replies_parent_created', 'replies', ['parent_id', 'created_at', 'id'], {'postgresql_where': LIVE}),
+    ('ix_replies_author_created', 'replies', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], {}),
+    ('ix_replies_recent', 'replies', [sa.text('created_at DESC'), sa.text('id DESC')], {'postgresql_where': LIVE}),
+    ('ix_votes_post_type', 'votes', ['post_id', 'vote_type', 'created_at'], {}),
+    ('ix_votes_reply_type', 'votes', ['reply_id', 'vote_type', 'created_at'], {}),
+    ('ix_votes_user_created', 'votes', ['user_id', sa.text('created_at DESC'), sa.text('id DESC')], {}),
+    ('ix_messages_conv_sr', 'messages', ['sender_id', 'recipient_id', 'created_at'], {'postgresql_where': LIVE}),
+    ('ix_messages_conv_rs', 'messages', ['recipient_id', 'sender_id', 'created_at'], {'postgresql_where': LIVE}),
+    ('ix_messages_unread', 'messages', ['recipient_id', 'sender_id'],
+     {'postgresql_where': sa.text('read_at IS NULL AND deleted_at IS NULL')}),
+    ('ix_moderation_actions_target', 'moderation_actions',
+     ['target_type', 'target_id', sa.text('created_at DESC')], {}),
+    ('ix_moderation_actions_type_created', 'moderation_actions',
+     ['action_type', sa.text('created_at DESC')], {}),
+]
+
+# GIN expression indexes for full-text search (PostgreSQL only)
+FTS_INDEXES = [
+    ('ix_replies_content_fts', 'replies'),
+    ('ix_messages_content_fts', 'messages'),
+]
+
+# Single-column indexes from 001 that a new index above leads with
+OLD_INDEXES = [
+    ('ix_posts_channel_id', 'posts', ['channel_id']),
+    ('ix_votes_post_id', 'votes', ['post_id']),
+    ('ix_votes_reply_id', 'votes', ['reply_id']),
+    ('ix_messages_recipient_id', 'messages', ['recipient_id']),
+    ('ix_messages_sender_id', 'messages', ['sender_id']),
+    ('ix_moderation_actions_target_type', 'moderation_actions', ['target_type']),
+]
+
+
+def upgrade() -> None:
+    postgresql = op.get_context().dialect.name == 'postgresql'
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in NEW_INDEXES:
+            op.create_index(
+                name, table, columns, if_not_exists=True, postgresql_concurrently=True, **options
+            )
+        if postgresql:
+            for name, table in FTS_INDEXES:
+                op.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} "
+                    "USING GIN (to_tsvector('simple', content)) WHERE deleted_at IS NULL"
+                )
+        for name, table, _ in OLD_INDEXES:
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    postgresql = op.get_context().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        for name, table, columns in OLD_INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+        if postgresql:
+            for name, _ in FTS_INDEXES:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        for name, table, _, _ in reversed(NEW_INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
@@ -0,0 +1,32 @@
+"""Create revoked_tokens table for logged-out access tokens
+
+Logout records the access token's jti here so every worker refuses it
+until it expires; a per-process blacklist only covered the worker that
+handled the logout.
+
+Revision ID: 009
+Revises: 008
+Create Date: 2024-01-09 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('revoked_tokens',
+        sa.Column('jti', sa.String(length=32), nullable=False),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('jti'),
+        sa.Index('ix_revoked_tokens_expires_at', 'expires_at')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('revoked_tokens')
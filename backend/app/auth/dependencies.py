@@ -7,7 +7,7 @@ from backend.app.utils.auth import verify_token
 
 security = HTTPBearer()
 
-async def get_current_user(
+def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> User:
@@ -15,7 +15,7 @@ async def get_current_user(
     token = credentials.credentials
     
     # Verify token
-    payload = verify_token(token, "access")
+    payload = verify_token(token, "access", db)
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,16 +1,78 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy import or_, and_, bindparam, inspect, select, update
 from datetime import datetime, timedelta
-from typing import Optional, Union
-from app.models.models import User, RefreshToken
+from typing import List, Optional, Union
+from app.models.models import User, RefreshToken, RevokedToken
 from app.schemas.auth import UserRegister, UserUpdate
-from app.utils.auth import get_password_hash, verify_password, generate_verification_token
+from app.utils.auth import get_hasher_pool, get_password_hash, hash_password, verify_password, generate_verification_token
+from app.utils.cache import TTLCache
 import secrets
 
+# Per-process cache of user rows for hot read paths (login, token refresh).
+# Entries are column snapshots keyed by ("id" | "username" | "email", value).
+user_cache = TTLCache(maxsize=10_000, ttl=30)
+# Per-process cache of user_id -> is_superuser for moderation permission checks
+moderator_cache = TTLCache(maxsize=4096, ttl=60)
+# Per-process cache of user_id -> validated UserResponse fields for active
+# users, so authenticated requests skip Pydantic validation
+current_user_cache = TTLCache(maxsize=10_000, ttl=30)
+
+# Built once at import: revoking a session only binds the two ids, skipping
+# per-request statement construction and cache-key generation
+_revoke_session_stmt = (
+    update(RefreshToken)
+    .where(
+        RefreshToken.id == bindparam("sid"),
+        RefreshToken.user_id == bindparam("uid")
+    )
+    .values(is_revoked=True)
+    .execution_options(synchronize_session=False)
+)
+
+# Built once at import; write paths re-read is_active on every request
+_user_active_stmt = select(User.is_active).where(User.id == bindparam("uid"))
+
+# Left out of snapshots: only login reads it, and login always goes to the database
+_UNCACHED_COLUMNS = {"password_hash"}
+
+def cache_user(user: User) -> None:
+    """Store a snapshot of a user's columns under its id, username and email"""
+    snapshot = {
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(User).column_attrs if attr.key not in _UNCACHED_COLUMNS
+    }
+    for key in (("id", user.id), ("username", user.username), ("email", user.email)):
+        user_cache.set(key, snapshot)
+
+def invalidate_user_cache(user: User) -> None:
+    """Drop every cached entry for a user; call after any change to the row"""
+    for key in (("id", user.id), ("username", user.username), ("email", user.email)):
+        user_cache.pop(key, None)
+    moderator_cache.pop(user.id, None)
+    current_user_cache.pop(user.id, None)
+
+def invalidate_user_id(user_id: int) -> None:
+    """Drop cached entries for a user id, including the keys of its cached snapshot"""
+    moderator_cache.pop(user_id, None)
+    current_user_cache.pop(user_id, None)
+    snapshot = user_cache.pop(("id", user_id), None)
+    if snapshot is not None:
+        user_cache.pop(("username", snapshot["username"]), None)
+        user_cache.pop(("email", snapshot["email"]), None)
+
+def get_cached_user(db: Session, key: tuple) -> Optional[User]:
+    """Attach a cached snapshot to the session without emitting a SELECT"""
+    snapshot = user_cache.get(key)
+    if snapshot is None:
+        return None
+    user = User(**snapshot)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
 class UserCRUD:
     def create_user(self, db: Session, user_data: UserRegister) -> User:
         """Create a new user with hashed password"""
-        hashed_password = get_password_hash(user_data.password)
+        hashed_password = hash_password(user_data.password)
         
         db_user = User(
             username=user_data.username,
@@ -23,12 +85,40 @@ class UserCRUD:
         
         db.add(db_user)
         db.commit()
-        db.refresh(db_user)
         return db_user
     
+    def bulk_create_users(self, db: Session, users: List[UserRegister]) -> int:
+        """Create many users with one INSERT batch, hashing passwords in parallel"""
+        hashed_passwords = get_hasher_pool().map(
+            get_password_hash, [user_data.password for user_data in users]
+        )
+        
+        db.bulk_insert_mappings(User, [
+            {
+                "username": user_data.username,
+                "email": user_data.email,
+                "password_hash": hashed_password,
+                "is_active": True,
+                "is_verified": False,
+                "is_superuser": False
+            }
+            for user_data, hashed_password in zip(users, hashed_passwords)
+        ])
+        db.commit()
+        return len(users)
+    
     def get_user_by_id(self, db: Session, user_id: int) -> Optional[User]:
         """Get user by ID"""
-        return db.query(User).filter(User.id == user_id).first()
+        user = get_cached_user(db, ("id", user_id))
+        if user is None:
+            user = self._get_user_for_update(db, user_id)
+            if user:
+                cache_user(user)
+        return user
+    
+    def is_user_active(self, db: Session, user_id: int) -> bool:
+        """Whether a user exists and is active, read from the database, never the cache"""
+        return bool(db.execute(_user_active_stmt, {"uid": user_id}).scalar())
     
     def get_user_by_username(self, db: Session, username: str) -> Optional[User]:
         """Get user by username"""
@@ -40,102 +130,141 @@ class UserCRUD:
     
     def get_user_by_username_or_email(self, db: Session, identifier: str) -> Optional[User]:
         """Get user by username or email"""
-        return db.query(User).filter(
-            or_(User.username == identifier, User.email == identifier)
-        ).first()
+        user = (
+            get_cached_user(db, ("username", identifier))
+            or get_cached_user(db, ("email", identifier))
+        )
+        if user is None:
+            user = db.query(User).filter(
+                or_(User.username == identifier, User.email == identifier)
+            ).first()
+            if user:
+                cache_user(user)
+        return user
+    
+    def _get_user_for_update(self, db: Session, user_id: int) -> Optional[User]:
+        """Get user by ID straight from the database (writes never start from the cache)"""
+        return db.query(User).populate_existing().filter(User.id == user_id).first()
     
     def authenticate_user(self, db: Session, username: str, password: str) -> Optional[User]:
-        """Authenticate user with username/email and password"""
-        user = self.get_user_by_username_or_email(db, username)
+        """
+        Authenticate user with username/email and password. The row is read
+        from the database, never a snapshot, so a password change or
+        deactivation on another worker applies at once.
+        """
+        user = db.query(User).filter(
+            or_(User.username == username, User.email == username)
+        ).first()
         if not user:
             return None
         if not verify_password(password, user.password_hash):
             return None
         if not user.is_active:
             return None
+        cache_user(user)
         return user
     
     def update_user(self, db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
-        """Update user information"""
-        user = self.get_user_by_id(db, user_id)
-        if not user:
-            return None
-        
+        """Update user information with a single UPDATE ... RETURNING"""
+        invalidate_user_id(user_id)
         update_data = user_update.dict(exclude_unset=True)
-        for field, value in update_data.items():
-            setattr(user, field, value)
-        
-        user.updated_at = datetime.utcnow()
+        user = db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(**update_data, updated_at=datetime.utcnow())
+            .returning(User)
+            .execution_options(populate_existing=True)
+        ).scalar_one_or_none()
         db.commit()
-        db.refresh(user)
+        
+        if user:
+            invalidate_user_cache(user)
         return user
     
     def update_last_login(self, db: Session, user_id: int) -> Optional[User]:
         """Update user's last login timestamp"""
-        user = self.get_user_by_id(db, user_id)
+        user = self._get_user_for_update(db, user_id)
         if user:
+            invalidate_user_cache(user)
             user.last_login = datetime.utcnow()
             db.commit()
-            db.refresh(user)
         return user
     
     def change_password(self, db: Session, user_id: int, current_password: str, new_password: str) -> tuple[bool, str]:
         """Change user password after verifying current password"""
-        user = self.get_user_by_id(db, user_id)
+        user = self._get_user_for_update(db, user_id)
         if not user:
             return False, "User not found"
         
         if not verify_password(current_password, user.password_hash):
             return False, "Current password is incorrect"
         
-        user.password_hash = get_password_hash(new_password)
+        hashed_password = hash_password(new_password)
+        invalidate_user_cache(user)
+        user.password_hash = hashed_password
         user.updated_at = datetime.utcnow()
         db.commit()
         return True, "Password changed successfully"
     
     def reset_password(self, db: Session, user_id: int, new_password: str) -> Optional[User]:
         """Reset user password (for password reset flow)"""
-        user = self.get_user_by_id(db, user_id)
+        user = self._get_user_for_update(db, user_id)
         if user:
-            user.password_hash = get_password_hash(new_password)
+            hashed_password = hash_password(new_password)
+            invalidate_user_cache(user)
+            user.password_hash = hashed_password
             user.updated_at = datetime.utcnow()
             db.commit()
-            db.refresh(user)
         return user
     
     def deactivate_user(self, db: Session, user_id: int) -> Optional[User]:
         """Deactivate user account"""
-        user = self.get_user_by_id(db, user_id)
+        user = self._get_user_for_update(db, user_id)
         if user:
+            invalidate_user_cache(user)
             user.is_active = False
             user.updated_at = datetime.utcnow()
             db.commit()
-            db.refresh(user)
         return user
     
     def verify_user(self, db: Session, user_id: int) -> Optional[User]:
         """Mark user as verified"""
-        user = self.get_user_by_id(db, user_id)
+        user = self._get_user_for_update(db, user_id)
         if user:
+            invalidate_user_cache(user)
             user.is_verified = True
             user.updated_at = datetime.utcnow()
             db.commit()
-            db.refresh(user)
         return user
     
     def check_username_exists(self, db: Session, username: str, exclude_user_id: Optional[int] = None) -> bool:
         """Check if username already exists"""
-        query = db.query(User).filter(User.username == username)
+        query = db.query(User.id).filter(User.username == username)
         if exclude_user_id:
             query = query.filter(User.id != exclude_user_id)
-        return query.first() is not None
+        return db.query(query.exists()).scalar()
     
     def check_email_exists(self, db: Session, email: str, exclude_user_id: Optional[int] = None) -> bool:
         """Check if email already exists"""
-        query = db.query(User).filter(User.email == email)
+        query = db.query(User.id).filter(User.email == email)
+        if exclude_user_id:
+            query = query.filter(User.id != exclude_user_id)
+        return db.query(query.exists()).scalar()
+
+    def check_conflicts(self, db: Session, username: str, email: str, exclude_user_id: Optional[int] = None) -> dict:
+        """Check which of username and email are already taken, in a single query"""
+        query = db.query(User.username, User.email).filter(
+            or_(User.username == username, User.email == email)
+        )
         if exclude_user_id:
             query = query.filter(User.id != exclude_user_id)
-        return query.first() is not None
+        
+        # At most one row can match each unique column
+        rows = query.limit(2).all()
+        return {
+            "username": any(row.username == username for row in rows),
+            "email": any(row.email == email for row in rows)
+        }
 
 class RefreshTokenCRUD:
     def create_refresh_token(self, db: Session, user_id: int, token: str, expires_at: datetime) -> RefreshToken:
@@ -149,7 +278,6 @@ class RefreshTokenCRUD:
         
         db.add(db_token)
         db.commit()
-        db.refresh(db_token)
         return db_token
     
     def get_refresh_token(self, db: Session, token: str) -> Optional[RefreshToken]:
@@ -162,6 +290,17 @@ class RefreshTokenCRUD:
             )
         ).first()
     
+    def get_refresh_token_user_id(self, db: Session, token: str) -> Optional[int]:
+        """Owner of an active refresh token, read from the token index alone
+        without loading the row"""
+        return db.query(RefreshToken.user_id).filter(
+            and_(
+                RefreshToken.token == token,
+                RefreshToken.is_revoked == False,
+                RefreshToken.expires_at > datetime.utcnow()
+            )
+        ).scalar()
+    
     def revoke_refresh_token(self, db: Session, token: str) -> bool:
         """Revoke a refresh token"""
         db_token = db.query(RefreshToken).filter(RefreshToken.token == token).first()
@@ -171,6 +310,14 @@ class RefreshTokenCRUD:
             return True
         return False
     
+    def revoke_user_session(self, db: Session, user_id: int, session_id: int) -> bool:
+        """Revoke one of a user's refresh tokens by id; False if it is not theirs"""
+        revoked = db.execute(
+            _revoke_session_stmt, {"sid": session_id, "uid": user_id}
+        ).rowcount
+        db.commit()
+        return bool(revoked)
+    
     def revoke_user_tokens(self, db: Session, user_id: int) -> int:
         """Revoke all refresh tokens for a user"""
         result = db.query(RefreshToken).filter(
@@ -182,13 +329,32 @@ class RefreshTokenCRUD:
         db.commit()
         return result
     
-    def cleanup_expired_tokens(self, db: Session) -> int:
-        """Remove expired refresh tokens"""
-        result = db.query(RefreshToken).filter(
-            RefreshToken.expires_at < datetime.utcnow()
-        ).delete()
+    def cleanup_expired_tokens(self, db: Session, batch_size: int = 5000) -> int:
+        """
+        Remove expired refresh tokens in short batched transactions, and
+        revoked access token ids that could no longer be used anyway.
+        Returns the number of refresh tokens removed.
+        """
+        cutoff = datetime.utcnow()
+        removed = 0
+        while True:
+            expired_ids = [
+                token_id for (token_id,) in db.query(RefreshToken.id).filter(
+                    RefreshToken.expires_at < cutoff
+                ).limit(batch_size).all()
+            ]
+            if not expired_ids:
+                break
+            removed += db.query(RefreshToken).filter(
+                RefreshToken.id.in_(expired_ids)
+            ).delete(synchronize_session=False)
+            db.commit()
+        
+        db.query(RevokedToken).filter(
+            RevokedToken.expires_at < cutoff
+        ).delete(synchronize_session=False)
         db.commit()
-        return result
+        return removed
     
     def get_user_active_tokens(self, db: Session, user_id: int) -> list[RefreshToken]:
         """Get all active refresh tokens for a user"""
@@ -200,24 +366,56 @@ class RefreshTokenCRUD:
             )
         ).all()
     
+    def get_user_sessions(self, db: Session, user_id: int) -> list[dict]:
+        """Active sessions of a user, newest first, as plain dicts of the
+        columns the session list shows"""
+        rows = db.query(
+            RefreshToken.id, RefreshToken.created_at, RefreshToken.expires_at
+        ).filter(
+            and_(
+                RefreshToken.user_id == user_id,
+                RefreshToken.is_revoked == False,
+                RefreshToken.expires_at > datetime.utcnow()
+            )
+        ).order_by(RefreshToken.created_at.desc(), RefreshToken.id.desc()).all()
+        return [row._asdict() for row in rows]
+    
+    def issue_refresh_token(self, db: Session, user_id: int, token: str, expires_at: datetime, max_tokens: int = 5) -> RefreshToken:
+        """Store a new refresh token, revoking the user's oldest sessions so at
+        most max_tokens stay active, in a single transaction"""
+        self._revoke_stale_tokens(db, user_id, keep=max_tokens - 1)
+        db_token = RefreshToken(
+            token=token,
+            user_id=user_id,
+            expires_at=expires_at,
+            is_revoked=False
+        )
+        db.add(db_token)
+        db.commit()
+        return db_token
+    
     def limit_user_tokens(self, db: Session, user_id: int, max_tokens: int = 5) -> int:
         """Limit the number of active tokens per user"""
-        active_tokens = db.query(RefreshToken).filter(
+        revoked = self._revoke_stale_tokens(db, user_id, keep=max_tokens - 1)
+        if revoked:
+            db.commit()
+        return revoked
+    
+    def _revoke_stale_tokens(self, db: Session, user_id: int, keep: int) -> int:
+        """Revoke everything past the user's newest `keep` active tokens; no commit"""
+        stale_token_ids = db.query(RefreshToken.id).filter(
             and_(
                 RefreshToken.user_id == user_id,
                 RefreshToken.is_revoked == False,
                 RefreshToken.expires_at > datetime.utcnow()
             )
-        ).order_by(RefreshToken.created_at.desc()).all()
+        ).order_by(
+            RefreshToken.created_at.desc(), RefreshToken.id.desc()
+        ).offset(keep)
         
-        if len(active_tokens) >= max_tokens:
-            # Revoke oldest tokens
-            tokens_to_revoke = active_tokens[max_tokens-1:]
-            for token in tokens_to_revoke:
-                token.is_revoked = True
-            db.commit()
-            return len(tokens_to_revoke)
-        return 0
+        return db.query(RefreshToken).filter(
+            RefreshToken.id.in_(stale_token_ids.scalar_subquery())
+        ).update({"is_revoked": True}, synchronize_session=False)
 
 # Create instances
 user_crud = UserCRUD()
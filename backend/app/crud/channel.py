@@ -1,19 +1,36 @@
+from sqlalchemy import exists, insert, literal, select, update, Integer, Text
 from sqlalchemy.orm import Session
-from app.models.models import Channel
+from app.models.models import Channel, User
 from app.schemas.channel import ChannelCreate, ChannelUpdate
+from app.utils.cache import TTLCache
 from typing import List, Optional
 
 
-def create_channel(db: Session, channel: ChannelCreate, user_id: int) -> Channel:
-    """Create a new channel."""
-    db_channel = Channel(
-        name=channel.name,
-        description=channel.description,
-        created_by=user_id
-    )
-    db.add(db_channel)
+# Per-process cache of the rendered GET /channels body. Writes through this
+# module clear it; other workers may serve the old list for up to a minute.
+channel_list_cache = TTLCache(maxsize=1, ttl=60)
+
+
+def create_channel(db: Session, channel: ChannelCreate, user_id: int) -> Optional[Channel]:
+    """
+    Create a new channel. The creator check rides along with the INSERT
+    as an EXISTS guard; returns None (nothing written) if the user does
+    not exist.
+    """
+    new_channel = select(
+        literal(channel.name),
+        literal(channel.description, Text),
+        literal(user_id, Integer)
+    ).where(exists().where(User.id == user_id))
+    
+    db_channel = db.scalars(
+        insert(Channel)
+        .from_select(["name", "description", "created_by"], new_channel)
+        .returning(Channel)
+    ).first()
     db.commit()
-    db.refresh(db_channel)
+    if db_channel is not None:
+        channel_list_cache.clear()
     return db_channel
 
 
@@ -28,17 +45,20 @@ def get_channels(db: Session, skip: int = 0, limit: int = 100) -> List[Channel]:
 
 
 def update_channel(db: Session, channel_id: int, channel_update: ChannelUpdate) -> Optional[Channel]:
-    """Update a channel."""
-    db_channel = db.query(Channel).filter(Channel.id == channel_id).first()
-    if not db_channel:
-        return None
-    
+    """Update a channel with a single UPDATE ... RETURNING."""
     update_data = channel_update.model_dump(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_channel, field, value)
+    if not update_data:
+        return get_channel(db, channel_id)
     
+    db_channel = db.execute(
+        update(Channel)
+        .where(Channel.id == channel_id)
+        .values(**update_data)
+        .returning(Channel)
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
     db.commit()
-    db.refresh(db_channel)
+    channel_list_cache.clear()
     return db_channel
 
 
@@ -50,4 +70,5 @@ def delete_channel(db: Session, channel_id: int) -> Optional[Channel]:
     
     db.delete(db_channel)
     db.commit()
+    channel_list_cache.clear()
     return db_channel
\ No newline at end of file
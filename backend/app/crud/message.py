@@ -1,31 +1,50 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func
+from sqlalchemy import and_, or_, desc, func, bindparam, case, exists, insert, literal, select, text, tuple_, Integer
+from app.database import is_postgresql
 from app.models.models import Message, User
 from app.schemas.message import MessageCreate
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
-def create_message(db: Session, message: MessageCreate, sender_id: int) -> Message:
-    """Create a new message"""
-    db_message = Message(
-        content=message.content,
-        sender_id=sender_id,
-        recipient_id=message.recipient_id
-    )
-    db.add(db_message)
+# Queries shorter than this use a substring match instead of full-text search
+MIN_FULL_TEXT_QUERY_LENGTH = 3
+
+# Built once at import; the recipient checks only bind the user id
+_user_exists_stmt = select(exists().where(User.id == bindparam("uid")))
+
+def create_message(db: Session, message: MessageCreate, sender_id: int) -> Optional[Message]:
+    """
+    Create a new message. The recipient check rides along with the INSERT
+    as an EXISTS guard; returns None (nothing written) if the recipient
+    does not exist.
+    """
+    new_message = select(
+        literal(message.content),
+        literal(sender_id, Integer),
+        literal(message.recipient_id, Integer)
+    ).where(exists().where(User.id == message.recipient_id))
+    
+    db_message = db.scalars(
+        insert(Message)
+        .from_select(["content", "sender_id", "recipient_id"], new_message)
+        .returning(Message)
+    ).first()
     db.commit()
-    db.refresh(db_message)
     return db_message
 
 def get_conversation(
     db: Session, 
     user_id: int, 
     other_user_id: int, 
-    skip: int = 0, 
+    before_id: Optional[int] = None, 
     limit: int = 100
 ) -> List[Message]:
-    """Get conversation between two users"""
-    return db.query(Message).filter(
+    """
+    Get a page of the conversation between two users, oldest first: the
+    latest `limit` messages, or those sent before message `before_id`.
+    Pages seek on (created_at, id) instead of using OFFSET.
+    """
+    query = db.query(Message).filter(
         and_(
             or_(
                 and_(Message.sender_id == user_id, Message.recipient_id == other_user_id),
@@ -33,88 +52,107 @@ def get_conversation(
             ),
             Message.deleted_at.is_(None)  # Exclude deleted messages
         )
-    ).order_by(Message.created_at).offset(skip).limit(limit).all()
+    )
+    if before_id is not None:
+        before = select(Message.created_at, Message.id).where(Message.id == before_id).scalar_subquery()
+        query = query.filter(tuple_(Message.created_at, Message.id) < before)
+    
+    page = query.order_by(desc(Message.created_at), desc(Message.id)).limit(limit).all()
+    page.reverse()
+    return page
 
 def get_conversations(db: Session, user_id: int) -> List[Dict[str, Any]]:
     """Get all conversations for a user with latest message and unread count"""
-    # Subquery to get latest message for each conversation
-    latest_messages = db.query(
-        func.max(Message.created_at).label('latest_created_at'),
-        func.case(
-            (Message.sender_id == user_id, Message.recipient_id),
-            else_=Message.sender_id
-        ).label('other_user_id')
+    other_user_expr = case(
+        (Message.sender_id == user_id, Message.recipient_id),
+        else_=Message.sender_id
+    )
+    user_messages = and_(
+        or_(Message.sender_id == user_id, Message.recipient_id == user_id),
+        Message.deleted_at.is_(None)
+    )
+    
+    # Subquery to pick exactly one latest message per conversation
+    if is_postgresql(db):
+        latest_messages = db.query(
+            Message.id.label('message_id'),
+            other_user_expr.label('other_user_id')
+        ).filter(user_messages).distinct(other_user_expr).order_by(
+            other_user_expr, Message.created_at.desc(), Message.id.desc()
+        ).subquery()
+    else:
+        ranked_messages = db.query(
+            Message.id.label('message_id'),
+            other_user_expr.label('other_user_id'),
+            func.row_number().over(
+                partition_by=other_user_expr,
+                order_by=(Message.created_at.desc(), Message.id.desc())
+            ).label('position')
+        ).filter(user_messages).subquery()
+        latest_messages = db.query(
+            ranked_messages.c.message_id,
+            ranked_messages.c.other_user_id
+        ).filter(ranked_messages.c.position == 1).subquery()
+    
+    # Subquery to count unread messages per conversation in the same round-trip
+    unread_counts = db.query(
+        Message.sender_id.label('other_user_id'),
+        func.count(Message.id).label('unread_count')
     ).filter(
         and_(
-            or_(Message.sender_id == user_id, Message.recipient_id == user_id),
+            Message.recipient_id == user_id,
+            Message.read_at.is_(None),
             Message.deleted_at.is_(None)
         )
-    ).group_by(
-        func.case(
-            (Message.sender_id == user_id, Message.recipient_id),
-            else_=Message.sender_id
-        )
-    ).subquery()
+    ).group_by(Message.sender_id).subquery()
     
-    # Get conversations with latest message and other user info
+    # Get conversations with latest message, other user info and unread count,
+    # projecting only the columns the listing needs instead of full Message rows
     conversations = db.query(
-        Message,
-        User.username.label('other_username')
+        Message.id,
+        Message.content,
+        Message.sender_id,
+        Message.created_at,
+        latest_messages.c.other_user_id,
+        User.username.label('other_username'),
+        func.coalesce(unread_counts.c.unread_count, 0).label('unread_count')
     ).join(
         latest_messages,
-        and_(
-            Message.created_at == latest_messages.c.latest_created_at,
-            func.case(
-                (Message.sender_id == user_id, Message.recipient_id),
-                else_=Message.sender_id
-            ) == latest_messages.c.other_user_id
-        )
+        Message.id == latest_messages.c.message_id
     ).join(
         User,
         User.id == latest_messages.c.other_user_id
-    ).all()
+    ).outerjoin(
+        unread_counts,
+        unread_counts.c.other_user_id == latest_messages.c.other_user_id
+    ).order_by(Message.created_at.desc(), Message.id.desc()).all()
     
-    result = []
-    for message, other_username in conversations:
-        other_user_id = message.recipient_id if message.sender_id == user_id else message.sender_id
-        
-        # Get unread count for this conversation
-        unread_count = db.query(Message).filter(
-            and_(
-                Message.sender_id == other_user_id,
-                Message.recipient_id == user_id,
-                Message.read_at.is_(None),
-                Message.deleted_at.is_(None)
-            )
-        ).count()
-        
-        result.append({
-            "other_user_id": other_user_id,
-            "other_username": other_username,
+    return [
+        {
+            "other_user_id": row.other_user_id,
+            "other_username": row.other_username,
             "latest_message": {
-                "id": message.id,
-                "content": message.content,
-                "sender_id": message.sender_id,
-                "created_at": message.created_at
+                "id": row.id,
+                "content": row.content,
+                "sender_id": row.sender_id,
+                "created_at": row.created_at
             },
-            "unread_count": unread_count
-        })
-    
-    return sorted(result, key=lambda x: x["latest_message"]["created_at"], reverse=True)
+            "unread_count": row.unread_count
+        }
+        for row in conversations
+    ]
 
 def mark_messages_as_read(db: Session, user_id: int, other_user_id: int) -> int:
     """Mark all unread messages from other_user_id to user_id as read"""
-    messages_to_update = db.query(Message).filter(
+    # The UPDATE reports how many rows it matched; no separate COUNT needed
+    count = db.query(Message).filter(
         and_(
             Message.sender_id == other_user_id,
             Message.recipient_id == user_id,
             Message.read_at.is_(None),
             Message.deleted_at.is_(None)
         )
-    )
-    
-    count = messages_to_update.count()
-    messages_to_update.update({"read_at": datetime.utcnow()})
+    ).update({"read_at": datetime.utcnow()})
     db.commit()
     
     return count
@@ -137,16 +175,28 @@ def search_messages(
     limit: int = 50
 ) -> List[Message]:
     """Search messages in a conversation by content"""
+    # Full-text search uses ix_messages_content_fts; very short queries are
+    # mostly partial words, which only a substring match finds
+    order_by = [desc(Message.created_at), desc(Message.id)]
+    if is_postgresql(db) and len(query.strip()) >= MIN_FULL_TEXT_QUERY_LENGTH:
+        document = func.to_tsvector(text("'simple'"), Message.content)
+        # websearch syntax: "quoted phrases", OR, -excluded words
+        ts_query = func.websearch_to_tsquery(text("'simple'"), query)
+        content_match = document.op('@@')(ts_query)
+        order_by.insert(0, desc(func.ts_rank(document, ts_query)))
+    else:
+        content_match = Message.content.ilike(f"%{query}%")
+    
     return db.query(Message).filter(
         and_(
             or_(
                 and_(Message.sender_id == user_id, Message.recipient_id == other_user_id),
                 and_(Message.sender_id == other_user_id, Message.recipient_id == user_id)
             ),
-            Message.content.ilike(f"%{query}%"),
+            content_match,
             Message.deleted_at.is_(None)
         )
-    ).order_by(desc(Message.created_at)).limit(limit).all()
+    ).order_by(*order_by).limit(limit).all()
 
 def delete_message(db: Session, message_id: int, user_id: int) -> bool:
     """Soft delete a message (only sender can delete)"""
@@ -155,7 +205,7 @@ def delete_message(db: Session, message_id: int, user_id: int) -> bool:
     if not message or message.sender_id != user_id:
         return False
     
-    message.deleted_at = datetime.utcnow()
+    message.deleted_at = func.now()
     message.deleted_by = user_id
     db.commit()
     
@@ -172,4 +222,8 @@ def get_message_by_id(db: Session, message_id: int) -> Optional[Message]:
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
     """Get a user by ID"""
-    return db.query(User).filter(User.id == user_id).first()
\ No newline at end of file
+    return db.query(User).filter(User.id == user_id).first()
+
+def user_exists(db: Session, user_id: int) -> bool:
+    """Whether a user id exists, without loading the row"""
+    return db.scalar(_user_exists_stmt, {"uid": user_id})
\ No newline at end of file
@@ -1,21 +1,59 @@
+import logging
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import desc, and_, exists, func, inspect, update
 from backend.app.models.models import (
     User, Post, Reply, ModerationAction, ModerationLog, 
     ActionType, TargetType
 )
+from backend.app.crud.auth import invalidate_user_id, moderator_cache
+from backend.app.crud.reply import adjust_post_reply_count
+from backend.app.database import SessionLocal
+from backend.app.utils.cache import TTLCache
+from backend.app.utils.pagination import paginate
 from backend.app.schemas.moderation import (
     ModerationActionCreate, ModerationLogCreate, ModerationLogFilters
 )
 
+logger = logging.getLogger(__name__)
+
+# Per-process cache of the dashboard aggregates, keyed by window in days.
+# The counts may lag new actions by up to a minute.
+stats_cache = TTLCache(maxsize=32, ttl=60)
+
+# Filter field -> clause builder for the action and log listings
+_ACTION_FILTERS = {
+    "action_type": lambda value: ModerationAction.action_type == value,
+    "target_type": lambda value: ModerationAction.target_type == value,
+    "moderator_id": lambda value: ModerationAction.moderator_id == value,
+    "target_id": lambda value: ModerationAction.target_id == value,
+    "start_date": lambda value: ModerationAction.created_at >= value,
+    "end_date": lambda value: ModerationAction.created_at <= value,
+}
+_LOG_FILTERS = {
+    "moderator_id": lambda value: ModerationLog.moderator_id == value,
+    "start_date": lambda value: ModerationLog.created_at >= value,
+    "end_date": lambda value: ModerationLog.created_at <= value,
+}
+
+def _filter_clauses(builders: Dict[str, Any], filters: Optional[ModerationLogFilters]) -> List[Any]:
+    """Build a WHERE clause for each filter field that is set"""
+    if not filters:
+        return []
+    return [build(value) for name, build in builders.items() if (value := getattr(filters, name))]
+
 
 class ModerationCRUD:
     """CRUD operations for moderation system"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, defer_audit: bool = False):
         self.db = db
+        # With defer_audit, deletes and bans (whose effect is a separate state
+        # change) leave their audit rows in pending_audit for write_audit()
+        # instead of adding them to the caller's transaction
+        self.defer_audit = defer_audit
+        self.pending_audit: List[Any] = []
     
     # Moderation Actions
     def create_moderation_action(
@@ -24,7 +62,24 @@ class ModerationCRUD:
         moderator_id: int
     ) -> ModerationAction:
         """Create a new moderation action"""
-        db_action = ModerationAction(
+        db_action = self._add_moderation_action(action, moderator_id)
+        self.db.commit()
+        return db_action
+    
+    def _add_moderation_action(
+        self, 
+        action: ModerationActionCreate, 
+        moderator_id: int
+    ) -> ModerationAction:
+        """Add a moderation action to the current transaction without committing"""
+        db_action = self._action_row(action, moderator_id)
+        self.db.add(db_action)
+        self.db.flush()
+        return db_action
+    
+    @staticmethod
+    def _action_row(action: ModerationActionCreate, moderator_id: int) -> ModerationAction:
+        return ModerationAction(
             action_type=action.action_type,
             target_type=action.target_type,
             target_id=action.target_id,
@@ -32,36 +87,63 @@ class ModerationCRUD:
             reason=action.reason,
             metadata=action.metadata or {}
         )
-        
-        self.db.add(db_action)
-        self.db.commit()
-        self.db.refresh(db_action)
-        return db_action
+    
+    @staticmethod
+    def _log_row(log: ModerationLogCreate, moderator_id: int) -> ModerationLog:
+        return ModerationLog(
+            user_id=log.user_id,
+            moderator_id=moderator_id,
+            action=log.action,
+            details=log.details or {}
+        )
+    
+    def _audit(self, *records: Any) -> None:
+        """Record audit rows: in this transaction, or pending if deferred"""
+        if self.defer_audit:
+            self.pending_audit.extend(records)
+        else:
+            self.db.add_all(records)
+    
+    def write_audit(self) -> None:
+        """
+        Insert the deferred audit rows in one transaction. Runs after the
+        response, when the request's session may be closed, so it opens its
+        own session on the same engine. The action itself has already
+        committed, so a failure here is logged with the rows it lost rather
+        than raised into a response that has been sent.
+        """
+        if not self.pending_audit:
+            return
+        records, self.pending_audit = self.pending_audit, []
+        try:
+            with SessionLocal(bind=self.db.get_bind()) as db:
+                try:
+                    db.add_all(records)
+                    db.commit()
+                except Exception:
+                    db.rollback()
+                    raise
+        except Exception:
+            logger.exception(
+                "Moderation audit rows not written: %s",
+                [
+                    {attr.key: getattr(record, attr.key) for attr in inspect(record).mapper.column_attrs}
+                    for record in records
+                ]
+            )
     
     def get_moderation_actions(
         self,
         filters: ModerationLogFilters = None,
         limit: int = 50,
-        offset: int = 0
+        cursor: Optional[str] = None
     ) -> List[ModerationAction]:
         """Get moderation actions with optional filtering"""
-        query = self.db.query(ModerationAction)
-        
-        if filters:
-            if filters.action_type:
-                query = query.filter(ModerationAction.action_type == filters.action_type)
-            if filters.target_type:
-                query = query.filter(ModerationAction.target_type == filters.target_type)
-            if filters.moderator_id:
-                query = query.filter(ModerationAction.moderator_id == filters.moderator_id)
-            if filters.target_id:
-                query = query.filter(ModerationAction.target_id == filters.target_id)
-            if filters.start_date:
-                query = query.filter(ModerationAction.created_at >= filters.start_date)
-            if filters.end_date:
-                query = query.filter(ModerationAction.created_at <= filters.end_date)
-        
-        return query.order_by(desc(ModerationAction.created_at)).offset(offset).limit(limit).all()
+        # ModerationActionResponse only reads columns; fail fast on lazy loads
+        query = self.db.query(ModerationAction).options(raiseload('*')).filter(
+            *_filter_clauses(_ACTION_FILTERS, filters)
+        )
+        return paginate(query, ModerationAction, cursor, limit).all()
     
     def get_moderation_action_by_id(self, action_id: int) -> Optional[ModerationAction]:
         """Get a specific moderation action by ID"""
@@ -87,36 +169,30 @@ class ModerationCRUD:
         moderator_id: int
     ) -> ModerationLog:
         """Create a new moderation log entry"""
-        db_log = ModerationLog(
-            user_id=log.user_id,
-            moderator_id=moderator_id,
-            action=log.action,
-            details=log.details or {}
-        )
-        
-        self.db.add(db_log)
+        db_log = self._add_moderation_log(log, moderator_id)
         self.db.commit()
-        self.db.refresh(db_log)
+        return db_log
+    
+    def _add_moderation_log(
+        self,
+        log: ModerationLogCreate,
+        moderator_id: int
+    ) -> ModerationLog:
+        """Add a moderation log entry to the current transaction without committing"""
+        db_log = self._log_row(log, moderator_id)
+        self.db.add(db_log)
+        self.db.flush()
         return db_log
     
     def get_moderation_logs(
         self,
         filters: ModerationLogFilters = None,
         limit: int = 50,
-        offset: int = 0
+        cursor: Optional[str] = None
     ) -> List[ModerationLog]:
         """Get moderation logs with optional filtering"""
-        query = self.db.query(ModerationLog)
-        
-        if filters:
-            if filters.moderator_id:
-                query = query.filter(ModerationLog.moderator_id == filters.moderator_id)
-            if filters.start_date:
-                query = query.filter(ModerationLog.created_at >= filters.start_date)
-            if filters.end_date:
-                query = query.filter(ModerationLog.created_at <= filters.end_date)
-        
-        return query.order_by(desc(ModerationLog.created_at)).offset(offset).limit(limit).all()
+        query = self.db.query(ModerationLog).filter(*_filter_clauses(_LOG_FILTERS, filters))
+        return paginate(query, ModerationLog, cursor, limit).all()
     
     def get_user_moderation_history(self, user_id: int) -> List[ModerationLog]:
         """Get moderation history for a specific user"""
@@ -125,47 +201,66 @@ class ModerationCRUD:
         ).order_by(desc(ModerationLog.created_at)).all()
     
     # Content Moderation Actions
+    def _content_exists(self, target_type: TargetType, target_id: int) -> bool:
+        """Check that a post or reply exists without loading it"""
+        if target_type == TargetType.POST:
+            model = Post
+        elif target_type == TargetType.REPLY:
+            model = Reply
+        else:
+            return False
+        return self.db.query(exists().where(model.id == target_id)).scalar()
+    
     def delete_post(self, post_id: int, moderator_id: int, reason: str) -> bool:
         """Soft delete a post"""
-        post = self.db.query(Post).filter(Post.id == post_id).first()
-        if not post:
+        deleted = self.db.execute(
+            update(Post)
+            .where(Post.id == post_id)
+            .values(deleted_at=func.now())
+        ).rowcount
+        if not deleted:
             return False
         
-        # Soft delete the post
-        post.deleted_at = datetime.now(timezone.utc)
-        
-        # Log the action
+        # Log the action; the soft-deleted row still holds the original text
         action = ModerationActionCreate(
             action_type=ActionType.DELETE,
             target_type=TargetType.POST,
             target_id=post_id,
-            reason=reason,
-            metadata={"original_title": post.title, "original_content": post.content}
+            reason=reason
         )
         
-        self.create_moderation_action(action, moderator_id)
+        self._audit(self._action_row(action, moderator_id))
         self.db.commit()
         return True
     
     def delete_reply(self, reply_id: int, moderator_id: int, reason: str) -> bool:
         """Soft delete a reply"""
-        reply = self.db.query(Reply).filter(Reply.id == reply_id).first()
-        if not reply:
-            return False
-        
-        # Soft delete the reply
-        reply.deleted_at = datetime.now(timezone.utc)
+        # Only the delete that stamps the row decrements; a concurrent one gets nothing back
+        post_id = self.db.execute(
+            update(Reply)
+            .where(Reply.id == reply_id, Reply.deleted_at.is_(None))
+            .values(deleted_at=func.now())
+            .returning(Reply.post_id)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if post_id is not None:
+            adjust_post_reply_count(self.db, post_id, -1)
+        else:
+            # Already deleted: still logged, as before, but the count is left alone
+            post_id = self.db.query(Reply.post_id).filter(Reply.id == reply_id).scalar()
+            if post_id is None:
+                return False
         
-        # Log the action
+        # Log the action; the soft-deleted row still holds the original text
         action = ModerationActionCreate(
             action_type=ActionType.DELETE,
             target_type=TargetType.REPLY,
             target_id=reply_id,
             reason=reason,
-            metadata={"original_content": reply.content}
+            metadata={"post_id": post_id}
         )
         
-        self.create_moderation_action(action, moderator_id)
+        self._audit(self._action_row(action, moderator_id))
         self.db.commit()
         return True
     
@@ -178,15 +273,7 @@ class ModerationCRUD:
         metadata: Optional[Dict[str, Any]] = None
     ) -> bool:
         """Flag content for review"""
-        # Verify target exists
-        if target_type == TargetType.POST:
-            target = self.db.query(Post).filter(Post.id == target_id).first()
-        elif target_type == TargetType.REPLY:
-            target = self.db.query(Reply).filter(Reply.id == target_id).first()
-        else:
-            return False
-        
-        if not target:
+        if not self._content_exists(target_type, target_id):
             return False
         
         # Create flag action
@@ -198,7 +285,10 @@ class ModerationCRUD:
             metadata=metadata or {}
         )
         
-        self.create_moderation_action(action, moderator_id)
+        # The action row is the flag itself, so it commits here even when
+        # audit rows are deferred
+        self.db.add(self._action_row(action, moderator_id))
+        self.db.commit()
         return True
     
     def approve_content(
@@ -209,15 +299,7 @@ class ModerationCRUD:
         reason: str
     ) -> bool:
         """Approve previously flagged content"""
-        # Verify target exists
-        if target_type == TargetType.POST:
-            target = self.db.query(Post).filter(Post.id == target_id).first()
-        elif target_type == TargetType.REPLY:
-            target = self.db.query(Reply).filter(Reply.id == target_id).first()
-        else:
-            return False
-        
-        if not target:
+        if not self._content_exists(target_type, target_id):
             return False
         
         # Create approval action
@@ -228,7 +310,10 @@ class ModerationCRUD:
             reason=reason
         )
         
-        self.create_moderation_action(action, moderator_id)
+        # The approval is recorded only as this action row, so it commits
+        # here even when audit rows are deferred
+        self.db.add(self._action_row(action, moderator_id))
+        self.db.commit()
         return True
     
     def warn_user(
@@ -239,8 +324,7 @@ class ModerationCRUD:
         details: Optional[str] = None
     ) -> bool:
         """Issue a warning to a user"""
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
+        if not self.db.query(exists().where(User.id == user_id)).scalar():
             return False
         
         # Create warning action
@@ -252,8 +336,6 @@ class ModerationCRUD:
             metadata={"details": details} if details else {}
         )
         
-        self.create_moderation_action(action, moderator_id)
-        
         # Create log entry
         log = ModerationLogCreate(
             user_id=user_id,
@@ -261,7 +343,9 @@ class ModerationCRUD:
             details={"warning_details": details} if details else {}
         )
         
-        self.create_moderation_log(log, moderator_id)
+        # The action row is the warning itself; never deferred
+        self.db.add_all([self._action_row(action, moderator_id), self._log_row(log, moderator_id)])
+        self.db.commit()
         return True
     
     def ban_user(
@@ -273,12 +357,12 @@ class ModerationCRUD:
         permanent: bool = False
     ) -> bool:
         """Ban a user temporarily or permanently"""
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return False
-        
         # Deactivate user
-        user.is_active = False
+        deactivated = self.db.execute(
+            update(User).where(User.id == user_id).values(is_active=False)
+        ).rowcount
+        if not deactivated:
+            return False
         
         # Calculate ban expiration
         ban_expires = None
@@ -300,8 +384,6 @@ class ModerationCRUD:
             metadata=metadata
         )
         
-        self.create_moderation_action(action, moderator_id)
-        
         # Create log entry
         ban_type = "permanent" if permanent else f"{duration_days} days"
         log = ModerationLogCreate(
@@ -313,39 +395,57 @@ class ModerationCRUD:
             }
         )
         
-        self.create_moderation_log(log, moderator_id)
+        self._audit(self._action_row(action, moderator_id), self._log_row(log, moderator_id))
         self.db.commit()
+        # Only after the commit, so a concurrent request can't re-cache the
+        # still-active row. This clears this worker's caches only; the write
+        # paths re-read is_active, so the ban holds everywhere for those.
+        invalidate_user_id(user_id)
         return True
     
     # Statistics and Analytics
     def get_moderation_stats(self, days: int = 30) -> Dict[str, Any]:
         """Get moderation statistics for the last N days"""
         start_date = datetime.now(timezone.utc) - timedelta(days=days)
+        in_window = ModerationAction.created_at >= start_date
+        
+        counts = stats_cache.get(days)
+        if counts is None:
+            # Count in the database instead of loading every action
+            by_type = self.db.query(
+                ModerationAction.action_type, func.count()
+            ).filter(in_window).group_by(ModerationAction.action_type).all()
+            by_target_type = self.db.query(
+                ModerationAction.target_type, func.count()
+            ).filter(in_window).group_by(ModerationAction.target_type).all()
+            counts = {
+                "total_actions": sum(count for _, count in by_type),
+                "actions_by_type": {action_type.value: count for action_type, count in by_type},
+                "actions_by_target_type": {target_type.value: count for target_type, count in by_target_type}
+            }
+            stats_cache.set(days, counts)
         
-        actions = self.db.query(ModerationAction).filter(
-            ModerationAction.created_at >= start_date
-        ).all()
-        
-        stats = {
-            "total_actions": len(actions),
-            "actions_by_type": {},
-            "actions_by_target_type": {},
-            "recent_actions": actions[:10]
-        }
-        
-        for action in actions:
-            action_type = action.action_type.value
-            target_type = action.target_type.value
-            
-            stats["actions_by_type"][action_type] = stats["actions_by_type"].get(action_type, 0) + 1
-            stats["actions_by_target_type"][target_type] = stats["actions_by_target_type"].get(target_type, 0) + 1
+        # The newest actions are a short index read; never served stale
+        recent_actions = self.db.query(ModerationAction).filter(
+            in_window
+        ).order_by(desc(ModerationAction.created_at)).limit(10).all()
         
-        return stats
+        return {**counts, "recent_actions": recent_actions}
     
-    def is_user_moderator(self, user_id: int) -> bool:
-        """Check if a user has moderation permissions"""
-        user = self.db.query(User).filter(User.id == user_id).first()
-        return user and user.is_superuser
+    def is_user_moderator(self, user_id: int, fresh: bool = False) -> bool:
+        """
+        Check if a user has moderation permissions (cached for a minute);
+        `fresh` reads the database and refreshes the cache.
+        """
+        is_moderator = None if fresh else moderator_cache.get(user_id)
+        if is_moderator is None:
+            is_moderator = bool(
+                self.db.query(User.is_superuser).filter(
+                    User.id == user_id, User.is_active.is_(True)
+                ).scalar()
+            )
+            moderator_cache.set(user_id, is_moderator)
+        return is_moderator
     
     def get_flagged_content(self, limit: int = 50) -> List[ModerationAction]:
         """Get all flagged content awaiting review"""
@@ -353,6 +453,12 @@ class ModerationCRUD:
             ModerationAction.action_type == ActionType.FLAG
         ).order_by(desc(ModerationAction.created_at)).limit(limit).all()
     
-    def get_banned_users(self) -> List[User]:
-        """Get all currently banned users"""
-        return self.db.query(User).filter(User.is_active == False).all()
\ No newline at end of file
+    def get_banned_users(self, cursor: Optional[int] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Get currently banned users in id order, one page after user id
+        `cursor`, as plain dicts of the columns the listing shows.
+        """
+        query = self.db.query(User.id, User.username, User.email).filter(User.is_active == False)
+        if cursor is not None:
+            query = query.filter(User.id > cursor)
+        return [row._asdict() for row in query.order_by(User.id).limit(limit)]
\ No newline at end of file
@@ -1,8 +1,18 @@
-from sqlalchemy.orm import Session
-from app.models.models import Post
+from sqlalchemy import bindparam, exists, select
+from sqlalchemy.orm import Session, raiseload
+from app.models.models import Channel, Post, User
 from app.schemas.post import PostCreate, PostUpdate
+from app.utils.pagination import paginate
 from typing import List, Optional
 
+# Hot lookups built once at import: each call only binds its ids, skipping
+# per-request statement construction and cache-key generation
+_post_by_id_stmt = select(Post).where(Post.id == bindparam("pid"))
+_post_references_stmt = select(
+    exists().where(Channel.id == bindparam("cid")),
+    exists().where(User.id == bindparam("uid"))
+)
+
 
 def create_post(db: Session, post: PostCreate, channel_id: int, author_id: int) -> Post:
     """Create a new post."""
@@ -14,24 +24,24 @@ def create_post(db: Session, post: PostCreate, channel_id: int, author_id: int)
     )
     db.add(db_post)
     db.commit()
-    db.refresh(db_post)
     return db_post
 
 
+def post_references_exist(db: Session, channel_id: int, author_id: int) -> tuple[bool, bool]:
+    """Whether the channel and the author of a new post exist, in one query."""
+    return tuple(db.execute(_post_references_stmt, {"cid": channel_id, "uid": author_id}).one())
+
+
 def get_post(db: Session, post_id: int) -> Optional[Post]:
     """Get a post by ID."""
-    return db.query(Post).filter(Post.id == post_id).first()
+    return db.scalars(_post_by_id_stmt, {"pid": post_id}).first()
 
 
-def get_posts_by_channel(db: Session, channel_id: int, skip: int = 0, limit: int = 100) -> List[Post]:
-    """Get all posts in a channel with pagination."""
-    return (
-        db.query(Post)
-        .filter(Post.channel_id == channel_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+def get_posts_by_channel(db: Session, channel_id: int, cursor: Optional[str] = None, limit: int = 100) -> List[Post]:
+    """Get posts in a channel, newest first, one keyset page after `cursor`."""
+    # PostResponse only reads columns; fail fast on any relationship access
+    query = db.query(Post).filter(Post.channel_id == channel_id).options(raiseload('*'))
+    return paginate(query, Post, cursor, limit).all()
 
 
 def update_post(db: Session, post_id: int, post_update: PostUpdate) -> Optional[Post]:
@@ -45,7 +55,6 @@ def update_post(db: Session, post_id: int, post_update: PostUpdate) -> Optional[
         setattr(db_post, field, value)
     
     db.commit()
-    db.refresh(db_post)
     return db_post
 
 
@@ -1,63 +1,100 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
-from backend.app.models.models import Reply, Post, User
+from sqlalchemy.orm import Session, raiseload
+from sqlalchemy import and_, or_, func, literal, cast, exists, insert, select, update, text, Integer, Text
+from backend.app.database import is_postgresql
+from backend.app.models.models import Reply, Post, User, MAX_REPLY_DEPTH, depth_first
 from backend.app.schemas.reply import ReplyCreate, ReplyUpdate
-from typing import List, Optional
-from datetime import datetime
+from backend.app.utils.pagination import paginate
+from typing import Iterator, List, Optional
+from collections import Counter
 
-def get_post_replies(db: Session, post_id: int, skip: int = 0, limit: int = 100) -> List[Reply]:
+# Search terms shorter than this use a substring match instead of full-text search
+MIN_FULL_TEXT_QUERY_LENGTH = 3
+
+def _listing_options():
     """
-    Get all replies for a specific post, ordered by creation time.
-    Excludes soft-deleted replies.
+    ReplyResponse reads only columns (vote counts are denormalized, depth
+    comes from the path), so any relationship load raises.
     """
-    return db.query(Reply).filter(
+    return (raiseload('*'),)
+
+def adjust_post_reply_count(db: Session, post_id: int, delta: int) -> None:
+    """Add `delta` to a post's denormalized reply_count; the caller commits."""
+    db.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(reply_count=Post.reply_count + delta)
+    )
+
+def _post_replies_page(db: Session, post_id: int, cursor: Optional[str], limit: int, skip: int):
+    """Live replies of a post, oldest first, one keyset page after `cursor`"""
+    query = db.query(Reply).filter(
         and_(
             Reply.post_id == post_id,
             Reply.deleted_at.is_(None)
         )
-    ).order_by(Reply.created_at).offset(skip).limit(limit).all()
+    ).options(*_listing_options())
+    return paginate(query, Reply, cursor, limit, descending=False).offset(skip)
+
+def get_post_replies(
+    db: Session, post_id: int, cursor: Optional[str] = None, limit: int = 100, skip: int = 0
+) -> List[Reply]:
+    """
+    Get replies for a specific post, ordered by creation time.
+    Excludes soft-deleted replies. Pages are keyset-based: pass the
+    cursor of the previous page to continue after its last reply.
+    `skip` is the deprecated OFFSET paging, kept for old clients.
+    """
+    return _post_replies_page(db, post_id, cursor, limit, skip).all()
+
+def iter_post_replies(
+    db: Session, post_id: int, cursor: Optional[str] = None, limit: int = 100, skip: int = 0,
+    batch_size: int = 200
+) -> Iterator[Reply]:
+    """
+    Same page as get_post_replies, fetched `batch_size` rows at a time (a
+    server-side cursor on PostgreSQL), so the caller can serialize each
+    batch and let its rows go. Consume it before the session closes.
+    """
+    return _post_replies_page(db, post_id, cursor, limit, skip).yield_per(batch_size)
 
 def get_post_replies_threaded(db: Session, post_id: int, skip: int = 0, limit: int = 100) -> List[Reply]:
     """
     Get all replies for a specific post in threaded format.
-    Returns replies ordered by thread hierarchy.
+    Returns replies ordered by thread hierarchy (depth-first, siblings by
+    creation time), ordered and paginated in the database.
     """
-    # First get all replies for the post
-    all_replies = db.query(Reply).filter(
+    # Position of each live reply among its siblings
+    siblings = db.query(
+        Reply.id,
+        Reply.parent_id,
+        func.row_number().over(
+            partition_by=Reply.parent_id,
+            order_by=(Reply.created_at, Reply.id)
+        ).label("position")
+    ).filter(
         and_(
             Reply.post_id == post_id,
             Reply.deleted_at.is_(None)
         )
-    ).order_by(Reply.created_at).all()
-    
-    # Build thread hierarchy
-    reply_dict = {reply.id: reply for reply in all_replies}
-    root_replies = []
-    
-    # Separate root replies and child replies
-    for reply in all_replies:
-        if reply.parent_id is None:
-            root_replies.append(reply)
-        else:
-            parent = reply_dict.get(reply.parent_id)
-            if parent:
-                if not hasattr(parent, '_children_cache'):
-                    parent._children_cache = []
-                parent._children_cache.append(reply)
-    
-    # Flatten the tree structure for API response
-    def flatten_replies(replies):
-        result = []
-        for reply in replies:
-            result.append(reply)
-            if hasattr(reply, '_children_cache'):
-                result.extend(flatten_replies(reply._children_cache))
-        return result
-    
-    threaded_replies = flatten_replies(root_replies)
-    
-    # Apply pagination to the flattened list
-    return threaded_replies[skip:skip + limit]
+    ).cte("siblings")
+    
+    # Fixed-width segment per level ("1000001", "1000002", ...) so the
+    # concatenated path sorts depth-first as plain text
+    def path_segment(position):
+        return cast(position + 1000000, Text)
+    
+    thread = db.query(
+        siblings.c.id, path_segment(siblings.c.position).label("path")
+    ).filter(siblings.c.parent_id.is_(None)).cte("thread", recursive=True)
+    thread = thread.union_all(
+        db.query(
+            siblings.c.id, thread.c.path + path_segment(siblings.c.position)
+        ).join(thread, siblings.c.parent_id == thread.c.id)
+    )
+    
+    return db.query(Reply).join(
+        thread, Reply.id == thread.c.id
+    ).options(*_listing_options()).order_by(thread.c.path).offset(skip).limit(limit).all()
 
 def get_reply_by_id(db: Session, reply_id: int) -> Optional[Reply]:
     """Get a specific reply by ID. Returns None if not found or soft-deleted."""
@@ -69,46 +106,73 @@ def get_reply_by_id(db: Session, reply_id: int) -> Optional[Reply]:
     ).first()
 
 def create_reply(db: Session, reply: ReplyCreate, post_id: int) -> Reply:
-    """Create a new reply for a post."""
-    # Validate that the post exists
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
-        raise ValueError("Post not found")
+    """
+    Create a new reply for a post.
+    The post, author and parent are validated inside the INSERT itself, so
+    the happy path is one round trip; the reason is looked up only on failure.
+    """
+    valid = and_(
+        exists().where(Post.id == post_id),
+        exists().where(User.id == reply.author_id)
+    )
+    path = literal("/")
+    if reply.parent_id:
+        parent = and_(
+            Reply.id == reply.parent_id,
+            Reply.post_id == post_id,  # Parent must be in same post
+            Reply.deleted_at.is_(None)
+        )
+        # The parent's depth is the number of ids in its path
+        parent_depth = func.length(Reply.path) - func.length(func.replace(Reply.path, "/", "")) - 1
+        valid = and_(
+            valid,
+            exists().where(and_(parent, parent_depth < MAX_REPLY_DEPTH))
+        )
+        path = select(
+            Reply.path + cast(Reply.id, Text) + "/"
+        ).where(Reply.id == reply.parent_id).scalar_subquery()
     
-    # Validate that the author exists
-    author = db.query(User).filter(User.id == reply.author_id).first()
-    if not author:
-        raise ValueError("Author not found")
+    new_reply = select(
+        literal(reply.content),
+        literal(post_id, Integer),
+        literal(reply.author_id, Integer),
+        literal(reply.parent_id, Integer),
+        path
+    ).where(valid)
     
-    # Validate parent reply if specified
-    parent_reply = None
-    if reply.parent_id:
-        parent_reply = db.query(Reply).filter(
-            and_(
-                Reply.id == reply.parent_id,
-                Reply.post_id == post_id,  # Parent must be in same post
-                Reply.deleted_at.is_(None)
-            )
-        ).first()
-        if not parent_reply:
-            raise ValueError("Parent reply not found")
-        
-        # Check maximum depth
-        if not parent_reply.can_reply_to:
-            raise ValueError("Maximum reply depth exceeded")
-    
-    db_reply = Reply(
-        content=reply.content,
-        post_id=post_id,
-        author_id=reply.author_id,
-        parent_id=reply.parent_id
-    )
+    db_reply = db.scalars(
+        insert(Reply)
+        .from_select(["content", "post_id", "author_id", "parent_id", "path"], new_reply)
+        .returning(Reply)
+    ).first()
+    if db_reply is None:
+        _raise_create_reply_error(db, reply, post_id)
     
-    db.add(db_reply)
+    adjust_post_reply_count(db, post_id, 1)
     db.commit()
-    db.refresh(db_reply)
     return db_reply
 
+def _raise_create_reply_error(db: Session, reply: ReplyCreate, post_id: int) -> None:
+    """Raise the ValueError explaining why create_reply inserted nothing."""
+    # Narrow lookups only; nothing is loaded into the session
+    if not db.query(exists().where(Post.id == post_id)).scalar():
+        raise ValueError("Post not found")
+    
+    if not db.query(exists().where(User.id == reply.author_id)).scalar():
+        raise ValueError("Author not found")
+    
+    parent_path = db.query(Reply.path).filter(
+        and_(
+            Reply.id == reply.parent_id,
+            Reply.post_id == post_id,
+            Reply.deleted_at.is_(None)
+        )
+    ).scalar()
+    if parent_path is None:
+        raise ValueError("Parent reply not found")
+    
+    raise ValueError("Maximum reply depth exceeded")
+
 def update_reply(db: Session, reply_id: int, reply_update: ReplyUpdate) -> Optional[Reply]:
     """Update an existing reply."""
     db_reply = get_reply_by_id(db, reply_id)
@@ -121,117 +185,180 @@ def update_reply(db: Session, reply_id: int, reply_update: ReplyUpdate) -> Optio
     
     # The updated_at field will be automatically updated by SQLAlchemy
     db.commit()
-    db.refresh(db_reply)
     return db_reply
 
 def delete_reply(db: Session, reply_id: int) -> bool:
     """Soft delete a reply."""
-    db_reply = get_reply_by_id(db, reply_id)
-    if not db_reply:
+    # Only the delete that stamps the row decrements; a concurrent one gets nothing back
+    post_id = db.execute(
+        update(Reply)
+        .where(
+            and_(
+                Reply.id == reply_id,
+                Reply.deleted_at.is_(None)
+            )
+        )
+        .values(deleted_at=func.now())
+        .returning(Reply.post_id)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+    if post_id is None:
         return False
     
-    # Perform soft delete
-    db_reply.deleted_at = datetime.utcnow()
+    adjust_post_reply_count(db, post_id, -1)
     db.commit()
     return True
 
 def get_reply_thread(db: Session, reply_id: int) -> List[Reply]:
     """
     Get the entire thread that contains the specified reply.
-    Returns all replies in the thread, ordered by hierarchy.
+    Returns all replies in the thread in creation order: the thread root
+    plus every reply whose path starts with it.
     """
-    # First get the reply
     reply = get_reply_by_id(db, reply_id)
     if not reply:
         return []
     
-    # Get the root of the thread
-    root_reply = reply.thread_root
-    
-    # Get all replies in the thread
-    thread_replies = [root_reply]
-    thread_replies.extend(root_reply.descendants)
-    
-    # Sort by creation time to maintain chronological order within levels
-    thread_replies.sort(key=lambda r: r.created_at)
-    
-    return thread_replies
-
-def get_reply_children(db: Session, reply_id: int, skip: int = 0, limit: int = 100) -> List[Reply]:
-    """Get direct children of a reply."""
+    root_id = (reply.ancestor_ids or [reply.id])[0]
     return db.query(Reply).filter(
+        or_(
+            Reply.id == root_id,
+            Reply.path.startswith(f"/{root_id}/")
+        )
+    ).options(*_listing_options()).order_by(Reply.created_at, Reply.id).all()
+
+def get_reply_children(
+    db: Session, reply_id: int, cursor: Optional[str] = None, limit: int = 100, skip: int = 0
+) -> List[Reply]:
+    """
+    Get direct children of a reply, oldest first, one keyset page after
+    `cursor`. `skip` is the deprecated OFFSET paging, kept for old clients.
+    """
+    query = db.query(Reply).filter(
         and_(
             Reply.parent_id == reply_id,
             Reply.deleted_at.is_(None)
         )
-    ).order_by(Reply.created_at).offset(skip).limit(limit).all()
+    ).options(*_listing_options())
+    return paginate(query, Reply, cursor, limit, descending=False).offset(skip).all()
 
 def get_reply_ancestors(db: Session, reply_id: int) -> List[Reply]:
-    """Get all ancestors of a reply."""
+    """Get all ancestors of a reply (immediate parent first, root last)."""
     reply = get_reply_by_id(db, reply_id)
-    if not reply:
+    if not reply or not reply.ancestor_ids:
         return []
     
-    return reply.ancestors
+    # The path lists them root first; the ids are fetched by primary key
+    ancestors = {
+        r.id: r for r in db.query(Reply).filter(Reply.id.in_(reply.ancestor_ids)).options(*_listing_options())
+    }
+    return [ancestors[i] for i in reversed(reply.ancestor_ids) if i in ancestors]
 
 def get_reply_descendants(db: Session, reply_id: int) -> List[Reply]:
-    """Get all descendants of a reply."""
+    """Get all descendants of a reply, depth-first."""
     reply = get_reply_by_id(db, reply_id)
     if not reply:
         return []
     
-    return reply.descendants
+    descendants = db.query(Reply).filter(
+        Reply.path.startswith(f"{reply.path}{reply.id}/")
+    ).options(*_listing_options()).all()
+    return depth_first(descendants, reply_id)
 
 def get_reply_siblings(db: Session, reply_id: int) -> List[Reply]:
-    """Get all siblings of a reply."""
+    """Get the live siblings of a reply (same post and parent), oldest first."""
     reply = get_reply_by_id(db, reply_id)
     if not reply:
         return []
     
-    return reply.siblings
-
-def count_post_replies(db: Session, post_id: int) -> int:
-    """Count total replies for a post (excluding soft-deleted)."""
     return db.query(Reply).filter(
         and_(
-            Reply.post_id == post_id,
+            Reply.post_id == reply.post_id,
+            Reply.parent_id == reply.parent_id,  # IS NULL for top-level replies
+            Reply.id != reply.id,
             Reply.deleted_at.is_(None)
         )
-    ).count()
+    ).options(*_listing_options()).order_by(Reply.created_at, Reply.id).all()
 
-def get_user_replies(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Reply]:
-    """Get all replies by a specific user."""
-    return db.query(Reply).filter(
+def count_post_replies(db: Session, post_id: int) -> int:
+    """Count total replies for a post (excluding soft-deleted)."""
+    # Maintained by the reply write paths; a PK lookup instead of a COUNT
+    return db.query(Post.reply_count).filter(Post.id == post_id).scalar() or 0
+
+def get_user_replies(
+    db: Session, user_id: int, cursor: Optional[str] = None, limit: int = 100, skip: int = 0
+) -> List[Reply]:
+    """
+    Get replies by a specific user, newest first, one keyset page after
+    `cursor`. `skip` is the deprecated OFFSET paging, kept for old clients.
+    """
+    query = db.query(Reply).filter(
         and_(
             Reply.author_id == user_id,
             Reply.deleted_at.is_(None)
         )
-    ).order_by(Reply.created_at.desc()).offset(skip).limit(limit).all()
+    ).options(*_listing_options())
+    return paginate(query, Reply, cursor, limit).offset(skip).all()
 
-def search_replies(db: Session, post_id: int, search_term: str, skip: int = 0, limit: int = 100) -> List[Reply]:
-    """Search replies in a post by content."""
+def _search_replies_query(db: Session, post_id: int, search_term: str):
+    """Live replies of a post whose content matches search_term"""
+    # Full-text search uses ix_replies_content_fts; very short terms are
+    # mostly partial words, which only a substring match finds
+    if is_postgresql(db) and len(search_term.strip()) >= MIN_FULL_TEXT_QUERY_LENGTH:
+        content_match = func.to_tsvector(text("'simple'"), Reply.content).op('@@')(
+            func.plainto_tsquery(text("'simple'"), search_term)
+        )
+    else:
+        content_match = Reply.content.ilike(f"%{search_term}%")
+    
     return db.query(Reply).filter(
         and_(
             Reply.post_id == post_id,
-            Reply.content.ilike(f"%{search_term}%"),
+            content_match,
             Reply.deleted_at.is_(None)
         )
-    ).order_by(Reply.created_at).offset(skip).limit(limit).all()
+    )
 
-def get_recent_replies(db: Session, limit: int = 10) -> List[Reply]:
-    """Get most recent replies across all posts."""
-    return db.query(Reply).filter(
-        Reply.deleted_at.is_(None)
-    ).order_by(Reply.created_at.desc()).limit(limit).all()
+def search_replies(
+    db: Session, post_id: int, search_term: str, cursor: Optional[str] = None, limit: int = 100, skip: int = 0
+) -> List[Reply]:
+    """
+    Search replies in a post by content, oldest first, one keyset page
+    after `cursor`. `skip` is the deprecated OFFSET paging.
+    """
+    query = _search_replies_query(db, post_id, search_term).options(*_listing_options())
+    return paginate(query, Reply, cursor, limit, descending=False).offset(skip).all()
+
+def count_search_matches(db: Session, post_id: int, search_term: str) -> int:
+    """Count the replies search_replies can return for this term, over all pages."""
+    return _search_replies_query(db, post_id, search_term).with_entities(func.count(Reply.id)).scalar()
+
+def get_recent_replies(db: Session, limit: int = 10, cursor: Optional[str] = None) -> List[Reply]:
+    """Get most recent replies across all posts, one keyset page after `cursor`."""
+    # Reads ix_replies_recent in order and stops after `limit` rows; no sort
+    query = db.query(Reply).filter(Reply.deleted_at.is_(None)).options(*_listing_options())
+    return paginate(query, Reply, cursor, limit).all()
 
 def bulk_delete_replies(db: Session, reply_ids: List[int]) -> int:
     """Soft delete multiple replies. Returns count of deleted replies."""
-    result = db.query(Reply).filter(
-        and_(
-            Reply.id.in_(reply_ids),
-            Reply.deleted_at.is_(None)
+    # One UPDATE stamped by the database; no SELECT to sync the session first
+    deleted_post_ids = db.execute(
+        update(Reply)
+        .where(
+            and_(
+                Reply.id.in_(reply_ids),
+                Reply.deleted_at.is_(None)
+            )
         )
-    ).update({Reply.deleted_at: datetime.utcnow()}, synchronize_session='fetch')
+        .values(deleted_at=func.now())
+        .returning(Reply.post_id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    
+    for post_id, deleted in Counter(deleted_post_ids).items():
+        adjust_post_reply_count(db, post_id, -deleted)
     
     db.commit()
-    return result
\ No newline at end of file
+    # Loaded replies may be stale now; reload them on next access
+    db.expire_all()
+    return len(deleted_post_ids)
\ No newline at end of file
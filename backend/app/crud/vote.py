@@ -1,11 +1,33 @@
-from typing import List, Optional
+from typing import List, Optional, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from backend.app.models.models import Vote, Post, Reply, VoteType
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import and_, or_, func, bindparam, case, cast, delete, distinct, exists, literal, select, union_all, update, Float, Integer
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from backend.app.database import is_postgresql
+from backend.app.models.models import Vote, Post, Reply, User, VoteType
+from backend.app.utils.cache import TTLCache
+from backend.app.utils.pagination import paginate
 
+# Per-process cache of top-voted rankings as (id, net_votes) pairs, keyed by
+# query arguments. Cleared on this process's vote writes; other workers'
+# writes show up within the TTL.
+top_voted_cache = TTLCache(maxsize=256, ttl=30)
 
-def create_vote(db: Session, user_id: int, vote_type: str, post_id: Optional[int] = None, reply_id: Optional[int] = None) -> Vote:
-    """Create a new vote or update existing vote"""
+# Denormalized (upvotes, downvotes) of a post or reply, built once at import;
+# the vote count endpoints only bind the target id
+_vote_counts_stmts = {
+    model: select(model.upvote_count, model.downvote_count).where(model.id == bindparam("tid"))
+    for model in (Post, Reply)
+}
+
+
+def create_vote(db: Session, user_id: int, vote_type: str, post_id: Optional[int] = None, reply_id: Optional[int] = None) -> Optional[Vote]:
+    """
+    Create a new vote or update existing vote; the same vote again removes
+    it and returns None. Raises LookupError if the post or reply doesn't
+    exist, ValueError if the user doesn't.
+    """
     
     # Validate vote_type
     if vote_type not in [VoteType.upvote.value, VoteType.downvote.value]:
@@ -15,44 +37,74 @@ def create_vote(db: Session, user_id: int, vote_type: str, post_id: Optional[int
     if (post_id is None and reply_id is None) or (post_id is not None and reply_id is not None):
         raise ValueError("Vote must target exactly one post or reply")
     
-    # Check if post/reply exists
-    if post_id:
-        post = db.query(Post).filter(Post.id == post_id).first()
-        if not post:
-            raise ValueError(f"Post with id {post_id} not found")
-    
-    if reply_id:
-        reply = db.query(Reply).filter(Reply.id == reply_id).first()
-        if not reply:
-            raise ValueError(f"Reply with id {reply_id} not found")
-    
-    # Check for existing vote
-    existing_vote = get_user_vote(db, user_id, post_id, reply_id)
-    
-    if existing_vote:
-        if existing_vote.vote_type.value == vote_type:
-            # Same vote type - remove vote
-            db.delete(existing_vote)
-            db.commit()
-            return None
-        else:
-            # Different vote type - update vote
-            existing_vote.vote_type = VoteType(vote_type)
-            db.commit()
-            db.refresh(existing_vote)
-            return existing_vote
-    else:
-        # Create new vote
-        vote = Vote(
-            user_id=user_id,
-            post_id=post_id,
-            reply_id=reply_id,
-            vote_type=VoteType(vote_type)
-        )
-        db.add(vote)
+    target = {"post_id": post_id} if post_id is not None else {"reply_id": reply_id}
+    target_column = Vote.post_id if post_id is not None else Vote.reply_id
+    target_id = post_id if post_id is not None else reply_id
+    
+    # Same vote again toggles it off
+    removed = db.execute(
+        delete(Vote).where(
+            Vote.user_id == user_id, target_column == target_id, Vote.vote_type == VoteType(vote_type)
+        ).returning(Vote.id)
+    ).first()
+    if removed:
+        db.commit()
+        top_voted_cache.clear()
+        return None
+    
+    # Otherwise insert the vote, or switch the type of the existing one, in
+    # one statement against the user/target unique constraint. The user and
+    # target checks ride along as EXISTS guards on the inserted row, so a
+    # missing one inserts nothing.
+    target_model = Post if post_id is not None else Reply
+    new_vote = select(
+        literal(user_id, Integer),
+        literal(VoteType(vote_type), Vote.vote_type.type),
+        literal(target_id, Integer)
+    ).where(
+        exists().where(User.id == user_id),
+        exists().where(target_model.id == target_id)
+    )
+    dialect_insert = postgresql_insert if is_postgresql(db) else sqlite_insert
+    stmt = dialect_insert(Vote).from_select(["user_id", "vote_type", *target], new_vote)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", *target],
+        set_={"vote_type": stmt.excluded.vote_type, "updated_at": func.now()}
+    )
+    target_name = "Post" if post_id is not None else "Reply"
+    try:
+        vote = db.scalars(
+            stmt.returning(Vote), execution_options={"populate_existing": True}
+        ).one_or_none()
         db.commit()
-        db.refresh(vote)
-        return vote
+    except IntegrityError:
+        # The user or target was deleted between the guard and the insert
+        db.rollback()
+        vote = None
+    if vote is None:
+        # Nothing inserted; only now look up which of the two is missing
+        if not db.query(exists().where(User.id == user_id)).scalar():
+            raise ValueError(f"User with id {user_id} not found")
+        raise LookupError(f"{target_name} with id {target_id} not found")
+    top_voted_cache.clear()
+    return vote
+
+
+def existing_targets(db: Session, post_ids=(), reply_ids=()) -> set:
+    """
+    Which of the given posts and replies exist, as ("post", id) and
+    ("reply", id) pairs. One query however many ids are checked.
+    """
+    selects = []
+    if post_ids:
+        selects.append(select(literal("post"), Post.id).where(Post.id.in_(post_ids)))
+    if reply_ids:
+        selects.append(select(literal("reply"), Reply.id).where(Reply.id.in_(reply_ids)))
+    if not selects:
+        return set()
+    
+    stmt = selects[0] if len(selects) == 1 else union_all(*selects)
+    return {tuple(row) for row in db.execute(stmt)}
 
 
 def get_user_vote(db: Session, user_id: int, post_id: Optional[int] = None, reply_id: Optional[int] = None) -> Optional[Vote]:
@@ -68,14 +120,14 @@ def get_user_vote(db: Session, user_id: int, post_id: Optional[int] = None, repl
     return None
 
 
-def get_votes_for_post(db: Session, post_id: int, skip: int = 0, limit: int = 100) -> List[Vote]:
-    """Get all votes for a specific post"""
-    return db.query(Vote).filter(Vote.post_id == post_id).offset(skip).limit(limit).all()
+def get_votes_for_post(db: Session, post_id: int, cursor: Optional[str] = None, limit: int = 100) -> List[Vote]:
+    """Get votes for a specific post, newest first, one keyset page after `cursor`"""
+    return paginate(db.query(Vote).filter(Vote.post_id == post_id), Vote, cursor, limit).all()
 
 
-def get_votes_for_reply(db: Session, reply_id: int, skip: int = 0, limit: int = 100) -> List[Vote]:
-    """Get all votes for a specific reply"""
-    return db.query(Vote).filter(Vote.reply_id == reply_id).offset(skip).limit(limit).all()
+def get_votes_for_reply(db: Session, reply_id: int, cursor: Optional[str] = None, limit: int = 100) -> List[Vote]:
+    """Get votes for a specific reply, newest first, one keyset page after `cursor`"""
+    return paginate(db.query(Vote).filter(Vote.reply_id == reply_id), Vote, cursor, limit).all()
 
 
 def get_user_votes(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Vote]:
@@ -83,31 +135,25 @@ def get_user_votes(db: Session, user_id: int, skip: int = 0, limit: int = 100) -
     return db.query(Vote).filter(Vote.user_id == user_id).offset(skip).limit(limit).all()
 
 
-def get_vote_counts_for_post(db: Session, post_id: int) -> dict:
-    """Get aggregated vote counts for a post"""
-    votes = db.query(Vote).filter(Vote.post_id == post_id).all()
-    
-    upvotes = len([v for v in votes if v.vote_type == VoteType.upvote])
-    downvotes = len([v for v in votes if v.vote_type == VoteType.downvote])
-    
-    return {
-        "post_id": post_id,
-        "upvote_count": upvotes,
-        "downvote_count": downvotes,
-        "net_votes": upvotes - downvotes,
-        "total_votes": upvotes + downvotes
-    }
+def _net_votes():
+    """SQL expression for upvotes minus downvotes over the joined votes (0 when none)"""
+    return func.coalesce(
+        func.sum(case(
+            (Vote.vote_type == VoteType.upvote, 1),
+            (Vote.vote_type == VoteType.downvote, -1),
+            else_=0  # The NULL row of a target with no votes
+        )), 0
+    ).label("net_votes")
 
 
-def get_vote_counts_for_reply(db: Session, reply_id: int) -> dict:
-    """Get aggregated vote counts for a reply"""
-    votes = db.query(Vote).filter(Vote.reply_id == reply_id).all()
-    
-    upvotes = len([v for v in votes if v.vote_type == VoteType.upvote])
-    downvotes = len([v for v in votes if v.vote_type == VoteType.downvote])
-    
+def _vote_counts(db: Session, model, target_id: int) -> Optional[tuple]:
+    """Read the denormalized (upvotes, downvotes) of a post or reply; None if it doesn't exist"""
+    row = db.execute(_vote_counts_stmts[model], {"tid": target_id}).first()
+    return tuple(row) if row else None
+
+
+def _count_fields(upvotes: int, downvotes: int) -> dict:
     return {
-        "reply_id": reply_id,
         "upvote_count": upvotes,
         "downvote_count": downvotes,
         "net_votes": upvotes - downvotes,
@@ -115,97 +161,151 @@ def get_vote_counts_for_reply(db: Session, reply_id: int) -> dict:
     }
 
 
+def vote_counts_of(target: Union[Post, Reply]) -> dict:
+    """Vote count fields of an already loaded post or reply; no query"""
+    return _count_fields(target.upvote_count, target.downvote_count)
+
+
+def get_vote_counts_for_post(db: Session, post_id: int) -> Optional[dict]:
+    """Get aggregated vote counts for a post; None if the post doesn't exist"""
+    counts = _vote_counts(db, Post, post_id)
+    return {"post_id": post_id, **_count_fields(*counts)} if counts else None
+
+
+def get_vote_counts_for_reply(db: Session, reply_id: int) -> Optional[dict]:
+    """Get aggregated vote counts for a reply; None if the reply doesn't exist"""
+    counts = _vote_counts(db, Reply, reply_id)
+    return {"reply_id": reply_id, **_count_fields(*counts)} if counts else None
+
+
 def delete_vote(db: Session, vote_id: int) -> bool:
     """Delete a specific vote"""
     vote = db.query(Vote).filter(Vote.id == vote_id).first()
     if vote:
         db.delete(vote)
         db.commit()
+        top_voted_cache.clear()
         return True
     return False
 
 
 def delete_user_votes(db: Session, user_id: int) -> int:
     """Delete all votes by a user (for cleanup)"""
-    votes = db.query(Vote).filter(Vote.user_id == user_id).all()
-    count = len(votes)
-    for vote in votes:
-        db.delete(vote)
+    # One statement, nothing loaded; the vote triggers adjust the counts
+    count = db.query(Vote).filter(Vote.user_id == user_id).delete(synchronize_session=False)
     db.commit()
+    top_voted_cache.clear()
     return count
 
 
-def get_top_voted_posts(db: Session, limit: int = 10, time_period_hours: Optional[int] = None) -> List[tuple]:
-    """Get posts with highest net votes"""
-    query = db.query(Post).join(Vote, Post.id == Vote.post_id, isouter=True)
+def _top_voted(db: Session, model, key: tuple, ranked_query) -> List[tuple]:
+    """Run ranked_query (model, net_votes) on a cache miss; on a hit, load the cached ids"""
+    ranking = top_voted_cache.get(key)
+    if ranking is None:
+        rows = ranked_query.all()
+        top_voted_cache.set(key, [(row.id, net) for row, net in rows])
+        return [(row, net) for row, net in rows]
     
-    if time_period_hours:
-        from datetime import datetime, timedelta
-        cutoff_time = datetime.utcnow() - timedelta(hours=time_period_hours)
-        query = query.filter(Vote.created_at >= cutoff_time)
+    by_id = {row.id: row for row in db.query(model).filter(model.id.in_([row_id for row_id, _ in ranking]))}
+    return [(by_id[row_id], net) for row_id, net in ranking if row_id in by_id]
+
+
+def get_top_voted_posts(db: Session, limit: int = 10, time_period_hours: Optional[int] = None) -> List[tuple]:
+    """Get posts with highest net votes, ranked and limited in the database"""
+    key = ("posts", limit, time_period_hours)
+    if not time_period_hours:
+        net_votes = Post.net_votes.label("net_votes")
+        query = db.query(Post, net_votes).order_by(net_votes.desc(), Post.id).limit(limit)
+        return _top_voted(db, Post, key, query)
     
-    # This is a simplified version - in production, you'd want to use proper aggregation
-    posts_with_votes = []
-    for post in query.distinct().all():
-        vote_counts = get_vote_counts_for_post(db, post.id)
-        posts_with_votes.append((post, vote_counts["net_votes"]))
+    from datetime import datetime, timedelta
+    cutoff_time = datetime.utcnow() - timedelta(hours=time_period_hours)
+    # In the ON clause so posts without recent votes still rank (at 0)
+    join_on = and_(Vote.post_id == Post.id, Vote.created_at >= cutoff_time)
     
-    # Sort by net votes (descending)
-    posts_with_votes.sort(key=lambda x: x[1], reverse=True)
+    net_votes = _net_votes()
+    query = db.query(Post, net_votes).outerjoin(Vote, join_on).group_by(
+        Post.id
+    ).order_by(net_votes.desc(), Post.id).limit(limit)
     
-    return posts_with_votes[:limit]
+    return _top_voted(db, Post, key, query)
 
 
 def get_top_voted_replies(db: Session, post_id: Optional[int] = None, limit: int = 10) -> List[tuple]:
-    """Get replies with highest net votes"""
-    query = db.query(Reply).join(Vote, Reply.id == Vote.reply_id, isouter=True)
+    """Get replies with highest net votes, ranked and limited in the database"""
+    net_votes = Reply.net_votes.label("net_votes")
+    query = db.query(Reply, net_votes)
     
     if post_id:
         query = query.filter(Reply.post_id == post_id)
     
-    # This is a simplified version - in production, you'd want to use proper aggregation
-    replies_with_votes = []
-    for reply in query.distinct().all():
-        vote_counts = get_vote_counts_for_reply(db, reply.id)
-        replies_with_votes.append((reply, vote_counts["net_votes"]))
-    
-    # Sort by net votes (descending)
-    replies_with_votes.sort(key=lambda x: x[1], reverse=True)
+    query = query.order_by(net_votes.desc(), Reply.id).limit(limit)
+    return _top_voted(db, Reply, ("replies", limit, post_id), query)
+
+
+def get_voting_stats(db: Session) -> dict:
+    """Site-wide vote totals, aggregated in one query"""
+    def tally(vote_type):
+        return func.coalesce(func.sum(case((Vote.vote_type == vote_type, 1), else_=0)), 0)
     
-    return replies_with_votes[:limit]
+    row = db.query(
+        func.count().label("total_votes"),
+        tally(VoteType.upvote).label("total_upvotes"),
+        tally(VoteType.downvote).label("total_downvotes"),
+        func.count(distinct(Vote.user_id)).label("active_voters"),
+        # COUNT skips NULLs: the other target type's votes are not counted
+        func.count(distinct(Vote.post_id)).label("posts_with_votes"),
+        func.count(distinct(Vote.reply_id)).label("replies_with_votes")
+    ).one()
+    return row._asdict()
 
 
-def get_vote_history(db: Session, user_id: int, target_type: str = "all", skip: int = 0, limit: int = 50) -> List[Vote]:
-    """Get user's voting history with optional filtering"""
+def _vote_history_query(db: Session, user_id: int, target_type: str = "all"):
     query = db.query(Vote).filter(Vote.user_id == user_id)
     
     if target_type == "posts":
         query = query.filter(Vote.post_id.isnot(None))
     elif target_type == "replies":
         query = query.filter(Vote.reply_id.isnot(None))
+    return query
+
+
+def get_vote_history(db: Session, user_id: int, target_type: str = "all", cursor: Optional[str] = None, limit: int = 50) -> List[Vote]:
+    """Get user's voting history with optional filtering, newest first, one keyset page after `cursor`"""
+    query = _vote_history_query(db, user_id, target_type)
+    # Seeks along ix_votes_user_created instead of skipping OFFSET rows
+    return paginate(query, Vote, cursor, limit).all()
+
+
+def count_user_votes(db: Session, user_id: int, target_type: str = "all") -> int:
+    """Count the votes get_vote_history pages through, in one COUNT"""
+    return _vote_history_query(db, user_id, target_type).with_entities(func.count(Vote.id)).scalar()
+
+
+def _refresh_vote_counts(db: Session, model, target_column) -> int:
+    """Recount every row of model from votes in a single UPDATE; returns rows touched"""
+    def tally(vote_type):
+        return select(func.count()).where(
+            target_column == model.id, Vote.vote_type == vote_type
+        ).scalar_subquery()
     
-    return query.order_by(Vote.created_at.desc()).offset(skip).limit(limit).all()
+    result = db.execute(
+        update(model)
+        .values(upvote_count=tally(VoteType.upvote), downvote_count=tally(VoteType.downvote))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
 
 
 def bulk_update_vote_aggregates(db: Session) -> dict:
-    """Update vote aggregates for all posts and replies (for maintenance)"""
-    # This would typically be run as a background job
-    posts_updated = 0
-    replies_updated = 0
-    
-    # Update post vote counts
-    posts = db.query(Post).all()
-    for post in posts:
-        vote_counts = get_vote_counts_for_post(db, post.id)
-        # In a real implementation, you might store these counts in the database
-        posts_updated += 1
-    
-    # Update reply vote counts  
-    replies = db.query(Reply).all()
-    for reply in replies:
-        vote_counts = get_vote_counts_for_reply(db, reply.id)
-        # In a real implementation, you might store these counts in the database
-        replies_updated += 1
+    """Reconcile the trigger-maintained vote counts of all posts and replies with votes (for maintenance)"""
+    # Correlated subqueries rather than UPDATE ... FROM (GROUP BY) so targets
+    # whose votes have all gone are reset to 0 as well
+    posts_updated = _refresh_vote_counts(db, Post, Vote.post_id)
+    replies_updated = _refresh_vote_counts(db, Reply, Vote.reply_id)
+    db.commit()
+    db.expire_all()
+    top_voted_cache.clear()
     
     return {
         "posts_updated": posts_updated,
@@ -213,39 +313,32 @@ def bulk_update_vote_aggregates(db: Session) -> dict:
     }
 
 
+def _controversial(db: Session, model, id_key: str, min_total_votes: int, limit: int) -> List[tuple]:
+    """Rank rows of model by controversy from their stored vote counts"""
+    total = model.upvote_count + model.downvote_count
+    # 1 at an even split, 0 when unanimous
+    score = (1 - func.abs(cast(model.upvote_count, Float) / total - 0.5) * 2).label("controversy")
+    # Counts selected as columns: the trigger-maintained values on an entity
+    # already in the session may be stale
+    rows = db.query(model, model.upvote_count, model.downvote_count, score).filter(
+        total >= min_total_votes, total > 0, score > 0.7  # Highly controversial
+    ).order_by(score.desc(), model.id).limit(limit).all()
+    
+    return [
+        (row, controversy, {
+            id_key: row.id,
+            "upvote_count": upvotes,
+            "downvote_count": downvotes,
+            "net_votes": upvotes - downvotes,
+            "total_votes": upvotes + downvotes
+        })
+        for row, upvotes, downvotes, controversy in rows
+    ]
+
+
 def get_controversial_content(db: Session, min_total_votes: int = 10, limit: int = 20) -> dict:
     """Get posts and replies with high controversy (similar upvotes and downvotes)"""
-    controversial_posts = []
-    controversial_replies = []
-    
-    # Get posts with high vote counts
-    posts = db.query(Post).all()
-    for post in posts:
-        counts = get_vote_counts_for_post(db, post.id)
-        if counts["total_votes"] >= min_total_votes:
-            # Calculate controversy score (closer to 0.5 ratio = more controversial)
-            if counts["total_votes"] > 0:
-                upvote_ratio = counts["upvote_count"] / counts["total_votes"]
-                controversy_score = 1 - abs(upvote_ratio - 0.5) * 2  # 0-1 scale
-                if controversy_score > 0.7:  # Highly controversial
-                    controversial_posts.append((post, controversy_score, counts))
-    
-    # Get replies with high vote counts
-    replies = db.query(Reply).all()
-    for reply in replies:
-        counts = get_vote_counts_for_reply(db, reply.id)
-        if counts["total_votes"] >= min_total_votes:
-            if counts["total_votes"] > 0:
-                upvote_ratio = counts["upvote_count"] / counts["total_votes"]
-                controversy_score = 1 - abs(upvote_ratio - 0.5) * 2
-                if controversy_score > 0.7:
-                    controversial_replies.append((reply, controversy_score, counts))
-    
-    # Sort by controversy score
-    controversial_posts.sort(key=lambda x: x[1], reverse=True)
-    controversial_replies.sort(key=lambda x: x[1], reverse=True)
-    
     return {
-        "posts": controversial_posts[:limit//2],
-        "replies": controversial_replies[:limit//2]
-    }
\ No newline at end of file
+        "posts": _controversial(db, Post, "post_id", min_total_votes, limit // 2),
+        "replies": _controversial(db, Reply, "reply_id", min_total_votes, limit // 2)
+    }
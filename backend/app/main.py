@@ -3,8 +3,11 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.routers import channels, posts, messages, replies, votes, auth, moderation
 from app.config import settings, setup_logging
+from app.utils.responses import FastJSONResponse
 from app.database import engine
+from app.utils.auth import shutdown_hasher_pool
 from sqlalchemy import text
+from anyio import to_thread
 import logging
 
 # Setup logging
@@ -15,7 +18,8 @@ app = FastAPI(
     title=settings.app_name,
     description="A FastAPI backend for a Reddit-style community discussion platform",
     version=settings.app_version,
-    debug=settings.debug
+    debug=settings.debug,
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware with proper configuration
@@ -41,8 +45,10 @@ async def root():
     return {"message": f"{settings.app_name} v{settings.app_version}"}
 
 @app.get("/health")
-async def health():
+def health():
     """Health check endpoint for monitoring and deployment."""
+    # Plain def: FastAPI runs it in the threadpool, so the blocking
+    # connection check doesn't stall the event loop
     try:
         # Check database connection
         with engine.connect() as conn:
@@ -71,11 +77,16 @@ async def startup_event():
     logger.info(f"Starting {settings.app_name} v{settings.app_version}")
     logger.info(f"Environment: {settings.environment}")
     logger.info(f"Debug mode: {settings.debug}")
+    # Route handlers are plain def functions run in the threadpool, each
+    # holding at most one pooled connection; size the pool of threads to
+    # one engine's connection budget instead of anyio's default of 40
+    to_thread.current_default_thread_limiter().total_tokens = settings.db_connections_per_engine
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event."""
     logger.info(f"Shutting down {settings.app_name}")
+    shutdown_hasher_pool()
 
 # Error handler for uncaught exceptions
 @app.exception_handler(Exception)
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, CheckConstraint, UniqueConstraint, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, CheckConstraint, UniqueConstraint, Index, Boolean, JSON, text, event, DDL, select
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, object_session
 from sqlalchemy.sql import func
 from sqlalchemy.ext.hybrid import hybrid_property
 import enum
+from collections import defaultdict
 
 Base = declarative_base()
 
@@ -25,6 +26,8 @@ class TargetType(enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    # Fetch onupdate values with RETURNING rather than a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String(50), unique=True, index=True, nullable=False)
@@ -37,6 +40,11 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
+    __table_args__ = (
+        # Banned (inactive) users by id; only as large as the banned set
+        Index('ix_users_banned', id, postgresql_where=text('is_active = false')),
+    )
+    
     # Relationships
     channels = relationship("Channel", back_populates="creator")
     posts = relationship("Post", back_populates="author")
@@ -64,6 +72,8 @@ class Channel(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    # Fetch onupdate values with RETURNING rather than a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
@@ -73,6 +83,16 @@ class Post(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Live (not soft-deleted) replies, kept in step by the reply write paths
+    reply_count = Column(Integer, default=0, server_default=text('0'), nullable=False)
+    # Vote tallies, kept in step by the votes table triggers below
+    upvote_count = Column(Integer, default=0, server_default=text('0'), nullable=False)
+    downvote_count = Column(Integer, default=0, server_default=text('0'), nullable=False)
+    
+    __table_args__ = (
+        # Keyset pagination seek: WHERE channel_id = ? AND (created_at, id) < (?, ?)
+        Index('ix_posts_channel_created', channel_id, created_at.desc(), id.desc()),
+    )
     
     # Relationships
     channel = relationship("Channel", back_populates="posts")
@@ -80,37 +100,65 @@ class Post(Base):
     replies = relationship("Reply", back_populates="post", cascade="all, delete-orphan")
     votes = relationship("Vote", back_populates="post", cascade="all, delete-orphan")
     
-    @property
-    def upvote_count(self):
-        """Count upvotes for this post"""
-        return len([v for v in self.votes if v.vote_type == VoteType.upvote.value])
-    
-    @property
-    def downvote_count(self):
-        """Count downvotes for this post"""
-        return len([v for v in self.votes if v.vote_type == VoteType.downvote.value])
-    
-    @property
+    @hybrid_property
     def net_votes(self):
         """Calculate net votes (upvotes - downvotes)"""
         return self.upvote_count - self.downvote_count
     
-    @property
+    @hybrid_property
     def total_votes(self):
         """Calculate total votes"""
         return self.upvote_count + self.downvote_count
 
+# Deepest level a reply may be nested at (top-level replies are depth 0)
+MAX_REPLY_DEPTH = 10
+
 class Reply(Base):
     __tablename__ = "replies"
+    # Fetch onupdate values with RETURNING rather than a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text, nullable=False)
     post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
     author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     parent_id = Column(Integer, ForeignKey("replies.id"), nullable=True)
+    # Materialized path of ancestor ids, root first: "/" for a top-level
+    # reply, "/1/4/" for a reply to 4 whose parent is 1
+    path = Column(String(255), nullable=False, server_default="/")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
+    # Vote tallies, kept in step by the votes table triggers below
+    upvote_count = Column(Integer, default=0, server_default=text('0'), nullable=False)
+    downvote_count = Column(Integer, default=0, server_default=text('0'), nullable=False)
+    
+    __table_args__ = (
+        # Subtree lookups: WHERE path LIKE '/1/4/%'
+        Index('ix_replies_path', path, postgresql_ops={'path': 'text_pattern_ops'}),
+        # Live replies of a post / children of a reply, in (created_at, id) order
+        Index(
+            'ix_replies_post_created', post_id, created_at, id,
+            postgresql_where=text('deleted_at IS NULL')
+        ),
+        Index(
+            'ix_replies_parent_created', parent_id, created_at, id,
+            postgresql_where=text('deleted_at IS NULL')
+        ),
+        # A user's replies, newest first
+        Index('ix_replies_author_created', author_id, created_at.desc(), id.desc()),
+        # Site-wide feed of the newest live replies
+        Index(
+            'ix_replies_recent', created_at.desc(), id.desc(),
+            postgresql_where=text('deleted_at IS NULL')
+        ),
+        # Full-text search over live reply bodies (PostgreSQL only)
+        Index(
+            'ix_replies_content_fts', func.to_tsvector(text("'simple'"), content),
+            postgresql_using='gin',
+            postgresql_where=text('deleted_at IS NULL')
+        ).ddl_if(dialect='postgresql'),
+    )
     
     # Relationships
     post = relationship("Post", back_populates="replies")
@@ -132,39 +180,66 @@ class Reply(Base):
     @property
     def depth(self):
         """Calculate the depth of this reply in the thread"""
-        if self.parent is None:
-            return 0
-        return self.parent.depth + 1
+        if self.path is None:
+            # Not flushed yet; walk the parents instead
+            return 0 if self.parent is None else self.parent.depth + 1
+        return self.path.count("/") - 1
+    
+    @property
+    def ancestor_ids(self):
+        """Ids of this reply's ancestors from its path (root first)"""
+        return [int(segment) for segment in self.path.strip("/").split("/") if segment]
     
     @property
     def thread_root(self):
         """Get the root reply of this thread"""
-        if self.parent is None:
-            return self
-        return self.parent.thread_root
+        session = object_session(self)
+        if self.path is None or session is None:
+            # Not flushed yet; walk the parents instead
+            return self if self.parent is None else self.parent.thread_root
+        ancestor_ids = self.ancestor_ids
+        return session.get(Reply, ancestor_ids[0]) if ancestor_ids else self
     
     @property
     def ancestors(self):
         """Get all ancestors of this reply (immediate parent first, root last)"""
-        ancestors = []
-        current = self.parent
-        while current is not None:
-            ancestors.append(current)
-            current = current.parent
-        return ancestors
+        session = object_session(self)
+        if self.path is None or session is None:
+            # Not flushed yet; walk the parents instead
+            return [] if self.parent is None else [self.parent] + self.parent.ancestors
+        ancestor_ids = self.ancestor_ids
+        if not ancestor_ids:
+            return []
+        # The whole chain in one query, whatever the depth
+        by_id = {reply.id: reply for reply in session.query(Reply).filter(Reply.id.in_(ancestor_ids))}
+        return [by_id[reply_id] for reply_id in reversed(ancestor_ids) if reply_id in by_id]
     
     @property
     def descendants(self):
-        """Get all descendants of this reply"""
-        descendants = []
-        for child in self.children:
-            descendants.append(child)
-            descendants.extend(child.descendants)
-        return descendants
+        """Get all descendants of this reply (depth-first, siblings by creation time)"""
+        session = object_session(self)
+        if self.path is None or session is None:
+            # Not flushed yet; walk the children instead
+            descendants = []
+            for child in self.children:
+                descendants.append(child)
+                descendants.extend(child.descendants)
+            return descendants
+        # The whole subtree in one path-prefix range scan
+        subtree = session.query(Reply).filter(Reply.path.startswith(f"{self.path}{self.id}/")).all()
+        return depth_first(subtree, self.id)
     
     @property
     def siblings(self):
         """Get all siblings of this reply (replies with same parent)"""
+        session = object_session(self)
+        if self.id is not None and session is not None:
+            # One query instead of loading every reply of the post or parent
+            return session.query(Reply).filter(
+                Reply.post_id == self.post_id,
+                Reply.parent_id == self.parent_id,  # IS NULL for top-level replies
+                Reply.id != self.id
+            ).order_by(Reply.created_at, Reply.id).all()
         if self.parent is None:
             # Root level replies are siblings of each other
             return [reply for reply in self.post.replies if reply.parent is None and reply.id != self.id]
@@ -173,31 +248,54 @@ class Reply(Base):
     
     def is_ancestor_of(self, other_reply):
         """Check if this reply is an ancestor of another reply"""
+        if self.id is not None and other_reply.path is not None:
+            return self.id in other_reply.ancestor_ids
         return self in other_reply.ancestors
     
     @property
     def can_reply_to(self):
         """Check if replies can be made to this reply (respects max depth)"""
-        MAX_DEPTH = 10
-        return self.depth < MAX_DEPTH
-    
-    @property
-    def upvote_count(self):
-        """Count upvotes for this reply"""
-        return len([v for v in self.votes if v.vote_type == VoteType.upvote.value])
-    
-    @property
-    def downvote_count(self):
-        """Count downvotes for this reply"""
-        return len([v for v in self.votes if v.vote_type == VoteType.downvote.value])
+        return self.depth < MAX_REPLY_DEPTH
     
-    @property
+    @hybrid_property
     def net_votes(self):
         """Calculate net votes (upvotes - downvotes)"""
         return self.upvote_count - self.downvote_count
 
+def depth_first(replies, root_id):
+    """Order the fetched subtree under root_id depth-first, siblings by creation time"""
+    children = defaultdict(list)
+    for reply in sorted(replies, key=lambda r: (r.created_at, r.id)):
+        children[reply.parent_id].append(reply)
+    
+    ordered = []
+    stack = list(reversed(children[root_id]))
+    while stack:
+        reply = stack.pop()
+        ordered.append(reply)
+        stack.extend(reversed(children[reply.id]))
+    return ordered
+
+def _set_reply_path(mapper, connection, target):
+    """Fill in path for replies inserted through the ORM"""
+    if target.path is not None:
+        return
+    if target.parent_id is None:
+        target.path = "/"
+        return
+    parent = target.__dict__.get("parent")
+    if parent is not None and parent.path is not None:
+        parent_path = parent.path
+    else:
+        parent_path = connection.scalar(select(Reply.path).where(Reply.id == target.parent_id))
+    target.path = f"{parent_path}{target.parent_id}/"
+
+event.listen(Reply, "before_insert", _set_reply_path)
+
 class Vote(Base):
     __tablename__ = "votes"
+    # Fetch onupdate values with RETURNING rather than a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -218,6 +316,13 @@ class Vote(Base):
             '(post_id IS NOT NULL AND reply_id IS NULL) OR (post_id IS NULL AND reply_id IS NOT NULL)',
             name='vote_target_constraint'
         ),
+        # Vote tallies per target (optionally since a time): GROUP BY
+        # vote_type reads only the index
+        Index('ix_votes_post_type', post_id, vote_type, created_at),
+        Index('ix_votes_reply_type', reply_id, vote_type, created_at),
+        # A user's voting history, newest first (user/target lookups use the
+        # unique constraints above)
+        Index('ix_votes_user_created', user_id, created_at.desc(), id.desc()),
     )
     
     # Relationships
@@ -225,6 +330,72 @@ class Vote(Base):
     post = relationship("Post", back_populates="votes")
     reply = relationship("Reply", back_populates="votes")
 
+# Keep posts/replies upvote_count and downvote_count in step with votes in
+# the database itself, so ORM flushes, Core statements and FK cascades all
+# count. Stale vote_type/target (UPDATE, DELETE) is taken off, the new one
+# (INSERT, UPDATE) added; a NULL target id matches no row.
+# Migration 006 runs these same DDL objects for existing databases.
+VOTE_COUNT_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION vote_count_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE posts SET
+            upvote_count = upvote_count - (OLD.vote_type = 'upvote')::int,
+            downvote_count = downvote_count - (OLD.vote_type = 'downvote')::int
+        WHERE id = OLD.post_id;
+        UPDATE replies SET
+            upvote_count = upvote_count - (OLD.vote_type = 'upvote')::int,
+            downvote_count = downvote_count - (OLD.vote_type = 'downvote')::int
+        WHERE id = OLD.reply_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE posts SET
+            upvote_count = upvote_count + (NEW.vote_type = 'upvote')::int,
+            downvote_count = downvote_count + (NEW.vote_type = 'downvote')::int
+        WHERE id = NEW.post_id;
+        UPDATE replies SET
+            upvote_count = upvote_count + (NEW.vote_type = 'upvote')::int,
+            downvote_count = downvote_count + (NEW.vote_type = 'downvote')::int
+        WHERE id = NEW.reply_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+
+VOTE_COUNT_TRIGGER = DDL(
+    "CREATE TRIGGER votes_count AFTER INSERT OR DELETE OR UPDATE OF vote_type, post_id, reply_id "
+    "ON votes FOR EACH ROW EXECUTE FUNCTION vote_count_trigger()"
+)
+
+def _sqlite_vote_count_trigger(name, event_clause, body):
+    return DDL(f"CREATE TRIGGER {name} AFTER {event_clause} ON votes BEGIN {body} END")
+
+def _sqlite_vote_count_delta(row, sign):
+    return "".join(
+        f"UPDATE {table} SET "
+        f"upvote_count = upvote_count {sign} ({row}.vote_type = 'upvote'), "
+        f"downvote_count = downvote_count {sign} ({row}.vote_type = 'downvote') "
+        f"WHERE id = {row}.{column}; "
+        for table, column in (("posts", "post_id"), ("replies", "reply_id"))
+    )
+
+for vote_count_ddl in (
+    VOTE_COUNT_FUNCTION.execute_if(dialect="postgresql"),
+    VOTE_COUNT_TRIGGER.execute_if(dialect="postgresql"),
+    _sqlite_vote_count_trigger(
+        "votes_count_insert", "INSERT", _sqlite_vote_count_delta("NEW", "+")
+    ).execute_if(dialect="sqlite"),
+    _sqlite_vote_count_trigger(
+        "votes_count_delete", "DELETE", _sqlite_vote_count_delta("OLD", "-")
+    ).execute_if(dialect="sqlite"),
+    _sqlite_vote_count_trigger(
+        "votes_count_update", "UPDATE OF vote_type, post_id, reply_id",
+        _sqlite_vote_count_delta("OLD", "-") + _sqlite_vote_count_delta("NEW", "+")
+    ).execute_if(dialect="sqlite"),
+):
+    event.listen(Vote.__table__, "after_create", vote_count_ddl)
+
 class Message(Base):
     __tablename__ = "messages"
     
@@ -237,6 +408,30 @@ class Message(Base):
     deleted_at = Column(DateTime(timezone=True), nullable=True)
     deleted_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     
+    # Indexes
+    __table_args__ = (
+        # One index per leg of the conversation OR, pre-sorted by time, live rows only
+        Index(
+            'ix_messages_conv_sr', 'sender_id', 'recipient_id', 'created_at',
+            postgresql_where=text('deleted_at IS NULL')
+        ),
+        Index(
+            'ix_messages_conv_rs', 'recipient_id', 'sender_id', 'created_at',
+            postgresql_where=text('deleted_at IS NULL')
+        ),
+        # Unread backlog only; sized by what is pending, not by history
+        Index(
+            'ix_messages_unread', 'recipient_id', 'sender_id',
+            postgresql_where=text('read_at IS NULL AND deleted_at IS NULL')
+        ),
+        # Full-text search over live message bodies (PostgreSQL only)
+        Index(
+            'ix_messages_content_fts', func.to_tsvector(text("'simple'"), content),
+            postgresql_using='gin',
+            postgresql_where=text('deleted_at IS NULL')
+        ).ddl_if(dialect='postgresql'),
+    )
+    
     # Relationships
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     recipient = relationship("User", foreign_keys=[recipient_id], back_populates="received_messages")
@@ -254,6 +449,22 @@ class RefreshToken(Base):
     # Relationships
     user = relationship("User", back_populates="refresh_tokens")
 
+# Refresh tokens can be re-issued by logging in again, so skip the WAL on
+# PostgreSQL; the table is emptied after a crash, which signs users out
+event.listen(
+    RefreshToken.__table__,
+    "after_create",
+    DDL("ALTER TABLE refresh_tokens SET UNLOGGED").execute_if(dialect="postgresql")
+)
+
+# Logged-out access tokens, by their jti claim, until they would have
+# expired anyway. Shared by every worker, unlike the in-process caches.
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(32), primary_key=True)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
 class ModerationAction(Base):
     __tablename__ = "moderation_actions"
     
@@ -266,6 +477,12 @@ class ModerationAction(Base):
     metadata = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
+    __table_args__ = (
+        # History of one target, and the moderation log filtered by type; newest first
+        Index('ix_moderation_actions_target', target_type, target_id, created_at.desc()),
+        Index('ix_moderation_actions_type_created', action_type, created_at.desc()),
+    )
+    
     # Relationships
     moderator = relationship("User", back_populates="moderation_actions")
 
@@ -1,31 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from typing import Optional
 
 from app.database import get_db
-from app.models.models import RefreshToken
 from app.schemas.auth import (
     UserRegister, UserLogin, UserResponse, TokenResponse, 
     TokenRefresh, LogoutResponse, ChangePassword, UserUpdate
 )
-from app.crud.auth import user_crud, refresh_token_crud
+from app.crud.auth import user_crud, refresh_token_crud, current_user_cache, invalidate_user_id
 from app.utils.auth import (
-    create_access_token, create_refresh_token, verify_token,
-    ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+    create_access_token, create_refresh_token, verify_token, forget_token, revoke_token,
+    ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS, SecurityConfig
 )
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
-security = HTTPBearer()
+# Missing credentials are answered with an explicit 401 below rather than
+# HTTPBearer's own exception
+security = HTTPBearer(auto_error=False)
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+def _not_authenticated() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"}
+    )
+
+def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ) -> UserResponse:
     """Get current authenticated user from JWT token"""
+    if credentials is None:
+        raise _not_authenticated()
+    
     token = credentials.credentials
-    payload = verify_token(token, "access")
+    payload = verify_token(token, "access", db)
     
     if payload is None:
         raise HTTPException(
@@ -42,6 +54,11 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"}
         )
     
+    # Fields were validated when cached; rebuild without revalidating
+    cached = current_user_cache.get(int(user_id))
+    if cached is not None:
+        return UserResponse.model_construct(**cached)
+    
     user = user_crud.get_user_by_id(db, int(user_id))
     if user is None:
         raise HTTPException(
@@ -57,29 +74,61 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"}
         )
     
-    return user
+    current_user = UserResponse.model_validate(user)
+    current_user_cache.set(current_user.id, current_user.model_dump())
+    return current_user
 
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
-    """Register a new user account"""
-    
-    # Check if username already exists
-    if user_crud.check_username_exists(db, user_data.username):
+def get_current_user_for_write(
+    current_user: UserResponse = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> UserResponse:
+    """
+    get_current_user for requests that change state. is_active is re-read
+    from the database, so a ban or deactivation made on any worker applies
+    at once; reads may see the cached user for up to 30 seconds.
+    """
+    if not user_crud.is_user_active(db, current_user.id):
+        # Stop this worker's reads from serving the stale user as well
+        invalidate_user_id(current_user.id)
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User account is deactivated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return current_user
+
+def _raise_registration_conflict(conflicts: dict) -> None:
+    """Raise the 400 for a taken username or email, if any"""
+    if conflicts["username"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already exists"
         )
     
-    # Check if email already exists
-    if user_crud.check_email_exists(db, user_data.email):
+    if conflicts["email"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already exists"
         )
+
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
+    """Register a new user account"""
+    
+    # One query tells which of username and email are taken
+    _raise_registration_conflict(user_crud.check_conflicts(db, user_data.username, user_data.email))
     
     try:
         user = user_crud.create_user(db, user_data)
         return user
+    except IntegrityError:
+        # A concurrent registration took the name or email after the check
+        db.rollback()
+        _raise_registration_conflict(user_crud.check_conflicts(db, user_data.username, user_data.email))
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to create user account"
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -87,7 +136,7 @@ async def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
         )
 
 @router.post("/login", response_model=TokenResponse)
-async def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
+def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
     """Authenticate user and return access token"""
     
     user = user_crud.authenticate_user(db, login_data.username, login_data.password)
@@ -104,7 +153,7 @@ async def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
     # Create tokens
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "username": user.username},
+        data={"sub": str(user.id), "username": user.username, "is_superuser": user.is_superuser},
         expires_delta=access_token_expires
     )
     
@@ -112,12 +161,12 @@ async def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
         data={"sub": str(user.id), "username": user.username}
     )
     
-    # Store refresh token in database
+    # Store refresh token, retiring the oldest sessions past the limit
     refresh_expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-    refresh_token_crud.create_refresh_token(db, user.id, refresh_token, refresh_expires_at)
-    
-    # Limit user tokens
-    refresh_token_crud.limit_user_tokens(db, user.id)
+    refresh_token_crud.issue_refresh_token(
+        db, user.id, refresh_token, refresh_expires_at,
+        max_tokens=SecurityConfig.MAX_REFRESH_TOKENS_PER_USER
+    )
     
     return TokenResponse(
         access_token=access_token,
@@ -128,7 +177,7 @@ async def login_user(login_data: UserLogin, db: Session = Depends(get_db)):
     )
 
 @router.post("/refresh", response_model=TokenResponse)
-async def refresh_access_token(refresh_data: TokenRefresh, db: Session = Depends(get_db)):
+def refresh_access_token(refresh_data: TokenRefresh, db: Session = Depends(get_db)):
     """Refresh access token using refresh token"""
     
     # Verify refresh token format
@@ -140,15 +189,15 @@ async def refresh_access_token(refresh_data: TokenRefresh, db: Session = Depends
         )
     
     # Check if refresh token exists and is active
-    db_token = refresh_token_crud.get_refresh_token(db, refresh_data.refresh_token)
-    if not db_token:
+    user_id = refresh_token_crud.get_refresh_token_user_id(db, refresh_data.refresh_token)
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token"
         )
     
     # Get user
-    user = user_crud.get_user_by_id(db, db_token.user_id)
+    user = user_crud.get_user_by_id(db, user_id)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -158,7 +207,7 @@ async def refresh_access_token(refresh_data: TokenRefresh, db: Session = Depends
     # Create new access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": str(user.id), "username": user.username},
+        data={"sub": str(user.id), "username": user.username, "is_superuser": user.is_superuser},
         expires_delta=access_token_expires
     )
     
@@ -170,14 +219,16 @@ async def refresh_access_token(refresh_data: TokenRefresh, db: Session = Depends
     )
 
 @router.post("/logout", response_model=LogoutResponse)
-async def logout_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+def logout_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     db: Session = Depends(get_db)
 ):
     """Logout user and revoke all refresh tokens"""
+    if credentials is None:
+        raise _not_authenticated()
     
     token = credentials.credentials
-    payload = verify_token(token, "access")
+    payload = verify_token(token, "access", db)
     
     if payload is None:
         raise HTTPException(
@@ -185,6 +236,9 @@ async def logout_user(
             detail="Invalid token"
         )
     
+    # The access token itself stops working now, not at its expiry
+    forget_token(token, "access")
+    revoke_token(db, payload)
     user_id = payload.get("sub")
     if user_id:
         # Revoke all refresh tokens for the user
@@ -198,9 +252,9 @@ async def get_current_user_info(current_user: UserResponse = Depends(get_current
     return current_user
 
 @router.put("/me", response_model=UserResponse)
-async def update_current_user(
+def update_current_user(
     user_update: UserUpdate,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: UserResponse = Depends(get_current_user_for_write),
     db: Session = Depends(get_db)
 ):
     """Update current user information"""
@@ -222,9 +276,9 @@ async def update_current_user(
     return updated_user
 
 @router.post("/change-password", response_model=dict)
-async def change_user_password(
+def change_user_password(
     password_data: ChangePassword,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: UserResponse = Depends(get_current_user_for_write),
     db: Session = Depends(get_db)
 ):
     """Change user password"""
@@ -245,8 +299,8 @@ async def change_user_password(
     return {"message": message}
 
 @router.delete("/me", response_model=dict)
-async def deactivate_current_user(
-    current_user: UserResponse = Depends(get_current_user),
+def deactivate_current_user(
+    current_user: UserResponse = Depends(get_current_user_for_write),
     db: Session = Depends(get_db)
 ):
     """Deactivate current user account"""
@@ -264,44 +318,26 @@ async def deactivate_current_user(
     return {"message": "Account deactivated successfully"}
 
 @router.get("/sessions", response_model=list[dict])
-async def get_user_sessions(
+def get_user_sessions(
     current_user: UserResponse = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get all active sessions for current user"""
-    
-    active_tokens = refresh_token_crud.get_user_active_tokens(db, current_user.id)
-    
-    sessions = []
-    for token in active_tokens:
-        sessions.append({
-            "id": token.id,
-            "created_at": token.created_at,
-            "expires_at": token.expires_at
-        })
-    
-    return sessions
+    """Get all active sessions for current user, newest first"""
+    return refresh_token_crud.get_user_sessions(db, current_user.id)
 
 @router.delete("/sessions/{session_id}")
-async def revoke_user_session(
+def revoke_user_session(
     session_id: int,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: UserResponse = Depends(get_current_user_for_write),
     db: Session = Depends(get_db)
 ):
     """Revoke a specific user session"""
     
-    # Get the refresh token
-    db_token = db.query(RefreshToken).filter(
-        RefreshToken.id == session_id,
-        RefreshToken.user_id == current_user.id
-    ).first()
-    
-    if not db_token:
+    # One UPDATE scoped to the caller's tokens; no row is loaded first
+    if not refresh_token_crud.revoke_user_session(db, current_user.id, session_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Session not found"
         )
     
-    refresh_token_crud.revoke_refresh_token(db, db_token.token)
-    
     return {"message": "Session revoked successfully"}
\ No newline at end of file
@@ -1,11 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from typing import List, Optional
 from app.database import get_db
 from app.schemas.channel import ChannelCreate, ChannelResponse
-from app.crud.channel import create_channel, get_channel, get_channels
-from app.models.models import User
+from app.crud.channel import channel_list_cache, create_channel, get_channel, get_channels
+from app.utils.responses import FastJSONResponse
 
 
 router = APIRouter(prefix="/channels", tags=["channels"])
@@ -36,12 +36,17 @@ def get_current_user_id(x_user_id: Optional[str] = Header(None)) -> int:
 @router.get("", response_model=dict)
 def list_channels(db: Session = Depends(get_db)):
     """Get all channels."""
-    channels = get_channels(db)
-    return {
-        "data": [ChannelResponse.model_validate(channel) for channel in channels],
-        "success": True,
-        "message": "Channels retrieved successfully"
-    }
+    # A hit returns the rendered bytes: no query and no validation
+    body = channel_list_cache.get("all")
+    if body is None:
+        channels = get_channels(db)
+        body = FastJSONResponse({
+            "data": [ChannelResponse.model_validate(channel).model_dump(mode="json") for channel in channels],
+            "success": True,
+            "message": "Channels retrieved successfully"
+        }).body
+        channel_list_cache.set("all", body)
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{channel_id}", response_model=dict)
@@ -74,36 +79,35 @@ def create_new_channel(
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Create a new channel."""
-    # Check if user exists
-    user = db.query(User).filter(User.id == current_user_id).first()
-    if not user:
+    try:
+        db_channel = create_channel(db, channel, current_user_id)
+    except IntegrityError:
+        db.rollback()
         raise HTTPException(
-            status_code=401,
+            status_code=400,
             detail={
                 "error": {
-                    "code": "USER_NOT_FOUND",
-                    "message": "User not found"
+                    "code": "CHANNEL_EXISTS",
+                    "message": "Channel with this name already exists"
                 },
                 "success": False
             }
         )
     
-    try:
-        db_channel = create_channel(db, channel, current_user_id)
-        return {
-            "data": ChannelResponse.model_validate(db_channel),
-            "success": True,
-            "message": "Channel created successfully"
-        }
-    except IntegrityError:
-        db.rollback()
+    if db_channel is None:
         raise HTTPException(
-            status_code=400,
+            status_code=401,
             detail={
                 "error": {
-                    "code": "CHANNEL_EXISTS",
-                    "message": "Channel with this name already exists"
+                    "code": "USER_NOT_FOUND",
+                    "message": "User not found"
                 },
                 "success": False
             }
-        )
\ No newline at end of file
+        )
+    
+    return {
+        "data": ChannelResponse.model_validate(db_channel),
+        "success": True,
+        "message": "Channel created successfully"
+    }
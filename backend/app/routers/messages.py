@@ -21,12 +21,12 @@ def get_current_user_id() -> int:
 @router.get("/messages", response_model=List[MessageResponse])
 def get_conversation(
     other_user_id: int = Query(..., description="ID of the other user in the conversation"),
-    skip: int = Query(0, ge=0, description="Number of messages to skip"),
+    before_id: Optional[int] = Query(None, description="Id of the oldest message already loaded; returns the page before it"),
     limit: int = Query(100, ge=1, le=500, description="Maximum number of messages to return"),
     db: Session = Depends(get_db),
     current_user_id: int = Depends(get_current_user_id)
 ):
-    """Get conversation between current user and another user"""
+    """Get conversation between current user and another user, oldest first"""
     
     # Verify other user exists
     other_user = message_crud.get_user_by_id(db, other_user_id)
@@ -37,7 +37,7 @@ def get_conversation(
         )
     
     messages = message_crud.get_conversation(
-        db, current_user_id, other_user_id, skip, limit
+        db, current_user_id, other_user_id, before_id, limit
     )
     
     return messages
@@ -50,14 +50,6 @@ def create_message(
 ):
     """Create a new message"""
     
-    # Verify recipient exists
-    recipient = message_crud.get_user_by_id(db, message.recipient_id)
-    if not recipient:
-        raise HTTPException(
-            status_code=404,
-            detail="Recipient not found"
-        )
-    
     # Prevent sending message to self
     if message.recipient_id == current_user_id:
         raise HTTPException(
@@ -65,7 +57,13 @@ def create_message(
             detail="Cannot send message to yourself"
         )
     
+    # The insert only happens if the recipient exists
     created_message = message_crud.create_message(db, message, current_user_id)
+    if created_message is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Recipient not found"
+        )
     return created_message
 
 @router.get("/conversations", response_model=List[ConversationResponse])
@@ -86,16 +84,15 @@ def mark_messages_as_read(
 ):
     """Mark all messages from another user as read"""
     
-    # Verify other user exists
-    other_user = message_crud.get_user_by_id(db, other_user_id)
-    if not other_user:
+    marked_count = message_crud.mark_messages_as_read(db, current_user_id, other_user_id)
+    
+    # Only a no-op update needs telling apart from an unknown user
+    if not marked_count and not message_crud.user_exists(db, other_user_id):
         raise HTTPException(
             status_code=404,
             detail="User not found"
         )
     
-    marked_count = message_crud.mark_messages_as_read(db, current_user_id, other_user_id)
-    
     return MarkAsReadResponse(marked_as_read=marked_count)
 
 @router.get("/messages/unread-count", response_model=UnreadCountResponse)
@@ -119,16 +116,15 @@ def search_messages(
 ):
     """Search messages in a conversation"""
     
-    # Verify other user exists
-    other_user = message_crud.get_user_by_id(db, other_user_id)
-    if not other_user:
+    messages = message_crud.search_messages(db, current_user_id, other_user_id, query, limit)
+    
+    # Only an empty result needs telling apart from an unknown user
+    if not messages and not message_crud.user_exists(db, other_user_id):
         raise HTTPException(
             status_code=404,
             detail="User not found"
         )
     
-    messages = message_crud.search_messages(db, current_user_id, other_user_id, query, limit)
-    
     return messages
 
 @router.delete("/messages/{message_id}", response_model=MessageDeleteResponse)
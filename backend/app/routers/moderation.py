@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Query
+from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -6,79 +7,107 @@ from datetime import datetime
 from backend.app.database import get_db
 from backend.app.crud.moderation import ModerationCRUD
 from backend.app.schemas.moderation import (
-    ModerationActionResponse, ModerationLogResponse, ModerationStatsResponse,
+    ModerationActionPage, ModerationActionResponse, ModerationLogResponse,
+    ModerationStatsResponse,
     DeleteContentRequest, FlagContentRequest, ApproveContentRequest,
     WarnUserRequest, BanUserRequest, ModerationLogFilters,
     ActionType, TargetType
 )
-from backend.app.models.models import User
-from backend.app.auth.dependencies import get_current_user
+from backend.app.utils.pagination import next_cursor
+from backend.app.auth.dependencies import security
+from backend.app.utils.auth import verify_token
 
 router = APIRouter(prefix="/api/moderation", tags=["moderation"])
 
 
-def require_moderator(current_user: User = Depends(get_current_user)):
-    """Dependency to ensure user has moderation permissions"""
-    if not current_user.is_superuser:
+def require_moderator(
+    request: Request,
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> int:
+    """
+    Dependency returning the id of the authenticated moderator.
+    Tokens without the is_superuser claim are refused without a query. A
+    claimed moderator is confirmed through is_user_moderator: from the
+    database for moderation actions, so a ban or demotion on any worker
+    stops them at once, and from the per-worker cache for reads, which
+    may lag by up to a minute.
+    """
+    payload = verify_token(credentials.credentials, "access", db)
+    if payload is None or payload.get("sub") is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authentication credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    user_id = int(payload["sub"])
+    fresh = request.method != "GET"
+    if not payload.get("is_superuser") or not ModerationCRUD(db).is_user_moderator(user_id, fresh):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions for moderation actions"
         )
-    return current_user
+    return user_id
 
 
 @router.delete("/posts/{post_id}")
-async def delete_post(
+def delete_post(
     post_id: int,
     request: DeleteContentRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Delete a post (soft delete)"""
-    moderation = ModerationCRUD(db)
+    # Audit rows are written by a background task after the response is sent
+    moderation = ModerationCRUD(db, defer_audit=True)
     
-    success = moderation.delete_post(post_id, current_user.id, request.reason)
+    success = moderation.delete_post(post_id, current_moderator_id, request.reason)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
     
+    background_tasks.add_task(moderation.write_audit)
     return {"message": "Post deleted successfully"}
 
 
 @router.delete("/replies/{reply_id}")
-async def delete_reply(
+def delete_reply(
     reply_id: int,
     request: DeleteContentRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Delete a reply (soft delete)"""
-    moderation = ModerationCRUD(db)
+    moderation = ModerationCRUD(db, defer_audit=True)
     
-    success = moderation.delete_reply(reply_id, current_user.id, request.reason)
+    success = moderation.delete_reply(reply_id, current_moderator_id, request.reason)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Reply not found"
         )
     
+    background_tasks.add_task(moderation.write_audit)
     return {"message": "Reply deleted successfully"}
 
 
 @router.put("/posts/{post_id}/flag")
-async def flag_post(
+def flag_post(
     post_id: int,
     request: FlagContentRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Flag a post for review"""
     moderation = ModerationCRUD(db)
     
     success = moderation.flag_content(
-        TargetType.POST, post_id, current_user.id, request.reason, request.metadata
+        TargetType.POST, post_id, current_moderator_id, request.reason, request.metadata
     )
     if not success:
         raise HTTPException(
@@ -90,17 +119,17 @@ async def flag_post(
 
 
 @router.put("/replies/{reply_id}/flag")
-async def flag_reply(
+def flag_reply(
     reply_id: int,
     request: FlagContentRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Flag a reply for review"""
     moderation = ModerationCRUD(db)
     
     success = moderation.flag_content(
-        TargetType.REPLY, reply_id, current_user.id, request.reason, request.metadata
+        TargetType.REPLY, reply_id, current_moderator_id, request.reason, request.metadata
     )
     if not success:
         raise HTTPException(
@@ -112,17 +141,17 @@ async def flag_reply(
 
 
 @router.put("/posts/{post_id}/approve")
-async def approve_post(
+def approve_post(
     post_id: int,
     request: ApproveContentRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Approve a flagged post"""
     moderation = ModerationCRUD(db)
     
     success = moderation.approve_content(
-        TargetType.POST, post_id, current_user.id, request.reason
+        TargetType.POST, post_id, current_moderator_id, request.reason
     )
     if not success:
         raise HTTPException(
@@ -134,17 +163,17 @@ async def approve_post(
 
 
 @router.put("/replies/{reply_id}/approve")
-async def approve_reply(
+def approve_reply(
     reply_id: int,
     request: ApproveContentRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Approve a flagged reply"""
     moderation = ModerationCRUD(db)
     
     success = moderation.approve_content(
-        TargetType.REPLY, reply_id, current_user.id, request.reason
+        TargetType.REPLY, reply_id, current_moderator_id, request.reason
     )
     if not success:
         raise HTTPException(
@@ -156,17 +185,17 @@ async def approve_reply(
 
 
 @router.post("/users/{user_id}/warn")
-async def warn_user(
+def warn_user(
     user_id: int,
     request: WarnUserRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Issue a warning to a user"""
     moderation = ModerationCRUD(db)
     
     success = moderation.warn_user(
-        user_id, current_user.id, request.reason, request.details
+        user_id, current_moderator_id, request.reason, request.details
     )
     if not success:
         raise HTTPException(
@@ -178,17 +207,18 @@ async def warn_user(
 
 
 @router.post("/users/{user_id}/ban")
-async def ban_user(
+def ban_user(
     user_id: int,
     request: BanUserRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Ban a user temporarily or permanently"""
-    moderation = ModerationCRUD(db)
+    moderation = ModerationCRUD(db, defer_audit=True)
     
     success = moderation.ban_user(
-        user_id, current_user.id, request.reason, 
+        user_id, current_moderator_id, request.reason, 
         request.duration_days, request.permanent
     )
     if not success:
@@ -197,11 +227,12 @@ async def ban_user(
             detail="User not found"
         )
     
+    background_tasks.add_task(moderation.write_audit)
     return {"message": "User banned successfully"}
 
 
-@router.get("/logs", response_model=List[ModerationActionResponse])
-async def get_moderation_logs(
+@router.get("/logs", response_model=ModerationActionPage)
+def get_moderation_logs(
     action_type: Optional[ActionType] = Query(None),
     target_type: Optional[TargetType] = Query(None),
     moderator_id: Optional[int] = Query(None),
@@ -209,11 +240,11 @@ async def get_moderation_logs(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     limit: int = Query(50, ge=1, le=1000),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
-    """Get moderation logs with optional filtering"""
+    """Get moderation logs with optional filtering, newest first"""
     filters = ModerationLogFilters(
         action_type=action_type,
         target_type=target_type,
@@ -222,20 +253,23 @@ async def get_moderation_logs(
         start_date=start_date,
         end_date=end_date,
         limit=limit,
-        offset=offset
+        cursor=cursor
     )
     
     moderation = ModerationCRUD(db)
-    actions = moderation.get_moderation_actions(filters, limit, offset)
+    try:
+        actions = moderation.get_moderation_actions(filters, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    return {"data": actions}
+    return {"data": actions, "next_cursor": next_cursor(actions, limit)}
 
 
 @router.get("/stats", response_model=ModerationStatsResponse)
-async def get_moderation_stats(
+def get_moderation_stats(
     days: int = Query(30, ge=1, le=365),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Get moderation statistics"""
     moderation = ModerationCRUD(db)
@@ -245,10 +279,10 @@ async def get_moderation_stats(
 
 
 @router.get("/flagged", response_model=List[ModerationActionResponse])
-async def get_flagged_content(
+def get_flagged_content(
     limit: int = Query(50, ge=1, le=1000),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Get all flagged content awaiting review"""
     moderation = ModerationCRUD(db)
@@ -258,10 +292,10 @@ async def get_flagged_content(
 
 
 @router.get("/users/{user_id}/history", response_model=List[ModerationLogResponse])
-async def get_user_moderation_history(
+def get_user_moderation_history(
     user_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Get moderation history for a specific user"""
     moderation = ModerationCRUD(db)
@@ -271,11 +305,11 @@ async def get_user_moderation_history(
 
 
 @router.get("/content/{target_type}/{target_id}/history", response_model=List[ModerationActionResponse])
-async def get_content_moderation_history(
+def get_content_moderation_history(
     target_type: TargetType,
     target_id: int,
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
     """Get moderation history for specific content"""
     moderation = ModerationCRUD(db)
@@ -285,12 +319,17 @@ async def get_content_moderation_history(
 
 
 @router.get("/banned-users")
-async def get_banned_users(
+def get_banned_users(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="Id of the last user on the previous page"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(require_moderator)
+    current_moderator_id: int = Depends(require_moderator)
 ):
-    """Get all currently banned users"""
+    """Get currently banned users, in id order"""
     moderation = ModerationCRUD(db)
-    banned = moderation.get_banned_users()
+    banned = moderation.get_banned_users(cursor, limit)
     
-    return {"data": [{"id": user.id, "username": user.username, "email": user.email} for user in banned]}
\ No newline at end of file
+    return {
+        "data": banned,
+        "next_cursor": banned[-1]["id"] if len(banned) == limit else None
+    }
\ No newline at end of file
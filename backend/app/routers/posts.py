@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from pydantic import TypeAdapter
 from app.database import get_db
 from app.schemas.post import PostCreate, PostResponse
-from app.crud.post import create_post, get_post, get_posts_by_channel
+from app.crud.post import create_post, get_post, get_posts_by_channel, post_references_exist
 from app.crud.channel import get_channel
-from app.models.models import User
+from app.utils.pagination import next_cursor
+from app.utils.responses import FastJSONResponse
 
 
 router = APIRouter(tags=["posts"])
 
+# Validates a whole page of ORM rows in one pydantic-core call
+_posts_adapter = TypeAdapter(List[PostResponse])
+
 
 def get_current_user_id(x_user_id: Optional[str] = Header(None)) -> int:
     """Simplified authentication for testing - gets user ID from header."""
@@ -34,8 +39,18 @@ def get_current_user_id(x_user_id: Optional[str] = Header(None)) -> int:
 
 
 @router.get("/channels/{channel_id}/posts", response_model=dict)
-def list_posts_by_channel(channel_id: int, db: Session = Depends(get_db)):
-    """Get all posts in a specific channel."""
+def list_posts_by_channel(
+    channel_id: int,
+    cursor: Optional[str] = Query(None, description="Cursor returned with the previous page"),
+    limit: int = Query(100, ge=1, le=100, description="Maximum number of posts to return"),
+    db: Session = Depends(get_db)
+):
+    """
+    Get posts in a specific channel, newest first.
+    
+    - **cursor**: Continue after the previous page; returned as next_cursor
+    - **limit**: Maximum number of posts to return, at most 100
+    """
     # Check if channel exists
     channel = get_channel(db, channel_id)
     if not channel:
@@ -50,12 +65,28 @@ def list_posts_by_channel(channel_id: int, db: Session = Depends(get_db)):
             }
         )
     
-    posts = get_posts_by_channel(db, channel_id)
-    return {
-        "data": [PostResponse.model_validate(post) for post in posts],
+    try:
+        posts = get_posts_by_channel(db, channel_id, cursor, limit)
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "INVALID_CURSOR",
+                    "message": "Invalid pagination cursor"
+                },
+                "success": False
+            }
+        )
+    
+    # Returned as a Response so FastAPI doesn't validate and re-encode
+    # the already validated page against response_model
+    return FastJSONResponse({
+        "data": _posts_adapter.validate_python(posts, from_attributes=True),
+        "next_cursor": next_cursor(posts, limit),
         "success": True,
         "message": "Posts retrieved successfully"
-    }
+    })
 
 
 @router.get("/posts/{post_id}", response_model=dict)
@@ -89,9 +120,9 @@ def create_new_post(
     current_user_id: int = Depends(get_current_user_id)
 ):
     """Create a new post in a channel."""
-    # Check if channel exists
-    channel = get_channel(db, channel_id)
-    if not channel:
+    # Both existence checks in one round trip, without loading either row
+    channel_exists, user_exists = post_references_exist(db, channel_id, current_user_id)
+    if not channel_exists:
         raise HTTPException(
             status_code=404,
             detail={
@@ -103,9 +134,7 @@ def create_new_post(
             }
         )
     
-    # Check if user exists
-    user = db.query(User).filter(User.id == current_user_id).first()
-    if not user:
+    if not user_exists:
         raise HTTPException(
             status_code=401,
             detail={
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from backend.app.database import get_db
 from backend.app.crud import reply as reply_crud
+from backend.app.utils.pagination import cursor_after, next_cursor
+from backend.app.utils.responses import FastJSONResponse
 from backend.app.schemas.reply import (
     ReplyCreate, ReplyUpdate, ReplyResponse, ReplyThread, 
     ReplySearch, BulkDeleteRequest, BulkDeleteResponse
@@ -10,10 +12,17 @@ from backend.app.schemas.reply import (
 
 router = APIRouter()
 
+def set_next_cursor(response: Response, replies: list, limit: int) -> None:
+    """Expose the keyset cursor for the following page, if there is one"""
+    cursor = next_cursor(replies, limit)
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
+
 @router.get("/posts/{post_id}/replies", response_model=List[ReplyResponse])
 def get_post_replies(
     post_id: int,
-    skip: int = Query(0, ge=0, description="Number of replies to skip"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    skip: int = Query(0, ge=0, description="Number of replies to skip (deprecated for the flat format; use cursor)"),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of replies to return"),
     threaded: bool = Query(False, description="Return replies in threaded format"),
     db: Session = Depends(get_db)
@@ -22,17 +31,28 @@ def get_post_replies(
     Get all replies for a specific post.
     
     - **post_id**: ID of the post
-    - **skip**: Number of replies to skip (for pagination)
+    - **cursor**: Continue after the previous page (flat format); the next
+      cursor is returned in the X-Next-Cursor response header
+    - **skip**: Number of replies to skip; the only paging the threaded
+      format has, deprecated for the flat format (use cursor)
     - **limit**: Maximum number of replies to return
     - **threaded**: If True, returns replies in threaded hierarchy
     """
     try:
         if threaded:
-            replies = reply_crud.get_post_replies_threaded(db, post_id, skip, limit)
-        else:
-            replies = reply_crud.get_post_replies(db, post_id, skip, limit)
+            return reply_crud.get_post_replies_threaded(db, post_id, skip, limit)
         
-        return replies
+        # Up to 1000 rows: serialize them 200 at a time as they are fetched,
+        # keeping only the JSON-ready dicts instead of the ORM list plus a
+        # validated copy of it
+        data, last = [], None
+        for reply in reply_crud.iter_post_replies(db, post_id, cursor, limit, skip):
+            data.append(ReplyResponse.model_validate(reply).model_dump(mode="json"))
+            last = reply
+        headers = {"X-Next-Cursor": cursor_after(last)} if len(data) == limit else None
+        return FastJSONResponse(data, headers=headers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching replies: {str(e)}")
 
@@ -130,16 +150,20 @@ def get_reply_thread(
 
 @router.get("/replies/{reply_id}/children", response_model=List[ReplyResponse])
 def get_reply_children(
+    response: Response,
     reply_id: int,
-    skip: int = Query(0, ge=0, description="Number of children to skip"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    skip: int = Query(0, ge=0, description="Number of children to skip", deprecated=True),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of children to return"),
     db: Session = Depends(get_db)
 ):
     """
-    Get direct children of a specific reply.
+    Get direct children of a specific reply, oldest first.
     
     - **reply_id**: ID of the parent reply
-    - **skip**: Number of children to skip (for pagination)
+    - **cursor**: Continue after the previous page; the next cursor is
+      returned in the X-Next-Cursor response header
+    - **skip**: Number of children to skip (deprecated; use cursor)
     - **limit**: Maximum number of children to return
     """
     # First verify the parent reply exists
@@ -147,7 +171,12 @@ def get_reply_children(
     if not parent_reply:
         raise HTTPException(status_code=404, detail="Reply not found")
     
-    children = reply_crud.get_reply_children(db, reply_id, skip, limit)
+    try:
+        children = reply_crud.get_reply_children(db, reply_id, cursor, limit, skip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    set_next_cursor(response, children, limit)
     return children
 
 @router.get("/replies/{reply_id}/ancestors", response_model=List[ReplyResponse])
@@ -197,22 +226,35 @@ def get_reply_siblings(
 
 @router.get("/posts/{post_id}/replies/search", response_model=ReplySearch)
 def search_post_replies(
+    response: Response,
     post_id: int,
     q: str = Query(..., min_length=1, max_length=100, description="Search term"),
-    skip: int = Query(0, ge=0, description="Number of results to skip"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    skip: int = Query(0, ge=0, description="Number of results to skip", deprecated=True),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of results to return"),
     db: Session = Depends(get_db)
 ):
     """
-    Search replies within a specific post.
+    Search replies within a specific post, oldest first.
     
     - **post_id**: ID of the post to search in
     - **q**: Search term
-    - **skip**: Number of results to skip (for pagination)
+    - **cursor**: Continue after the previous page; the next cursor is
+      returned in the X-Next-Cursor response header
+    - **skip**: Number of results to skip (deprecated; use cursor)
     - **limit**: Maximum number of results to return
     """
-    replies = reply_crud.search_replies(db, post_id, q, skip, limit)
-    total_count = reply_crud.count_post_replies(db, post_id)
+    try:
+        replies = reply_crud.search_replies(db, post_id, q, cursor, limit, skip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    set_next_cursor(response, replies, limit)
+    # A short first page already holds every match; only count otherwise
+    if not cursor and not skip and len(replies) < limit:
+        total_count = len(replies)
+    else:
+        total_count = reply_crud.count_search_matches(db, post_id, q)
     
     return ReplySearch(
         replies=replies,
@@ -222,32 +264,50 @@ def search_post_replies(
 
 @router.get("/users/{user_id}/replies", response_model=List[ReplyResponse])
 def get_user_replies(
+    response: Response,
     user_id: int,
-    skip: int = Query(0, ge=0, description="Number of replies to skip"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+    skip: int = Query(0, ge=0, description="Number of replies to skip", deprecated=True),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of replies to return"),
     db: Session = Depends(get_db)
 ):
     """
-    Get all replies by a specific user.
+    Get all replies by a specific user, newest first.
     
     - **user_id**: ID of the user
-    - **skip**: Number of replies to skip (for pagination)
+    - **cursor**: Continue after the previous page; the next cursor is
+      returned in the X-Next-Cursor response header
+    - **skip**: Number of replies to skip (deprecated; use cursor)
     - **limit**: Maximum number of replies to return
     """
-    replies = reply_crud.get_user_replies(db, user_id, skip, limit)
+    try:
+        replies = reply_crud.get_user_replies(db, user_id, cursor, limit, skip)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    set_next_cursor(response, replies, limit)
     return replies
 
 @router.get("/replies/recent", response_model=List[ReplyResponse])
 def get_recent_replies(
+    response: Response,
     limit: int = Query(10, ge=1, le=100, description="Maximum number of recent replies to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
     db: Session = Depends(get_db)
 ):
     """
     Get most recent replies across all posts.
     
     - **limit**: Maximum number of recent replies to return
+    - **cursor**: Continue after the previous page; the next cursor is
+      returned in the X-Next-Cursor response header
     """
-    replies = reply_crud.get_recent_replies(db, limit)
+    try:
+        replies = reply_crud.get_recent_replies(db, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    set_next_cursor(response, replies, limit)
     return replies
 
 @router.post("/replies/bulk-delete", response_model=BulkDeleteResponse)
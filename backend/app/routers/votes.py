@@ -1,35 +1,42 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+import hashlib
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from backend.app.database import get_db
-from backend.app.models.models import Post, Reply, Vote
 from backend.app.schemas.vote import (
     VoteCreate, VoteResponse, VoteRemovalResponse, 
     PostVoteCountsResponse, ReplyVoteCountsResponse,
     UserVoteHistoryResponse, VoteErrorResponse
 )
 from backend.app.crud import vote as vote_crud
+from backend.app.utils.pagination import next_cursor
 
 router = APIRouter(prefix="/api", tags=["votes"])
 
 
+def _vote_counts_etag(target: str, vote_counts: dict) -> str:
+    """ETag for a target's vote counts; changes whenever either count does"""
+    key = f"{target}:{vote_counts['upvote_count']}:{vote_counts['downvote_count']}"
+    return f'"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def _not_modified(etag: str, if_none_match: Optional[str]) -> bool:
+    """Whether the client's If-None-Match already names this ETag"""
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags or "*" in tags
+
+
 @router.put("/posts/{post_id}/vote", response_model=VoteResponse | VoteRemovalResponse)
-async def vote_on_post(
+def vote_on_post(
     post_id: int,
     vote_data: VoteCreate,
     db: Session = Depends(get_db)
 ):
     """Vote on a post (upvote or downvote)"""
     try:
-        # Check if post exists
-        post = db.query(Post).filter(Post.id == post_id).first()
-        if not post:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Post not found"
-            )
-        
-        # Create or update vote
+        # Create or update vote; the insert itself checks the target exists
         result = vote_crud.create_vote(
             db=db,
             user_id=vote_data.user_id,
@@ -46,6 +53,11 @@ async def vote_on_post(
         
         return VoteResponse.from_orm(result)
     
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found"
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -59,22 +71,14 @@ async def vote_on_post(
 
 
 @router.put("/replies/{reply_id}/vote", response_model=VoteResponse | VoteRemovalResponse)
-async def vote_on_reply(
+def vote_on_reply(
     reply_id: int,
     vote_data: VoteCreate,
     db: Session = Depends(get_db)
 ):
     """Vote on a reply (upvote or downvote)"""
     try:
-        # Check if reply exists
-        reply = db.query(Reply).filter(Reply.id == reply_id).first()
-        if not reply:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Reply not found"
-            )
-        
-        # Create or update vote
+        # Create or update vote; the insert itself checks the target exists
         result = vote_crud.create_vote(
             db=db,
             user_id=vote_data.user_id,
@@ -91,6 +95,11 @@ async def vote_on_reply(
         
         return VoteResponse.from_orm(result)
     
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Reply not found"
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -104,7 +113,7 @@ async def vote_on_reply(
 
 
 @router.get("/posts/{post_id}/vote/{user_id}", response_model=VoteResponse)
-async def get_user_vote_on_post(
+def get_user_vote_on_post(
     post_id: int,
     user_id: int,
     db: Session = Depends(get_db)
@@ -120,7 +129,7 @@ async def get_user_vote_on_post(
 
 
 @router.get("/replies/{reply_id}/vote/{user_id}", response_model=VoteResponse)
-async def get_user_vote_on_reply(
+def get_user_vote_on_reply(
     reply_id: int,
     user_id: int,
     db: Session = Depends(get_db)
@@ -136,80 +145,102 @@ async def get_user_vote_on_reply(
 
 
 @router.get("/posts/{post_id}/votes", response_model=PostVoteCountsResponse)
-async def get_post_vote_counts(
+def get_post_vote_counts(
     post_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """Get aggregated vote counts for a post"""
-    # Check if post exists
-    post = db.query(Post).filter(Post.id == post_id).first()
-    if not post:
+    # The counts lookup doubles as the existence check
+    vote_counts = vote_crud.get_vote_counts_for_post(db=db, post_id=post_id)
+    if vote_counts is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Post not found"
         )
     
-    vote_counts = vote_crud.get_vote_counts_for_post(db=db, post_id=post_id)
+    etag = _vote_counts_etag(f"post:{post_id}", vote_counts)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(etag, if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
     return PostVoteCountsResponse(**vote_counts)
 
 
 @router.get("/replies/{reply_id}/votes", response_model=ReplyVoteCountsResponse)
-async def get_reply_vote_counts(
+def get_reply_vote_counts(
     reply_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """Get aggregated vote counts for a reply"""
-    # Check if reply exists
-    reply = db.query(Reply).filter(Reply.id == reply_id).first()
-    if not reply:
+    # The counts lookup doubles as the existence check
+    vote_counts = vote_crud.get_vote_counts_for_reply(db=db, reply_id=reply_id)
+    if vote_counts is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Reply not found"
         )
     
-    vote_counts = vote_crud.get_vote_counts_for_reply(db=db, reply_id=reply_id)
+    etag = _vote_counts_etag(f"reply:{reply_id}", vote_counts)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _not_modified(etag, if_none_match):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response.headers.update(headers)
     return ReplyVoteCountsResponse(**vote_counts)
 
 
 @router.get("/users/{user_id}/votes", response_model=UserVoteHistoryResponse)
-async def get_user_vote_history(
+def get_user_vote_history(
     user_id: int,
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 50,
     target_type: str = "all",
     db: Session = Depends(get_db)
 ):
-    """Get user's voting history"""
+    """Get user's voting history, newest first; pass next_cursor back for the next page"""
     if target_type not in ["all", "posts", "replies"]:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="target_type must be 'all', 'posts', or 'replies'"
         )
     
-    votes = vote_crud.get_vote_history(
-        db=db, 
-        user_id=user_id, 
-        target_type=target_type,
-        skip=skip, 
-        limit=limit
-    )
+    try:
+        votes = vote_crud.get_vote_history(
+            db=db, 
+            user_id=user_id, 
+            target_type=target_type,
+            cursor=cursor, 
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     
-    # Get total count for pagination
-    all_votes = vote_crud.get_user_votes(db=db, user_id=user_id)
-    total_count = len(all_votes)
+    # A short first page already holds every vote; only count otherwise
+    if not cursor and len(votes) < limit:
+        total_count = len(votes)
+    else:
+        total_count = vote_crud.count_user_votes(db=db, user_id=user_id, target_type=target_type)
     
     vote_responses = [VoteResponse.from_orm(vote) for vote in votes]
     
     return UserVoteHistoryResponse(
         votes=vote_responses,
         total_count=total_count,
-        skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor(votes, limit)
     )
 
 
 @router.delete("/votes/{vote_id}")
-async def delete_vote(
+def delete_vote(
     vote_id: int,
     db: Session = Depends(get_db)
 ):
@@ -224,7 +255,7 @@ async def delete_vote(
 
 
 @router.get("/votes/top-posts")
-async def get_top_voted_posts(
+def get_top_voted_posts(
     limit: int = 10,
     time_period_hours: int = None,
     db: Session = Depends(get_db)
@@ -242,24 +273,24 @@ async def get_top_voted_posts(
         time_period_hours=time_period_hours
     )
     
-    results = []
-    for post, net_votes in top_posts:
-        vote_counts = vote_crud.get_vote_counts_for_post(db=db, post_id=post.id)
-        results.append({
+    # The counts are denormalized onto the loaded rows; no query per post
+    return [
+        {
             "id": post.id,
             "title": post.title,
             "content": post.content,
             "author_id": post.author_id,
             "channel_id": post.channel_id,
             "created_at": post.created_at,
-            **vote_counts
-        })
-    
-    return results
+            "post_id": post.id,
+            **vote_crud.vote_counts_of(post)
+        }
+        for post, net_votes in top_posts
+    ]
 
 
 @router.get("/votes/top-replies")
-async def get_top_voted_replies(
+def get_top_voted_replies(
     post_id: int = None,
     limit: int = 10,
     db: Session = Depends(get_db)
@@ -277,24 +308,23 @@ async def get_top_voted_replies(
         limit=limit
     )
     
-    results = []
-    for reply, net_votes in top_replies:
-        vote_counts = vote_crud.get_vote_counts_for_reply(db=db, reply_id=reply.id)
-        results.append({
+    return [
+        {
             "id": reply.id,
             "content": reply.content,
             "author_id": reply.author_id,
             "post_id": reply.post_id,
             "parent_id": reply.parent_id,
             "created_at": reply.created_at,
-            **vote_counts
-        })
-    
-    return results
+            "reply_id": reply.id,
+            **vote_crud.vote_counts_of(reply)
+        }
+        for reply, net_votes in top_replies
+    ]
 
 
 @router.get("/votes/controversial")
-async def get_controversial_content(
+def get_controversial_content(
     min_total_votes: int = 10,
     limit: int = 20,
     db: Session = Depends(get_db)
@@ -316,21 +346,6 @@ async def get_controversial_content(
 
 
 @router.get("/votes/stats")
-async def get_voting_stats(db: Session = Depends(get_db)):
+def get_voting_stats(db: Session = Depends(get_db)):
     """Get overall voting statistics"""
-    all_votes = db.query(Vote).all()
-    upvotes = len([v for v in all_votes if v.vote_type.value == "upvote"])
-    downvotes = len([v for v in all_votes if v.vote_type.value == "downvote"])
-    
-    active_voters = len(set([v.user_id for v in all_votes]))
-    posts_with_votes = len(set([v.post_id for v in all_votes if v.post_id]))
-    replies_with_votes = len(set([v.reply_id for v in all_votes if v.reply_id]))
-    
-    return {
-        "total_votes": len(all_votes),
-        "total_upvotes": upvotes,
-        "total_downvotes": downvotes,
-        "active_voters": active_voters,
-        "posts_with_votes": posts_with_votes,
-        "replies_with_votes": replies_with_votes
-    }
\ No newline at end of file
+    return vote_crud.get_voting_stats(db)
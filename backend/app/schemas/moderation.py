@@ -37,6 +37,10 @@ class ModerationActionResponse(ModerationActionBase):
     class Config:
         from_attributes = True
 
+class ModerationActionPage(BaseModel):
+    data: List[ModerationActionResponse]
+    next_cursor: Optional[str] = None
+
 class ModerationLogBase(BaseModel):
     user_id: int
     action: str = Field(..., min_length=1, max_length=1000)
@@ -94,4 +98,4 @@ class ModerationLogFilters(BaseModel):
     start_date: Optional[datetime] = None
     end_date: Optional[datetime] = None
     limit: int = Field(50, ge=1, le=1000)
-    offset: int = Field(0, ge=0)
\ No newline at end of file
+    cursor: Optional[str] = None
\ No newline at end of file
@@ -55,6 +55,9 @@ class PostResponse(PostBase):
     author_id: int
     created_at: datetime
     updated_at: datetime
+    upvote_count: int = 0
+    downvote_count: int = 0
+    net_votes: int = 0
 
     class Config:
         from_attributes = True
\ No newline at end of file
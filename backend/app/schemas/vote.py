@@ -62,8 +62,8 @@ class ReplyVoteCountsResponse(VoteCountsResponse):
 class UserVoteHistoryResponse(BaseModel):
     votes: list[VoteResponse] = Field(..., description="List of user's votes")
     total_count: int = Field(..., description="Total number of votes by user")
-    skip: int = Field(0, description="Number of votes skipped")
     limit: int = Field(50, description="Maximum number of votes returned")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, if any")
 
 
 class TopVotedPostResponse(BaseModel):
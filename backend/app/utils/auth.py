@@ -1,10 +1,21 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from functools import lru_cache
 from typing import Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from passlib.hash import bcrypt
+from sqlalchemy import bindparam, exists, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.models import RevokedToken
+from app.utils.cache import TTLCache
+import hashlib
+import multiprocessing
 import secrets
 import os
+import time
+import uuid
 
 # Password hashing configuration
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -15,6 +26,14 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 30
 
+# Per-process cache of verified token payloads, keyed by a digest of the
+# token. Entries never outlive the token's own expiry. Revocation is not
+# cached: it is read from revoked_tokens, which every worker shares.
+token_cache = TTLCache(maxsize=10_000, ttl=30)
+
+# Built once at import; the per-request revocation check only binds the jti
+_token_revoked_stmt = select(exists().where(RevokedToken.jti == bindparam("jti")))
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +42,28 @@ def get_password_hash(password: str) -> str:
     """Hash a password for storage"""
     return pwd_context.hash(password)
 
+@lru_cache(maxsize=1)
+def get_hasher_pool() -> ProcessPoolExecutor:
+    """
+    Worker processes for bcrypt, so hashing holds neither the event loop nor
+    the GIL. Created on first use inside an already threaded server, hence
+    spawn rather than fork.
+    """
+    return ProcessPoolExecutor(
+        max_workers=settings.password_hash_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+
+def shutdown_hasher_pool() -> None:
+    """Stop the hashing workers, if any were started"""
+    if get_hasher_pool.cache_info().currsize:
+        get_hasher_pool().shutdown()
+        get_hasher_pool.cache_clear()
+
+def hash_password(password: str) -> str:
+    """Hash a password in the worker pool, waiting for the result"""
+    return get_hasher_pool().submit(get_password_hash, password).result()
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token"""
     to_encode = data.copy()
@@ -31,7 +72,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire, "type": "access"})
+    to_encode.update({"exp": expire, "type": "access", "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -47,23 +88,58 @@ def create_refresh_token(data: dict, expires_delta: Optional[timedelta] = None)
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, token_type: str = "access") -> Optional[dict]:
-    """Verify and decode a JWT token"""
+def _token_cache_key(token: str, token_type: str) -> tuple:
+    return hashlib.sha256(token.encode()).digest(), token_type
+
+def _decode_token(token: str, token_type: str) -> Optional[dict]:
+    """Check a JWT's signature, type and expiry; None if any fails"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        # Check token type
-        if payload.get("type") != token_type:
-            return None
-            
-        # Check expiration
-        exp = payload.get("exp")
-        if exp is None or datetime.utcfromtimestamp(exp) < datetime.utcnow():
-            return None
-            
-        return payload
     except JWTError:
         return None
+    
+    # Check token type
+    if payload.get("type") != token_type:
+        return None
+    
+    # Check expiration
+    exp = payload.get("exp")
+    if exp is None or datetime.utcfromtimestamp(exp) < datetime.utcnow():
+        return None
+    return payload
+
+def verify_token(token: str, token_type: str = "access", db: Optional[Session] = None) -> Optional[dict]:
+    """
+    Verify and decode a JWT token; repeat checks of a valid token are cached.
+    With `db`, a token logged out on any worker is refused as well.
+    """
+    key = _token_cache_key(token, token_type)
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = _decode_token(token, token_type)
+        if payload is None:
+            return None
+        token_cache.set(key, payload, ttl=min(token_cache.ttl, payload["exp"] - time.time()))
+    
+    if db is not None and is_token_revoked(db, payload):
+        return None
+    return payload
+
+def is_token_revoked(db: Session, payload: dict) -> bool:
+    """Whether the token with this payload has been logged out"""
+    jti = payload.get("jti")
+    return bool(jti) and db.execute(_token_revoked_stmt, {"jti": jti}).scalar()
+
+def forget_token(token: str, token_type: str = "access") -> None:
+    """Drop a token's cached verification, e.g. on logout"""
+    token_cache.pop(_token_cache_key(token, token_type), None)
+
+def revoke_token(db: Session, payload: dict) -> None:
+    """Refuse the token with this verified payload, on every worker, until it expires"""
+    jti = payload.get("jti")
+    if jti:
+        db.merge(RevokedToken(jti=jti, expires_at=datetime.utcfromtimestamp(payload["exp"])))
+        db.commit()
 
 def generate_verification_token() -> str:
     """Generate a secure verification token"""
@@ -0,0 +1,52 @@
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Sequence
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+@dataclass(frozen=True)
+class Cursor:
+    """Position of the last row on a page, in (created_at, id) order"""
+    created_at: datetime
+    id: int
+
+    def encode(self) -> str:
+        """Serialize to an opaque, URL-safe token for the client"""
+        payload = json.dumps({"created_at": self.created_at.isoformat(), "id": self.id})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        """Parse a token produced by encode(); raises ValueError if it is malformed"""
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            return cls(created_at=datetime.fromisoformat(payload["created_at"]), id=int(payload["id"]))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError("Invalid pagination cursor") from e
+
+def paginate(query: Query, model: Any, cursor: Optional[str], limit: int, descending: bool = True) -> Query:
+    """Order by (created_at, id) and seek past the cursor instead of using OFFSET"""
+    position = tuple_(model.created_at, model.id)
+    if cursor:
+        after = Cursor.decode(cursor)
+        bound = (after.created_at, after.id)
+        query = query.filter(position < bound if descending else position > bound)
+
+    if descending:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.created_at, model.id)
+    return query.limit(limit)
+
+def next_cursor(rows: Sequence[Any], limit: int) -> Optional[str]:
+    """Cursor for the page after `rows`, or None when this was the last page"""
+    if len(rows) < limit:
+        return None
+    return cursor_after(rows[-1])
+
+def cursor_after(row: Any) -> str:
+    """Cursor for the page that continues after `row`"""
+    return Cursor(created_at=row.created_at, id=row.id).encode()
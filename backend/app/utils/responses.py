@@ -0,0 +1,14 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by pydantic-core's serializer instead of the json
+    module: several times faster on list-of-dict bodies, and it writes
+    datetimes, dates and UUIDs as ISO strings without a custom encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
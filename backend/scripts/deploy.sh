@@ -105,8 +105,9 @@ start_application() {
     
     cd "$PROJECT_ROOT"
     
-    # Start with uvicorn
-    uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}" --workers 4
+    # Start with uvicorn; the app sizes its connection pools from WEB_CONCURRENCY
+    export WEB_CONCURRENCY="${WEB_CONCURRENCY:-4}"
+    uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}" --workers "$WEB_CONCURRENCY"
 }
 
 # Health check
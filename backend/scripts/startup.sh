@@ -66,12 +66,13 @@ setup_database() {
 start_server() {
     log_info "Starting server..."
     
-    # Determine number of workers based on environment
+    # Determine number of workers based on environment; the app sizes its
+    # connection pools from WEB_CONCURRENCY, so export it
     if [ "${ENVIRONMENT:-development}" = "production" ]; then
-        WORKERS=4
+        export WEB_CONCURRENCY="${WEB_CONCURRENCY:-4}"
         LOG_LEVEL="warning"
     else
-        WORKERS=1
+        export WEB_CONCURRENCY="${WEB_CONCURRENCY:-1}"
         LOG_LEVEL="info"
     fi
     
@@ -79,7 +80,7 @@ start_server() {
     exec uvicorn app.main:app \
         --host 0.0.0.0 \
         --port "$PORT" \
-        --workers "$WORKERS" \
+        --workers "$WEB_CONCURRENCY" \
         --log-level "$LOG_LEVEL" \
         --access-log \
         --loop uvloop \
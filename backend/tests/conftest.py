@@ -1,16 +1,22 @@
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from app.models.models import Base
 from app.database import get_db
+from app.crud.auth import user_cache, current_user_cache, moderator_cache
+from backend.app.crud.auth import moderator_cache as backend_moderator_cache
+from app.crud.channel import channel_list_cache
 
 
-# Use in-memory SQLite for testing
+# Use in-memory SQLite for testing; one shared connection, so route handlers
+# running in the threadpool see the same database as the test
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -24,4 +30,26 @@ def db():
         yield db
     finally:
         db.close()
-        Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+        Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def clear_user_cache():
+    """Cached users must not leak between tests that reuse ids."""
+    user_cache.clear()
+    current_user_cache.clear()
+    moderator_cache.clear()
+    backend_moderator_cache.clear()
+    yield
+    user_cache.clear()
+    current_user_cache.clear()
+    moderator_cache.clear()
+    backend_moderator_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_channel_cache():
+    """Tests recreate the tables, so a cached channel list would be stale."""
+    channel_list_cache.clear()
+    yield
+    channel_list_cache.clear()
@@ -24,9 +24,13 @@ class TestChannelEndpoints:
     def setup_method(self):
         """Create tables before each test."""
         Base.metadata.create_all(bind=engine)
+        # Other test modules install their own override at import; use ours
+        self.previous_get_db = app.dependency_overrides.get(get_db)
+        app.dependency_overrides[get_db] = override_get_db
         
     def teardown_method(self):
         """Drop tables after each test."""
+        app.dependency_overrides[get_db] = self.previous_get_db
         Base.metadata.drop_all(bind=engine)
 
     def test_get_channels_empty(self):
@@ -61,6 +65,28 @@ class TestChannelEndpoints:
         assert "general" in channel_names
         assert "random" in channel_names
 
+    def test_get_channels_cached_until_channel_created(self):
+        """Test GET /channels is served from cache until a channel is written."""
+        db = TestingSessionLocal()
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        
+        assert client.get("/channels").json()["data"] == []
+        
+        # Rows written behind the CRUD layer's back are not seen until expiry
+        db.add(Channel(name="general", created_by=user_id))
+        db.commit()
+        db.close()
+        assert client.get("/channels").json()["data"] == []
+        
+        response = client.post("/channels", json={"name": "random"}, headers={"X-User-ID": str(user_id)})
+        assert response.status_code == 201
+        
+        channel_names = [channel["name"] for channel in client.get("/channels").json()["data"]]
+        assert sorted(channel_names) == ["general", "random"]
+
     def test_get_channel_by_id_exists(self):
         """Test GET /channels/{id} returns specific channel."""
         # Setup test data
@@ -166,6 +192,17 @@ class TestChannelEndpoints:
         data = response.json()
         assert data["success"] is False
 
+    def test_create_channel_unknown_user(self):
+        """Test POST /channels for a user that does not exist returns 401."""
+        channel_data = {
+            "name": "test-channel",
+            "description": "Test description"
+        }
+        
+        response = client.post("/channels", json=channel_data, headers={"X-User-ID": "999"})
+        assert response.status_code == 401
+        assert client.get("/channels").json()["data"] == []
+
     def test_create_channel_duplicate_name(self):
         """Test POST /channels with duplicate name returns 400."""
         # Setup test data
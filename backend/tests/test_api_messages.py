@@ -67,7 +67,7 @@ class TestMessageAPI:
         assert messages[1]["recipient_id"] == user1.id
     
     def test_get_messages_pagination(self, db: Session):
-        """Test message pagination with limit and offset"""
+        """Test message pagination with limit and before_id"""
         # Create users
         user1 = User(username="alice", email="alice@test.com", password_hash="hashed")
         user2 = User(username="bob", email="bob@test.com", password_hash="hashed")
@@ -89,8 +89,8 @@ class TestMessageAPI:
         db.add_all(messages)
         db.commit()
         
-        # Test pagination: skip 2, limit 2
-        response = client.get(f"/api/messages?other_user_id={user2.id}&skip=2&limit=2")
+        # Test pagination: the two messages before the fifth
+        response = client.get(f"/api/messages?other_user_id={user2.id}&before_id={messages[4].id}&limit=2")
         
         assert response.status_code == 200
         result = response.json()
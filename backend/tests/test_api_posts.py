@@ -2,7 +2,7 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from app.main import app
-from app.models.models import User, Channel, Post
+from app.models.models import User, Channel, Post, Vote
 from app.database import get_db
 from tests.conftest import TestingSessionLocal, engine
 from app.models.models import Base
@@ -24,9 +24,13 @@ class TestPostEndpoints:
     def setup_method(self):
         """Create tables before each test."""
         Base.metadata.create_all(bind=engine)
+        # Other test modules install their own override at import; use ours
+        self.previous_get_db = app.dependency_overrides.get(get_db)
+        app.dependency_overrides[get_db] = override_get_db
         
     def teardown_method(self):
         """Drop tables after each test."""
+        app.dependency_overrides[get_db] = self.previous_get_db
         Base.metadata.drop_all(bind=engine)
 
     def test_get_posts_by_channel_empty(self):
@@ -112,6 +116,34 @@ class TestPostEndpoints:
         assert data["data"]["content"] == "Test content"
         assert data["data"]["id"] == post_id
 
+    def test_get_post_by_id_includes_vote_counts(self):
+        """Test GET /posts/{id} returns the stored vote counts."""
+        db = TestingSessionLocal()
+        users = [User(username=f"user{i}", email=f"user{i}@example.com", password_hash="hashed") for i in range(3)]
+        db.add_all(users)
+        db.commit()
+        
+        channel = Channel(name="general", created_by=users[0].id)
+        db.add(channel)
+        db.commit()
+        
+        post = Post(title="Test Post", content="Test content", channel_id=channel.id, author_id=users[0].id)
+        db.add(post)
+        db.commit()
+        post_id = post.id
+        db.add_all([
+            Vote(user_id=users[0].id, post_id=post_id, vote_type="upvote"),
+            Vote(user_id=users[1].id, post_id=post_id, vote_type="upvote"),
+            Vote(user_id=users[2].id, post_id=post_id, vote_type="downvote"),
+        ])
+        db.commit()
+        db.close()
+        
+        response = client.get(f"/posts/{post_id}")
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert (data["upvote_count"], data["downvote_count"], data["net_votes"]) == (2, 1, 1)
+
     def test_get_post_by_id_not_found(self):
         """Test GET /posts/{id} returns 404 for non-existent post."""
         response = client.get("/posts/999")
@@ -1,10 +1,12 @@
 import pytest
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.main import app
 from app.database import get_db, Base
 from app.models.models import User
+from app.crud.auth import user_crud
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_auth.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -77,6 +79,24 @@ class TestUserRegistration:
         assert response2.status_code == 400
         assert "email already exists" in response2.json()["detail"].lower()
 
+    def test_register_conflict_after_check_fails(self):
+        """Test a registration that loses the race to a duplicate still gets a 400"""
+        user_data = {
+            "username": "raceuser",
+            "email": "race@example.com",
+            "password": "SecurePass123!"
+        }
+        assert client.post("/auth/register", json=user_data).status_code == 201
+        
+        # The pre-insert check misses the duplicate; the unique index catches it
+        user_data["username"] = "raceuser2"
+        no_conflicts = {"username": False, "email": False}
+        with patch.object(user_crud, "check_conflicts", side_effect=[no_conflicts, {"username": False, "email": True}]):
+            response = client.post("/auth/register", json=user_data)
+        
+        assert response.status_code == 400
+        assert "email already exists" in response.json()["detail"].lower()
+
     def test_register_invalid_email_fails(self):
         """Test registration fails with invalid email format"""
         user_data = {
@@ -0,0 +1,109 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy.orm import Session
+from app.utils.cache import TTLCache
+from app.config import settings
+from app.utils.auth import create_access_token, forget_token, get_hasher_pool, revoke_token, shutdown_hasher_pool, token_cache, verify_token
+
+
+class TestTTLCache:
+    def test_set_and_get(self):
+        cache = TTLCache(maxsize=10, ttl=30)
+        cache.set("key", "value")
+        
+        assert cache.get("key") == "value"
+        assert "key" in cache
+        assert cache.get("missing") is None
+
+    def test_entries_expire(self):
+        cache = TTLCache(maxsize=10, ttl=30)
+        
+        with patch("app.utils.cache.time.monotonic", return_value=100.0):
+            cache.set("key", "value")
+        with patch("app.utils.cache.time.monotonic", return_value=129.0):
+            assert cache.get("key") == "value"
+        with patch("app.utils.cache.time.monotonic", return_value=131.0):
+            assert cache.get("key") is None
+            assert len(cache) == 0
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(maxsize=2, ttl=30)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        
+        assert "a" in cache
+        assert "b" not in cache
+        assert "c" in cache
+
+    def test_pop_and_clear(self):
+        cache = TTLCache(maxsize=10, ttl=30)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        
+        assert cache.pop("a") == 1
+        assert cache.pop("a") is None
+        cache.clear()
+        assert len(cache) == 0
+
+    def test_per_entry_ttl(self):
+        cache = TTLCache(maxsize=10, ttl=30)
+        
+        with patch("app.utils.cache.time.monotonic", return_value=100.0):
+            cache.set("short", 1, ttl=5)
+            cache.set("default", 2)
+        with patch("app.utils.cache.time.monotonic", return_value=106.0):
+            assert cache.get("short") is None
+            assert cache.get("default") == 2
+
+
+class TestTokenCache:
+    def test_verified_tokens_are_cached(self):
+        token_cache.clear()
+        token = create_access_token({"sub": "1"})
+        
+        payload = verify_token(token, "access")
+        with patch("app.utils.auth.jwt.decode") as decode:
+            assert verify_token(token, "access") == payload
+            decode.assert_not_called()
+        
+        assert verify_token(token, "refresh") is None
+        forget_token(token, "access")
+        assert len(token_cache) == 0
+        token_cache.clear()
+
+    def test_invalid_tokens_are_not_cached(self):
+        token_cache.clear()
+        
+        assert verify_token("not-a-token", "access") is None
+        assert len(token_cache) == 0
+
+    def test_revoked_tokens_are_rejected(self, db: Session):
+        token_cache.clear()
+        token = create_access_token({"sub": "1"})
+        other = create_access_token({"sub": "1"})
+        
+        payload = verify_token(token, "access", db)
+        assert verify_token(other, "access", db)["jti"] != payload["jti"]
+        
+        revoke_token(db, payload)
+        revoke_token(db, payload)
+        assert verify_token(token, "access", db) is None
+        # Another worker has the payload cached but reads the same table
+        token_cache.clear()
+        assert verify_token(token, "access", db) is None
+        assert verify_token(other, "access", db) is not None
+        token_cache.clear()
+
+
+class TestHasherPool:
+    def test_pool_is_bounded_spawned_and_shut_down(self):
+        pool = get_hasher_pool()
+        assert pool._max_workers == settings.password_hash_workers
+        assert pool._mp_context.get_start_method() == "spawn"
+        assert get_hasher_pool() is pool
+        
+        shutdown_hasher_pool()
+        assert get_hasher_pool.cache_info().currsize == 0
+        shutdown_hasher_pool()
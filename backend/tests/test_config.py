@@ -0,0 +1,65 @@
+import pytest
+from dataclasses import FrozenInstanceError
+from app.config import Settings, TestingSettings, read_env_file
+
+
+class TestSettings:
+    def test_defaults(self):
+        settings = Settings.load({})
+
+        assert settings.debug is True
+        assert settings.cors_origins == ["http://localhost:3000", "http://localhost:5173"]
+        assert settings.smtp_port is None
+
+    def test_environment_values_are_coerced(self):
+        settings = Settings.load({
+            "CORS_ORIGINS": "https://a.example, https://b.example",
+            "DEBUG": "off",
+            "JWT_EXPIRE_HOURS": "12",
+            "SMTP_PORT": "587",
+        })
+
+        assert settings.cors_origins == ["https://a.example", "https://b.example"]
+        assert settings.debug is False
+        assert settings.jwt_expire_hours == 12
+        assert settings.smtp_port == 587
+
+    def test_pool_is_split_over_workers_and_engines(self):
+        settings = Settings.load({
+            "DB_MAX_CONNECTIONS": "80",
+            "WEB_CONCURRENCY": "4",
+            "DB_MAX_OVERFLOW": "2",
+        })
+
+        assert settings.db_connections_per_engine == 10
+        assert settings.db_pool_size == 8
+        total = settings.web_concurrency * settings.db_engines_per_process * (
+            settings.db_pool_size + settings.db_max_overflow
+        )
+        assert total <= settings.db_max_connections
+
+    def test_subclass_defaults(self):
+        settings = TestingSettings.load({})
+
+        assert settings.debug is False
+        assert settings.database_url.endswith("reddit_forum_test")
+
+    def test_settings_are_frozen(self):
+        settings = Settings.load({})
+
+        with pytest.raises(FrozenInstanceError):
+            settings.debug = False
+
+    def test_read_env_file(self, tmp_path):
+        env_file = tmp_path / ".env"
+        env_file.write_text(
+            "# comment\n"
+            "\n"
+            "MAX_FILE_SIZE=10485760  # 10MB\n"
+            "SECRET_KEY=\"quoted # value\"\n"
+        )
+
+        assert read_env_file(str(env_file)) == {
+            "MAX_FILE_SIZE": "10485760",
+            "SECRET_KEY": "quoted # value",
+        }
@@ -1,11 +1,22 @@
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from app.crud.channel import create_channel, get_channel, get_channels, update_channel, delete_channel
-from app.crud.post import create_post, get_post, get_posts_by_channel, update_post, delete_post
+from app.crud.post import create_post, get_post, get_posts_by_channel, post_references_exist, update_post, delete_post
 from app.schemas.channel import ChannelCreate, ChannelUpdate
 from app.schemas.post import PostCreate, PostUpdate
-from app.models.models import User, Channel, Post
+from app.schemas.reply import ReplyCreate
+from app.crud.auth import user_crud, refresh_token_crud, user_cache, moderator_cache, current_user_cache
+from app.crud.vote import count_user_votes, create_vote, existing_targets, get_top_voted_posts, get_vote_counts_for_post, get_voting_stats, top_voted_cache, vote_counts_of
+from app.crud.moderation import ModerationCRUD, TargetType
+from app.crud.reply import create_reply
+from app.models.models import User, Channel, Post, RefreshToken, RevokedToken, Vote, ModerationAction, ModerationLog
 from app.database import get_db
+from app.utils.pagination import next_cursor
+from app.schemas.auth import UserRegister, UserUpdate
+from unittest.mock import patch
 
 
 class TestChannelCRUD:
@@ -119,6 +130,44 @@ class TestPostCRUD:
         assert post.author_id == user.id
         assert post.id is not None
 
+    def test_post_references_exist(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        channel = Channel(name="general", created_by=user.id)
+        db.add(channel)
+        db.commit()
+        
+        assert post_references_exist(db, channel.id, user.id) == (True, True)
+        assert post_references_exist(db, 999, user.id) == (False, True)
+        assert post_references_exist(db, channel.id, 999) == (True, False)
+
+    def test_create_post_single_statement(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        channel = Channel(name="general", created_by=user.id)
+        db.add(channel)
+        db.commit()
+        
+        channel_id, author_id = channel.id, user.id
+        db.expire_on_commit = False  # As configured on SessionLocal
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            post = create_post(db, PostCreate(title="Test Post", content="Content"), channel_id, author_id)
+            assert post.created_at is not None
+            assert post.updated_at is not None
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        
+        # INSERT ... RETURNING brings back the id and server defaults
+        assert len(statements) == 1
+
     def test_get_post_exists(self, db: Session):
         user = User(username="testuser", email="test@example.com", password_hash="hashed")
         db.add(user)
@@ -165,6 +214,31 @@ class TestPostCRUD:
         posts = get_posts_by_channel(db, 999)
         assert len(posts) == 0
 
+    def test_get_posts_by_channel_cursor_pages(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        channel = Channel(name="general", created_by=user.id)
+        db.add(channel)
+        db.commit()
+        
+        # Identical timestamps must still page without gaps or repeats
+        created_at = datetime(2024, 1, 1)
+        db.add_all([
+            Post(title=f"Post {i}", content="Content", channel_id=channel.id,
+                 author_id=user.id, created_at=created_at)
+            for i in range(5)
+        ])
+        db.commit()
+        
+        first_page = get_posts_by_channel(db, channel.id, limit=3)
+        second_page = get_posts_by_channel(db, channel.id, next_cursor(first_page, 3), limit=3)
+        
+        assert [p.title for p in first_page] == ["Post 4", "Post 3", "Post 2"]
+        assert [p.title for p in second_page] == ["Post 1", "Post 0"]
+        assert next_cursor(second_page, 3) is None
+
     def test_update_post(self, db: Session):
         user = User(username="testuser", email="test@example.com", password_hash="hashed")
         db.add(user)
@@ -233,4 +307,487 @@ class TestPostCRUD:
 
     def test_delete_post_not_exists(self, db: Session):
         deleted = delete_post(db, 999)
-        assert deleted is None
\ No newline at end of file
+        assert deleted is None
+
+
+class TestTopVotedCRUD:
+    @pytest.fixture
+    def posts(self, db: Session):
+        top_voted_cache.clear()
+        users = [User(username=f"user{i}", email=f"user{i}@test.com", password_hash="hashed") for i in range(2)]
+        db.add_all(users)
+        db.commit()
+        channel = Channel(name="general", created_by=users[0].id)
+        db.add(channel)
+        db.commit()
+        posts = [Post(title=f"Post {i}", content="Content", channel_id=channel.id, author_id=users[0].id) for i in range(2)]
+        db.add_all(posts)
+        db.commit()
+        db.add(Vote(user_id=users[1].id, post_id=posts[1].id, vote_type="upvote"))
+        db.commit()
+        yield users, posts
+        top_voted_cache.clear()
+
+    def test_top_voted_posts_ranking_is_cached(self, db: Session, posts):
+        _, (first, second) = posts
+        ids = [first.id, second.id]
+
+        assert [(p.id, net) for p, net in get_top_voted_posts(db)] == [(ids[1], 1), (ids[0], 0)]
+
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            cached = get_top_voted_posts(db)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert [(p.id, net) for p, net in cached] == [(ids[1], 1), (ids[0], 0)]
+        # Only the posts themselves are loaded, by id
+        assert len(statements) == 1
+
+    def test_vote_counts_of_loaded_posts(self, db: Session, posts):
+        for post, _ in get_top_voted_posts(db):
+            counts = get_vote_counts_for_post(db, post.id)
+            assert {"post_id": post.id, **vote_counts_of(post)} == counts
+        assert get_vote_counts_for_post(db, 999) is None
+        assert counts["upvote_count"] + counts["downvote_count"] == counts["total_votes"]
+
+    def test_get_voting_stats(self, db: Session, posts):
+        users, (first, second) = posts
+        create_vote(db, users[0].id, "downvote", post_id=first.id)
+        create_vote(db, users[0].id, "upvote", post_id=second.id)
+
+        assert count_user_votes(db, users[0].id) == 2
+        assert count_user_votes(db, users[0].id, "replies") == 0
+        assert get_voting_stats(db) == {
+            "total_votes": 3,
+            "total_upvotes": 2,
+            "total_downvotes": 1,
+            "active_voters": 2,
+            "posts_with_votes": 2,
+            "replies_with_votes": 0
+        }
+
+    def test_votes_invalidate_top_voted_cache(self, db: Session, posts):
+        users, (first, second) = posts
+        ids = [first.id, second.id]
+        get_top_voted_posts(db)
+
+        create_vote(db, users[0].id, "upvote", post_id=ids[0])
+        create_vote(db, users[1].id, "upvote", post_id=ids[0])
+        create_vote(db, users[1].id, "downvote", post_id=ids[1])
+
+        assert [(p.id, net) for p, net in get_top_voted_posts(db)] == [(ids[0], 2), (ids[1], -1)]
+
+    def test_create_vote_statements(self, db: Session, posts):
+        users, (first, _) = posts
+        user_id, post_id = users[0].id, first.id
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            vote = create_vote(db, user_id, "upvote", post_id=post_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        # The toggle DELETE, then the upsert, which checks the target exists
+        assert len(statements) == 2
+        assert (vote.user_id, vote.post_id) == (user_id, post_id)
+        assert create_vote(db, user_id, "upvote", post_id=post_id) is None
+
+    def test_create_vote_missing_target(self, db: Session, posts):
+        users, _ = posts
+
+        with pytest.raises(LookupError, match="Post with id 9999 not found"):
+            create_vote(db, users[0].id, "upvote", post_id=9999)
+        with pytest.raises(LookupError, match="Reply with id 9999 not found"):
+            create_vote(db, users[0].id, "upvote", reply_id=9999)
+        assert count_user_votes(db, users[0].id) == 0
+
+    def test_create_vote_missing_user(self, db: Session, posts):
+        _, (first, _) = posts
+
+        with pytest.raises(ValueError, match="User with id 9999 not found"):
+            create_vote(db, 9999, "upvote", post_id=first.id)
+        assert count_user_votes(db, 9999) == 0
+
+    def test_existing_targets(self, db: Session, posts):
+        _, (first, second) = posts
+        ids = [first.id, second.id]
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            found = existing_targets(db, post_ids=[*ids, 9999], reply_ids=[9999])
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert found == {("post", ids[0]), ("post", ids[1])}
+        assert len(statements) == 1
+        assert existing_targets(db) == set()
+
+
+class TestUserCRUD:
+    def test_check_conflicts_none(self, db: Session):
+        db.add(User(username="taken", email="taken@example.com", password_hash="hashed"))
+        db.commit()
+        
+        conflicts = user_crud.check_conflicts(db, "fresh", "fresh@example.com")
+        
+        assert conflicts == {"username": False, "email": False}
+
+    def test_check_conflicts_both(self, db: Session):
+        db.add_all([
+            User(username="taken", email="first@example.com", password_hash="hashed"),
+            User(username="other", email="taken@example.com", password_hash="hashed"),
+        ])
+        db.commit()
+        
+        conflicts = user_crud.check_conflicts(db, "taken", "taken@example.com")
+        
+        assert conflicts == {"username": True, "email": True}
+
+    def test_check_conflicts_excludes_user(self, db: Session):
+        user = User(username="taken", email="taken@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        conflicts = user_crud.check_conflicts(db, "taken", "taken@example.com", exclude_user_id=user.id)
+        
+        assert conflicts == {"username": False, "email": False}
+
+    def test_check_username_and_email_exists(self, db: Session):
+        user = User(username="taken", email="taken@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        assert user_crud.check_username_exists(db, "taken") is True
+        assert user_crud.check_username_exists(db, "fresh") is False
+        assert user_crud.check_username_exists(db, "taken", exclude_user_id=user.id) is False
+        assert user_crud.check_email_exists(db, "taken@example.com") is True
+        assert user_crud.check_email_exists(db, "fresh@example.com") is False
+
+
+    def test_get_user_by_id_is_cached(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        assert user_crud.get_user_by_id(db, user.id).username == "testuser"
+        assert ("id", user.id) in user_cache
+        assert ("username", "testuser") in user_cache
+        assert ("email", "test@example.com") in user_cache
+
+    def test_user_writes_invalidate_cache(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        user_crud.get_user_by_id(db, user.id)
+        
+        user_crud.deactivate_user(db, user.id)
+        
+        assert ("id", user.id) not in user_cache
+        assert user_crud.get_user_by_id(db, user.id).is_active is False
+
+    def test_user_writes_invalidate_moderator_cache(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        moderator_cache.set(user.id, True)
+        
+        user_crud.update_user(db, user.id, UserUpdate(is_active=False))
+        
+        assert user.id not in moderator_cache
+
+    def test_current_user_is_cached_until_user_changes(self, db: Session):
+        from fastapi import HTTPException
+        from fastapi.security import HTTPAuthorizationCredentials
+        from app.routers.auth import get_current_user
+        from app.utils.auth import create_access_token
+
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        credentials = HTTPAuthorizationCredentials(
+            scheme="Bearer", credentials=create_access_token({"sub": str(user_id)})
+        )
+
+        assert get_current_user(credentials, db).id == user_id
+        with patch("app.routers.auth.UserResponse.model_validate") as validate:
+            assert get_current_user(credentials, db).username == "testuser"
+            validate.assert_not_called()
+
+        user_crud.update_user(db, user_id, UserUpdate(is_active=False))
+        assert user_id not in current_user_cache
+        with pytest.raises(HTTPException):
+            get_current_user(credentials, db)
+        with pytest.raises(HTTPException):
+            get_current_user(None, db)
+
+    def test_authenticate_user_ignores_cached_snapshot(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed-old")
+        db.add(user)
+        db.commit()
+        user_crud.get_user_by_id(db, user.id)
+        assert "password_hash" not in user_cache.get(("id", user.id))
+        
+        # Changed on another worker: this worker's snapshot is stale
+        db.query(User).update({"password_hash": "hashed-new"})
+        db.commit()
+        
+        with patch("app.crud.auth.verify_password", side_effect=lambda plain, hashed: hashed == f"hashed-{plain}"):
+            assert user_crud.authenticate_user(db, "testuser", "old") is None
+            assert user_crud.authenticate_user(db, "test@example.com", "new").id == user.id
+            
+            db.query(User).update({"is_active": False})
+            db.commit()
+            assert user_crud.authenticate_user(db, "testuser", "new") is None
+
+    def test_update_user_drops_stale_email_from_cache(self, db: Session):
+        user = User(username="testuser", email="old@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        user_crud.get_user_by_username_or_email(db, "old@example.com")
+        
+        updated = user_crud.update_user(db, user.id, UserUpdate(email="new@example.com"))
+        
+        assert updated.email == "new@example.com"
+        assert ("email", "old@example.com") not in user_cache
+        assert user_crud.get_user_by_username_or_email(db, "old@example.com") is None
+
+    def test_update_user_not_exists(self, db: Session):
+        assert user_crud.update_user(db, 999, UserUpdate(is_active=False)) is None
+
+    def test_create_and_change_password_are_synchronous(self, db: Session):
+        with patch("app.crud.auth.hash_password", side_effect=lambda password: f"hashed-{password}"), \
+                patch("app.crud.auth.verify_password", side_effect=lambda plain, hashed: hashed == f"hashed-{plain}"):
+            user = user_crud.create_user(
+                db, UserRegister(username="syncuser", email="sync@example.com", password="Password123!")
+            )
+            assert user.password_hash == "hashed-Password123!"
+            assert user_crud.change_password(db, user.id, "Password123!", "Newpass123!") == (True, "Password changed successfully")
+        assert user.password_hash == "hashed-Newpass123!"
+
+    def test_bulk_create_users(self, db: Session):
+        users = [
+            UserRegister(username=f"bulkuser{i}", email=f"bulk{i}@example.com", password="Password123!")
+            for i in range(3)
+        ]
+        with ThreadPoolExecutor(max_workers=2) as pool, \
+             patch("app.crud.auth.get_hasher_pool", return_value=pool), \
+             patch("app.crud.auth.get_password_hash", side_effect=lambda password: f"hashed-{password}"):
+            created = user_crud.bulk_create_users(db, users)
+        
+        assert created == 3
+        rows = db.query(User).filter(User.username.like("bulkuser%")).order_by(User.username).all()
+        assert [u.email for u in rows] == [f"bulk{i}@example.com" for i in range(3)]
+        assert all(u.password_hash == "hashed-Password123!" and u.is_active for u in rows)
+
+
+class TestRefreshTokenCRUD:
+    def test_limit_user_tokens_revokes_oldest(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        base_time = datetime(2024, 1, 1)
+        expires_at = datetime.utcnow() + timedelta(days=1)
+        tokens = [
+            RefreshToken(token=f"token-{i}", user_id=user.id, expires_at=expires_at,
+                         created_at=base_time + timedelta(minutes=i))
+            for i in range(6)
+        ]
+        db.add_all(tokens)
+        db.commit()
+        
+        revoked = refresh_token_crud.limit_user_tokens(db, user.id, max_tokens=5)
+        
+        assert revoked == 2
+        active = {t.token for t in refresh_token_crud.get_user_active_tokens(db, user.id)}
+        assert active == {"token-2", "token-3", "token-4", "token-5"}
+
+    def test_limit_user_tokens_under_limit(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        expires_at = datetime.utcnow() + timedelta(days=1)
+        db.add_all([
+            RefreshToken(token=f"token-{i}", user_id=user.id, expires_at=expires_at)
+            for i in range(3)
+        ])
+        db.commit()
+        
+        assert refresh_token_crud.limit_user_tokens(db, user.id, max_tokens=5) == 0
+
+    def test_get_user_sessions(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+
+        base_time = datetime(2024, 1, 1)
+        expires_at = datetime.utcnow() + timedelta(days=1)
+        tokens = [
+            RefreshToken(token=f"token-{i}", user_id=user.id, expires_at=expires_at,
+                         created_at=base_time + timedelta(minutes=i), is_revoked=(i == 1))
+            for i in range(3)
+        ]
+        db.add_all(tokens)
+        db.commit()
+
+        sessions = refresh_token_crud.get_user_sessions(db, user.id)
+
+        assert [s["id"] for s in sessions] == [tokens[2].id, tokens[0].id]
+        assert set(sessions[0]) == {"id", "created_at", "expires_at"}
+
+    def test_revoke_user_session(self, db: Session):
+        users = [User(username=f"user{i}", email=f"user{i}@test.com", password_hash="hashed") for i in range(2)]
+        db.add_all(users)
+        db.commit()
+
+        expires_at = datetime.utcnow() + timedelta(days=1)
+        token = RefreshToken(token="token", user_id=users[0].id, expires_at=expires_at)
+        db.add(token)
+        db.commit()
+
+        assert not refresh_token_crud.revoke_user_session(db, users[1].id, token.id)
+        assert refresh_token_crud.get_refresh_token_user_id(db, "token") == users[0].id
+
+        assert refresh_token_crud.revoke_user_session(db, users[0].id, token.id)
+        assert refresh_token_crud.get_refresh_token_user_id(db, "token") is None
+        assert not refresh_token_crud.revoke_user_session(db, users[0].id, 9999)
+
+    def test_get_refresh_token_user_id(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+
+        expires_at = datetime.utcnow() + timedelta(days=1)
+        db.add_all([
+            RefreshToken(token="live", user_id=user.id, expires_at=expires_at),
+            RefreshToken(token="revoked", user_id=user.id, expires_at=expires_at, is_revoked=True),
+            RefreshToken(token="expired", user_id=user.id, expires_at=datetime.utcnow() - timedelta(days=1)),
+        ])
+        db.commit()
+
+        assert refresh_token_crud.get_refresh_token_user_id(db, "live") == user.id
+        for token in ("revoked", "expired", "missing"):
+            assert refresh_token_crud.get_refresh_token_user_id(db, token) is None
+
+    def test_issue_refresh_token_caps_sessions(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+
+        base_time = datetime(2024, 1, 1)
+        expires_at = datetime.utcnow() + timedelta(days=1)
+        db.add_all([
+            RefreshToken(token=f"token-{i}", user_id=user.id, expires_at=expires_at,
+                         created_at=base_time + timedelta(minutes=i))
+            for i in range(5)
+        ])
+        db.commit()
+        user_id = user.id
+
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            refresh_token_crud.issue_refresh_token(db, user_id, "token-new", expires_at, max_tokens=5)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        # Revoke the oldest, insert the new one, one commit
+        assert len(statements) == 2
+        active = {t.token for t in refresh_token_crud.get_user_active_tokens(db, user_id)}
+        assert active == {"token-1", "token-2", "token-3", "token-4", "token-new"}
+
+    def test_cleanup_expired_tokens_in_batches(self, db: Session):
+        user = User(username="testuser", email="test@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        
+        expired_at = datetime.utcnow() - timedelta(days=1)
+        db.add_all([
+            RefreshToken(token=f"expired-{i}", user_id=user.id, expires_at=expired_at)
+            for i in range(5)
+        ])
+        db.add(RefreshToken(token="live", user_id=user.id,
+                            expires_at=datetime.utcnow() + timedelta(days=1)))
+        db.add_all([
+            RevokedToken(jti="expired", expires_at=expired_at),
+            RevokedToken(jti="live", expires_at=datetime.utcnow() + timedelta(minutes=5))
+        ])
+        db.commit()
+        
+        assert refresh_token_crud.cleanup_expired_tokens(db, batch_size=2) == 5
+        assert [t.token for t in db.query(RefreshToken).all()] == ["live"]
+        assert [t.jti for t in db.query(RevokedToken).all()] == ["live"]
+
+
+class TestModerationCRUD:
+    def test_deferred_audit_written_by_write_audit(self, db: Session):
+        user = User(username="regular_user", email="user@example.com", password_hash="hashed")
+        moderator = User(username="moderator", email="mod@example.com", password_hash="hashed", is_superuser=True)
+        db.add_all([user, moderator])
+        db.commit()
+        channel = Channel(name="general", created_by=user.id)
+        db.add(channel)
+        db.commit()
+        post = Post(title="Post", content="Content", channel_id=channel.id, author_id=user.id)
+        db.add(post)
+        db.commit()
+        
+        moderation = ModerationCRUD(db, defer_audit=True)
+        # A flag or warning is the action row itself: never deferred
+        assert moderation.flag_content(TargetType.POST, post.id, moderator.id, "Off topic")
+        assert moderation.warn_user(user.id, moderator.id, "Be nice")
+        assert moderation.ban_user(user.id, moderator.id, "Spam", permanent=True)
+        assert [reason for reason, in db.query(ModerationAction.reason).order_by(ModerationAction.id)] == ["Off topic", "Be nice"]
+        assert db.query(ModerationLog).count() == 1
+        assert db.query(User.is_active).filter(User.id == user.id).scalar() is False
+        
+        moderation.write_audit()
+        assert [reason for reason, in db.query(ModerationAction.reason).order_by(ModerationAction.id)] == ["Off topic", "Be nice", "Spam"]
+        assert db.query(ModerationLog).count() == 2
+        assert moderation.pending_audit == []
+    
+    def test_failed_deferred_audit_is_logged(self, db: Session, caplog):
+        moderator = User(username="moderator", email="mod@example.com", password_hash="hashed", is_superuser=True)
+        db.add(moderator)
+        db.commit()
+        
+        moderation = ModerationCRUD(db, defer_audit=True)
+        assert moderation.ban_user(moderator.id, moderator.id, "Spam", permanent=True)
+        with patch("sqlalchemy.orm.Session.commit", side_effect=RuntimeError("engine gone")):
+            moderation.write_audit()
+        
+        assert "Moderation audit rows not written" in caplog.text
+        assert "Spam" in caplog.text
+        assert db.query(ModerationAction).count() == 0
+    
+    def test_delete_reply_decrements_reply_count_once(self, db: Session):
+        user = User(username="moderator", email="mod@example.com", password_hash="hashed", is_superuser=True)
+        db.add(user)
+        db.commit()
+        channel = Channel(name="general", created_by=user.id)
+        db.add(channel)
+        db.commit()
+        post = Post(title="Post", content="Content", channel_id=channel.id, author_id=user.id)
+        db.add(post)
+        db.commit()
+        reply = create_reply(db, ReplyCreate(content="Spam", author_id=user.id), post.id)
+        
+        moderation = ModerationCRUD(db)
+        assert moderation.delete_reply(reply.id, user.id, "Spam")
+        # A second delete is still logged but leaves the count alone
+        assert moderation.delete_reply(reply.id, user.id, "Spam")
+        assert not moderation.delete_reply(9999, user.id, "Spam")
+        assert db.query(Post.reply_count).filter(Post.id == post.id).scalar() == 0
+        assert db.query(ModerationAction).count() == 2
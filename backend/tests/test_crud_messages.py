@@ -1,4 +1,6 @@
 import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from app.crud.message import (
     create_message,
@@ -40,6 +42,30 @@ class TestMessageCRUD:
         assert created_message.created_at is not None
         assert not hasattr(created_message, 'read_at')  # Should be unread initially
     
+    def test_create_message_unknown_recipient(self, db: Session):
+        """Test the recipient check and the insert share one statement"""
+        sender = User(username="alice", email="alice@test.com", password_hash="hashed")
+        recipient = User(username="bob", email="bob@test.com", password_hash="hashed")
+        db.add_all([sender, recipient])
+        db.commit()
+        sender_id, recipient_id = sender.id, recipient.id
+        
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            created_message = create_message(db, MessageCreate(content="Hi", recipient_id=recipient_id), sender_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        
+        assert len(statements) == 1
+        assert created_message.recipient_id == recipient_id
+        assert created_message.read_at is None
+        
+        assert create_message(db, MessageCreate(content="Hi", recipient_id=9999), sender_id) is None
+        assert db.query(Message).count() == 1
+    
     def test_get_conversation_empty(self, db: Session):
         """Test getting conversation when no messages exist"""
         # Create users
@@ -103,21 +129,27 @@ class TestMessageCRUD:
         db.refresh(user2)
         
         # Create 10 messages
+        base_time = datetime(2024, 1, 1, 12, 0, 0)
         for i in range(10):
             message = Message(
                 content=f"Message {i+1}",
                 sender_id=user1.id if i % 2 == 0 else user2.id,
-                recipient_id=user2.id if i % 2 == 0 else user1.id
+                recipient_id=user2.id if i % 2 == 0 else user1.id,
+                created_at=base_time + timedelta(minutes=i)
             )
             db.add(message)
         db.commit()
         
-        # Test pagination
-        messages = get_conversation(db, user1.id, user2.id, skip=3, limit=4)
+        # Latest page first, each page oldest first
+        latest = get_conversation(db, user1.id, user2.id, limit=4)
+        assert [m.content for m in latest] == ["Message 7", "Message 8", "Message 9", "Message 10"]
+        
+        # Page back from the oldest message seen
+        earlier = get_conversation(db, user1.id, user2.id, before_id=latest[0].id, limit=4)
+        assert [m.content for m in earlier] == ["Message 3", "Message 4", "Message 5", "Message 6"]
         
-        assert len(messages) == 4
-        assert messages[0].content == "Message 4"
-        assert messages[3].content == "Message 7"
+        first = get_conversation(db, user1.id, user2.id, before_id=earlier[0].id, limit=4)
+        assert [m.content for m in first] == ["Message 1", "Message 2"]
     
     def test_get_conversations_list(self, db: Session):
         """Test getting list of all conversations for a user"""
@@ -180,6 +212,67 @@ class TestMessageCRUD:
             assert "other_username" in conv
             assert "unread_count" in conv
     
+    def test_get_conversations_unread_counts(self, db: Session):
+        """Test unread counts are reported per conversation"""
+        # Create users
+        user1 = User(username="alice", email="alice@test.com", password_hash="hashed")
+        user2 = User(username="bob", email="bob@test.com", password_hash="hashed")
+        user3 = User(username="charlie", email="charlie@test.com", password_hash="hashed")
+        db.add_all([user1, user2, user3])
+        db.commit()
+        
+        base_time = datetime(2024, 1, 1, 12, 0, 0)
+        
+        # Two unread messages from user2, one already read
+        db.add_all([
+            Message(content="Bob 1", sender_id=user2.id, recipient_id=user1.id,
+                    created_at=base_time),
+            Message(content="Bob 2", sender_id=user2.id, recipient_id=user1.id,
+                    created_at=base_time + timedelta(minutes=1)),
+            Message(content="Bob 3", sender_id=user2.id, recipient_id=user1.id,
+                    created_at=base_time + timedelta(minutes=2), read_at=base_time),
+        ])
+        # Only outgoing messages to user3
+        db.add(Message(content="Hi Charlie", sender_id=user1.id, recipient_id=user3.id,
+                       created_at=base_time + timedelta(minutes=3)))
+        db.commit()
+        
+        conversations = get_conversations(db, user1.id)
+        unread_by_user = {conv["other_user_id"]: conv["unread_count"] for conv in conversations}
+        
+        assert unread_by_user == {user2.id: 2, user3.id: 0}
+    
+    def test_get_conversations_single_query(self, db: Session):
+        """Test conversation listing costs one query however many partners"""
+        users = [User(username=f"user{i}", email=f"user{i}@test.com", password_hash="hashed") for i in range(5)]
+        db.add_all(users)
+        db.commit()
+        
+        base_time = datetime(2024, 1, 1, 12, 0, 0)
+        for i, other in enumerate(users[1:]):
+            db.add_all([
+                Message(content=f"To {i}", sender_id=users[0].id, recipient_id=other.id,
+                        created_at=base_time + timedelta(minutes=2 * i)),
+                Message(content=f"From {i}", sender_id=other.id, recipient_id=users[0].id,
+                        created_at=base_time + timedelta(minutes=2 * i + 1)),
+            ])
+        db.commit()
+        user_id = users[0].id
+        db.expunge_all()
+        
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            conversations = get_conversations(db, user_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+        
+        assert [conv["latest_message"]["content"] for conv in conversations] == ["From 3", "From 2", "From 1", "From 0"]
+        assert [conv["other_username"] for conv in conversations] == ["user4", "user3", "user2", "user1"]
+        assert len(statements) == 1
+    
     def test_mark_messages_as_read(self, db: Session):
         """Test marking messages as read"""
         # Create users
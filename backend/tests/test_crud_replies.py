@@ -0,0 +1,319 @@
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import Session
+from app.crud.reply import (
+    bulk_delete_replies,
+    count_post_replies,
+    count_search_matches,
+    create_reply,
+    delete_reply,
+    get_post_replies,
+    get_post_replies_threaded,
+    get_reply_thread,
+    get_reply_ancestors,
+    get_reply_children,
+    get_reply_descendants,
+    get_reply_siblings,
+    get_user_replies,
+    iter_post_replies,
+    search_replies
+)
+from app.models.models import User, Channel, Post, Reply, MAX_REPLY_DEPTH
+from app.schemas.reply import ReplyCreate, ReplyResponse
+from app.utils.pagination import next_cursor
+
+class TestReplyTreeCRUD:
+    """Test suite for reply thread traversal"""
+
+    @pytest.fixture
+    def tree(self, db: Session):
+        """
+        root
+        ├── a
+        │   └── a1
+        │       └── a1x
+        └── b
+        other (separate thread)
+        """
+        user = User(username="alice", email="alice@test.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        channel = Channel(name="general", created_by=user.id)
+        db.add(channel)
+        db.commit()
+        post = Post(title="Post", content="Content", channel_id=channel.id, author_id=user.id)
+        db.add(post)
+        db.commit()
+
+        base_time = datetime(2024, 1, 1)
+        replies = {}
+        for minute, (name, parent) in enumerate([
+            ("root", None), ("a", "root"), ("b", "root"), ("a1", "a"), ("other", None), ("a1x", "a1")
+        ]):
+            reply = Reply(
+                content=name, post_id=post.id, author_id=user.id,
+                parent_id=replies[parent].id if parent else None,
+                created_at=base_time + timedelta(minutes=minute)
+            )
+            db.add(reply)
+            db.commit()
+            replies[name] = reply
+
+        db.expire_all()
+        return replies
+
+    def test_get_reply_thread(self, db: Session, tree):
+        thread = get_reply_thread(db, tree["a1"].id)
+
+        assert [r.content for r in thread] == ["root", "a", "b", "a1", "a1x"]
+
+    def test_get_reply_ancestors(self, db: Session, tree):
+        ancestors = get_reply_ancestors(db, tree["a1x"].id)
+
+        assert [r.content for r in ancestors] == ["a1", "a", "root"]
+        assert get_reply_ancestors(db, tree["root"].id) == []
+
+    def test_get_reply_descendants_depth_first(self, db: Session, tree):
+        descendants = get_reply_descendants(db, tree["root"].id)
+
+        assert [r.content for r in descendants] == ["a", "a1", "a1x", "b"]
+
+    def test_deleted_reply_has_no_tree(self, db: Session, tree):
+        tree["a"].deleted_at = datetime.utcnow()
+        db.commit()
+
+        assert get_reply_thread(db, tree["a"].id) == []
+        assert get_reply_ancestors(db, tree["a"].id) == []
+        assert get_reply_descendants(db, tree["a"].id) == []
+
+    def test_get_reply_thread_query_count(self, db: Session, tree):
+        reply_id = tree["a1x"].id
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            get_reply_thread(db, reply_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        # The reply, then its thread by path prefix, whatever the depth
+        assert len(statements) == 2
+
+    def test_reply_paths(self, db: Session, tree):
+        assert tree["root"].path == "/"
+        assert tree["a1x"].path == f"/{tree['root'].id}/{tree['a'].id}/{tree['a1'].id}/"
+        assert tree["a1x"].depth == 3
+        assert tree["a1x"].ancestor_ids == [tree["root"].id, tree["a"].id, tree["a1"].id]
+
+    def test_reply_ancestors_property_single_query(self, db: Session, tree):
+        leaf = tree["a1x"]
+        leaf.path  # load the expired row first
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            ancestors = [r.content for r in leaf.ancestors]
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert ancestors == ["a1", "a", "root"]
+        assert len(statements) == 1
+        assert leaf.thread_root is tree["root"]
+        assert tree["a"].is_ancestor_of(leaf)
+        assert not tree["b"].is_ancestor_of(leaf)
+
+    def test_reply_descendants_property_single_query(self, db: Session, tree):
+        root = tree["root"]
+        root.path  # load the expired row first
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            descendants = [r.content for r in root.descendants]
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert descendants == ["a", "a1", "a1x", "b"]
+        assert len(statements) == 1
+
+    def test_get_reply_siblings(self, db: Session, tree):
+        assert [r.content for r in get_reply_siblings(db, tree["a"].id)] == ["b"]
+        assert [r.content for r in get_reply_siblings(db, tree["root"].id)] == ["other"]
+        assert get_reply_siblings(db, tree["a1"].id) == []
+
+    def test_get_reply_children_pages_by_cursor(self, db: Session, tree):
+        first_page = get_reply_children(db, tree["root"].id, limit=1)
+        second_page = get_reply_children(db, tree["root"].id, next_cursor(first_page, 1), limit=1)
+
+        assert [r.content for r in first_page] == ["a"]
+        assert [r.content for r in second_page] == ["b"]
+        assert get_reply_children(db, tree["root"].id, next_cursor(second_page, 1), limit=1) == []
+        assert [r.content for r in get_reply_children(db, tree["root"].id, skip=1)] == ["b"]
+
+    def test_deprecated_skip_is_applied(self, db: Session, tree):
+        post_id = tree["root"].post_id
+        author_id = tree["root"].author_id
+
+        assert [r.content for r in get_post_replies(db, post_id, skip=4)] == ["other", "a1x"]
+        assert [r.content for r in iter_post_replies(db, post_id, limit=2, skip=1)] == ["a", "b"]
+        assert [r.content for r in get_user_replies(db, author_id, skip=4)] == ["a", "root"]
+        assert [r.content for r in search_replies(db, post_id, "a", skip=1)] == ["a1", "a1x"]
+
+    def test_search_replies_pages_by_cursor(self, db: Session, tree):
+        post_id = tree["root"].post_id
+
+        first_page = search_replies(db, post_id, "a", limit=2)
+        second_page = search_replies(db, post_id, "a", next_cursor(first_page, 2), limit=2)
+
+        assert [r.content for r in first_page] == ["a", "a1"]
+        assert [r.content for r in second_page] == ["a1x"]
+        assert count_search_matches(db, post_id, "a") == 3
+        assert count_search_matches(db, post_id, "zzz") == 0
+
+    def test_get_post_replies_threaded_order(self, db: Session, tree):
+        post_id = tree["root"].post_id
+
+        threaded = get_post_replies_threaded(db, post_id)
+
+        assert [r.content for r in threaded] == ["root", "a", "a1", "a1x", "b", "other"]
+
+    def test_get_post_replies_threaded_pagination(self, db: Session, tree):
+        post_id = tree["root"].post_id
+
+        page = get_post_replies_threaded(db, post_id, skip=2, limit=3)
+
+        assert [r.content for r in page] == ["a1", "a1x", "b"]
+
+    def test_get_post_replies_threaded_skips_deleted_subtrees(self, db: Session, tree):
+        post_id = tree["root"].post_id
+        tree["a"].deleted_at = datetime.utcnow()
+        db.commit()
+
+        threaded = get_post_replies_threaded(db, post_id)
+
+        assert [r.content for r in threaded] == ["root", "b", "other"]
+
+    def test_bulk_delete_replies(self, db: Session, tree):
+        already_deleted = tree["b"]
+        already_deleted.deleted_at = datetime(2024, 2, 1)
+        db.commit()
+
+        deleted = bulk_delete_replies(db, [tree["a"].id, tree["a1"].id, already_deleted.id])
+
+        assert deleted == 2
+        assert tree["a"].deleted_at is not None
+        assert tree["a1"].deleted_at is not None
+        assert already_deleted.deleted_at == datetime(2024, 2, 1)
+        assert tree["root"].deleted_at is None
+
+    def test_create_reply_statements(self, db: Session, tree):
+        parent = tree["a1x"]
+        post_id, author_id, parent_id = parent.post_id, parent.author_id, parent.id
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            reply = create_reply(db, ReplyCreate(content="c", author_id=author_id, parent_id=parent_id), post_id)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        # Validated INSERT plus the post's reply_count bump
+        assert len(statements) == 2
+        assert reply.id is not None
+        assert reply.parent_id == parent_id
+        assert reply.path == f"{parent.path}{parent_id}/"
+        assert reply.created_at is not None
+
+    @pytest.mark.parametrize("case, message", [
+        ("post", "Post not found"),
+        ("author", "Author not found"),
+        ("parent", "Parent reply not found"),
+        ("deleted_parent", "Parent reply not found"),
+    ])
+    def test_create_reply_errors(self, db: Session, tree, case, message):
+        root = tree["root"]
+        post_id, author_id, parent_id = root.post_id, root.author_id, root.id
+        if case == "post":
+            post_id = 9999
+        elif case == "author":
+            author_id = 9999
+        elif case == "parent":
+            parent_id = 9999
+        else:
+            root.deleted_at = datetime.utcnow()
+            db.commit()
+
+        with pytest.raises(ValueError, match=message):
+            create_reply(db, ReplyCreate(content="c", author_id=author_id, parent_id=parent_id), post_id)
+
+    def test_create_reply_max_depth(self, db: Session, tree):
+        parent = tree["root"]
+        post_id, author_id = parent.post_id, parent.author_id
+        for _ in range(MAX_REPLY_DEPTH):
+            parent = create_reply(db, ReplyCreate(content="c", author_id=author_id, parent_id=parent.id), post_id)
+
+        with pytest.raises(ValueError, match="Maximum reply depth exceeded"):
+            create_reply(db, ReplyCreate(content="c", author_id=author_id, parent_id=parent.id), post_id)
+
+    def test_get_post_replies_eager_loads_response_fields(self, db: Session, tree):
+        post_id = tree["root"].post_id
+        db.expunge_all()
+        statements = []
+        engine = db.get_bind()
+        listener = lambda *args: statements.append(args[2])
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            replies = get_post_replies(db, post_id)
+            depths = [ReplyResponse.model_validate(r).depth for r in replies]
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert depths == [0, 1, 1, 2, 0, 3]
+        # Vote counts and depth are columns: the page query is all it takes
+        assert len(statements) == 1
+        with pytest.raises(InvalidRequestError):
+            replies[0].author
+
+    @pytest.mark.parametrize("limit", [2, 6, 10])
+    def test_iter_post_replies_matches_page(self, db: Session, tree, limit):
+        post_id = tree["root"].post_id
+        page = get_post_replies(db, post_id, limit=limit)
+
+        assert list(iter_post_replies(db, post_id, limit=limit, batch_size=4)) == page
+        cursor = next_cursor(page, limit)
+        if cursor:
+            assert list(iter_post_replies(db, post_id, cursor, limit)) == get_post_replies(db, post_id, cursor, limit)
+
+    @pytest.mark.parametrize("listing", [
+        lambda db, post_id: get_post_replies_threaded(db, post_id),
+        lambda db, post_id: search_replies(db, post_id, "a"),
+    ])
+    def test_reply_listings_raise_on_lazy_loads(self, db: Session, tree, listing):
+        replies = listing(db, tree["root"].post_id)
+
+        assert replies
+        with pytest.raises(InvalidRequestError):
+            replies[0].author
+
+    def test_reply_count_follows_writes(self, db: Session, tree):
+        root = tree["root"]
+        post_id, author_id = root.post_id, root.author_id
+
+        first = create_reply(db, ReplyCreate(content="c", author_id=author_id), post_id)
+        second = create_reply(db, ReplyCreate(content="c", author_id=author_id, parent_id=first.id), post_id)
+        create_reply(db, ReplyCreate(content="c", author_id=author_id), post_id)
+        assert count_post_replies(db, post_id) == 3
+
+        assert delete_reply(db, first.id)
+        assert not delete_reply(db, first.id)
+        assert count_post_replies(db, post_id) == 2
+
+        assert bulk_delete_replies(db, [first.id, second.id]) == 1
+        assert count_post_replies(db, post_id) == 1
+        assert count_post_replies(db, 9999) == 0
@@ -1,5 +1,5 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker
 from backend.app.models.models import Base, User, Channel, Post, Reply, Vote, Message
 from datetime import datetime
@@ -159,6 +159,99 @@ def test_message_model_creation(db_session):
     assert message.recipient_id == recipient.id
     assert message.created_at is not None
 
+def test_message_conversation_indexes():
+    """Test Message declares partial composite indexes for both conversation legs"""
+    indexes = {index.name: index for index in Message.__table__.indexes}
+    
+    sender_leg = indexes["ix_messages_conv_sr"]
+    recipient_leg = indexes["ix_messages_conv_rs"]
+    
+    assert [c.name for c in sender_leg.columns] == ["sender_id", "recipient_id", "created_at"]
+    assert [c.name for c in recipient_leg.columns] == ["recipient_id", "sender_id", "created_at"]
+    assert str(sender_leg.dialect_options["postgresql"]["where"]) == "deleted_at IS NULL"
+    assert str(recipient_leg.dialect_options["postgresql"]["where"]) == "deleted_at IS NULL"
+
+def test_message_unread_index():
+    """Test Message declares a partial index covering only unread, live rows"""
+    indexes = {index.name: index for index in Message.__table__.indexes}
+    
+    unread = indexes["ix_messages_unread"]
+    
+    assert [c.name for c in unread.columns] == ["recipient_id", "sender_id"]
+    assert str(unread.dialect_options["postgresql"]["where"]) == "read_at IS NULL AND deleted_at IS NULL"
+
+def test_reply_listing_indexes():
+    """Test Reply declares composite indexes matching its listing queries"""
+    indexes = {index.name: index for index in Reply.__table__.indexes}
+    
+    post_created = indexes["ix_replies_post_created"]
+    parent_created = indexes["ix_replies_parent_created"]
+    
+    assert [c.name for c in post_created.columns] == ["post_id", "created_at", "id"]
+    assert [c.name for c in parent_created.columns] == ["parent_id", "created_at", "id"]
+    assert str(post_created.dialect_options["postgresql"]["where"]) == "deleted_at IS NULL"
+    assert "ix_replies_author_created" in indexes
+    assert [c.name for c in indexes["ix_replies_path"].columns] == ["path"]
+    assert str(indexes["ix_replies_recent"].dialect_options["postgresql"]["where"]) == "deleted_at IS NULL"
+    assert indexes["ix_replies_content_fts"].dialect_options["postgresql"]["using"] == "gin"
+
+def test_vote_indexes():
+    """Test Vote declares indexes for per-target tallies and a user's history"""
+    indexes = {index.name: index for index in Vote.__table__.indexes}
+    
+    assert [c.name for c in indexes["ix_votes_post_type"].columns] == ["post_id", "vote_type", "created_at"]
+    assert [c.name for c in indexes["ix_votes_reply_type"].columns] == ["reply_id", "vote_type", "created_at"]
+    assert [c.name for c in indexes["ix_votes_user_created"].columns] == ["user_id", "created_at", "id"]
+
+def test_banned_users_partial_index():
+    """Test User declares a partial index covering only banned users"""
+    indexes = {index.name: index for index in User.__table__.indexes}
+    
+    banned = indexes["ix_users_banned"]
+    
+    assert [c.name for c in banned.columns] == ["id"]
+    assert str(banned.dialect_options["postgresql"]["where"]) == "is_active = false"
+
+def test_message_full_text_index(db_session):
+    """Test Message declares a GIN full-text index that is only built on PostgreSQL"""
+    indexes = {index.name: index for index in Message.__table__.indexes}
+    
+    fts = indexes["ix_messages_content_fts"]
+    
+    assert fts.dialect_options["postgresql"]["using"] == "gin"
+    assert str(fts.dialect_options["postgresql"]["where"]) == "deleted_at IS NULL"
+    
+    created = {index["name"] for index in inspect(db_session.get_bind()).get_indexes("messages")}
+    assert "ix_messages_content_fts" not in created
+
+def test_vote_count_triggers(db_session):
+    """Test vote counts follow votes written outside the ORM too"""
+    author = User(username="author", email="author@example.com", password_hash="hash")
+    voters = [User(username=f"voter{i}", email=f"voter{i}@example.com", password_hash="hash") for i in range(3)]
+    db_session.add_all([author, *voters])
+    db_session.commit()
+    channel = Channel(name="general", description="General", created_by=author.id)
+    db_session.add(channel)
+    db_session.commit()
+    post = Post(title="Test Post", content="Content", channel_id=channel.id, author_id=author.id)
+    db_session.add(post)
+    db_session.commit()
+
+    votes = Vote.__table__
+    db_session.execute(votes.insert(), [
+        {"post_id": post.id, "user_id": voter.id, "vote_type": "upvote"} for voter in voters
+    ])
+    db_session.execute(
+        votes.update().where(votes.c.user_id == voters[0].id).values(vote_type="downvote")
+    )
+    db_session.execute(votes.delete().where(votes.c.user_id == voters[1].id))
+    db_session.commit()
+    db_session.refresh(post)
+
+    assert (post.upvote_count, post.downvote_count) == (1, 1)
+    assert post.net_votes == 0
+    assert post.total_votes == 2
+
 def test_model_relationships(db_session):
     """Test relationships between all models"""
     user1 = User(username="user1", email="user1@example.com", password_hash="hash")
@@ -0,0 +1,110 @@
+import pytest
+from datetime import datetime
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from app.main import app
+from app.models.models import User
+from app.utils.auth import create_access_token, token_cache
+from app.database import get_db
+from backend.app.database import get_db as backend_get_db
+from backend.app.crud.moderation import ModerationCRUD
+from backend.app.models.models import ModerationAction, ModerationLog, ActionType, TargetType
+from backend.app.utils.pagination import next_cursor
+
+
+@pytest.fixture
+def client(db: Session):
+    """Client whose routers, under either import root, use the test session"""
+    for dependency in {get_db, backend_get_db}:
+        app.dependency_overrides[dependency] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    token_cache.clear()
+
+
+@pytest.fixture
+def moderator_headers(db: Session):
+    moderator = User(username="moderator", email="mod@example.com", password_hash="hashed", is_superuser=True)
+    db.add(moderator)
+    db.commit()
+    token = create_access_token({"sub": str(moderator.id), "is_superuser": True})
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestModerationAuth:
+    def test_logged_out_token_refused(self, client: TestClient, moderator_headers):
+        assert client.get("/api/moderation/logs", headers=moderator_headers).status_code == 200
+
+        assert client.post("/auth/logout", headers=moderator_headers).status_code == 200
+
+        response = client.get("/api/moderation/logs", headers=moderator_headers)
+        assert response.status_code == 401
+
+    def test_ban_ends_cached_session(self, client: TestClient, db: Session):
+        user = User(username="regular_user", email="user@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        user_headers = {"Authorization": f"Bearer {create_access_token({'sub': str(user_id)})}"}
+        assert client.get("/auth/me", headers=user_headers).status_code == 200
+
+        assert ModerationCRUD(db).ban_user(user_id, user_id, "Spam", permanent=True)
+
+        # The ban may have run on another worker: write paths read is_active
+        assert client.delete("/auth/sessions/1", headers=user_headers).status_code == 401
+        assert client.get("/auth/me", headers=user_headers).status_code == 401
+
+    def test_banned_moderator_cannot_act(self, client: TestClient, db: Session, moderator_headers):
+        assert client.get("/api/moderation/logs", headers=moderator_headers).status_code == 200
+
+        # Banned elsewhere: this worker's cache still says moderator
+        db.query(User).update({"is_active": False})
+        db.commit()
+
+        response = client.post("/api/moderation/users/1/warn", json={"reason": "Spam"}, headers=moderator_headers)
+        assert response.status_code == 403
+
+
+
+class TestModerationActions:
+    def test_ban_audit_written_after_response(self, client: TestClient, db: Session, moderator_headers):
+        user = User(username="regular_user", email="user@example.com", password_hash="hashed")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+        response = client.post(
+            f"/api/moderation/users/{user_id}/ban",
+            json={"reason": "Spam", "permanent": True},
+            headers=moderator_headers
+        )
+        assert response.status_code == 200
+
+        # The background task has run by the time the client returns
+        assert [tuple(row) for row in db.query(ModerationAction.target_id, ModerationAction.reason)] == [(user_id, "Spam")]
+        assert db.query(ModerationLog).count() == 1
+
+
+
+class TestModerationLogs:
+    def test_get_moderation_actions_pages_by_cursor(self, db: Session):
+        for minute in range(3):
+            db.add(ModerationAction(
+                action_type=ActionType.DELETE, target_type=TargetType.POST, target_id=minute,
+                moderator_id=1, reason=f"r{minute}", created_at=datetime(2024, 1, 1, 0, minute)
+            ))
+        db.commit()
+        moderation = ModerationCRUD(db)
+
+        first = moderation.get_moderation_actions(limit=2)
+        rest = moderation.get_moderation_actions(limit=2, cursor=next_cursor(first, 2))
+        assert [action.reason for action in first + rest] == ["r2", "r1", "r0"]
+        assert next_cursor(rest, 2) is None
+
+    def test_logs_endpoint(self, client: TestClient, moderator_headers):
+        response = client.get("/api/moderation/logs", headers=moderator_headers)
+        assert response.status_code == 200
+        assert response.json() == {"data": [], "next_cursor": None}
+
+        response = client.get("/api/moderation/logs?cursor=bad", headers=moderator_headers)
+        assert response.status_code == 400
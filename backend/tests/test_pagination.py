@@ -0,0 +1,15 @@
+import pytest
+from datetime import datetime
+from app.utils.pagination import Cursor
+
+
+class TestCursor:
+    def test_round_trip(self):
+        cursor = Cursor(created_at=datetime(2024, 1, 2, 3, 4, 5, 678), id=42)
+        
+        assert Cursor.decode(cursor.encode()) == cursor
+
+    @pytest.mark.parametrize("token", ["", "not-base64!", "eyJpZCI6IDF9"])
+    def test_decode_rejects_malformed_tokens(self, token):
+        with pytest.raises(ValueError):
+            Cursor.decode(token)
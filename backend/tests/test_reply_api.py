@@ -130,22 +130,25 @@ class TestReplyAPIEndpoints:
         db.close()
         
         # Test pagination
-        response = client.get(f"/posts/{post_id}/replies?skip=0&limit=10")
+        response = client.get(f"/posts/{post_id}/replies?limit=10")
         assert response.status_code == 200
         replies = response.json()
         assert len(replies) == 10
+        cursor = response.headers["X-Next-Cursor"]
         
         # Test second page
-        response = client.get(f"/posts/{post_id}/replies?skip=10&limit=10")
+        response = client.get(f"/posts/{post_id}/replies?cursor={cursor}&limit=10")
         assert response.status_code == 200
         replies = response.json()
         assert len(replies) == 10
+        cursor = response.headers["X-Next-Cursor"]
         
         # Test third page
-        response = client.get(f"/posts/{post_id}/replies?skip=20&limit=10")
+        response = client.get(f"/posts/{post_id}/replies?cursor={cursor}&limit=10")
         assert response.status_code == 200
         replies = response.json()
         assert len(replies) == 5
+        assert "X-Next-Cursor" not in response.headers
     
     def test_get_post_replies_sorted_by_creation(self, client, sample_data):
         """Test GET /posts/{post_id}/replies returns replies sorted by creation time"""
@@ -0,0 +1,19 @@
+import json
+from datetime import datetime
+from app.utils.responses import FastJSONResponse
+
+
+class TestFastJSONResponse:
+    def test_matches_json_module_output(self):
+        content = {"data": [{"id": 1, "content": "héllo", "read_at": None}], "next_cursor": None}
+        
+        response = FastJSONResponse(content)
+        
+        assert json.loads(response.body) == content
+        assert response.body == json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+        assert response.media_type == "application/json"
+
+    def test_serializes_datetimes(self):
+        response = FastJSONResponse({"created_at": datetime(2024, 1, 2, 3, 4, 5)})
+        
+        assert json.loads(response.body) == {"created_at": "2024-01-02T03:04:05"}
@@ -426,7 +426,46 @@ class TestVoteAPI:
         assert data["downvote_count"] == 1
         assert data["net_votes"] == 0
         assert data["total_votes"] == 2
-    
+
+    def test_get_post_votes_etag(self, db: Session):
+        """Test vote counts revalidate with ETag / If-None-Match"""
+        users = []
+        for i in range(2):
+            user = User(
+                username=f"user{i}",
+                email=f"user{i}@example.com",
+                password_hash="hashedpassword"
+            )
+            users.append(user)
+            db.add(user)
+        db.flush()
+
+        post = Post(
+            title="Test Post",
+            content="Test content",
+            author_id=users[0].id,
+            channel_id=1
+        )
+        db.add(post)
+        db.commit()
+
+        client.put(f"/api/posts/{post.id}/vote", json={"vote_type": "upvote", "user_id": users[0].id})
+        response = client.get(f"/api/posts/{post.id}/votes")
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+
+        # Unchanged counts: nothing to send
+        response = client.get(f"/api/posts/{post.id}/votes", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+
+        # A new vote changes the ETag
+        client.put(f"/api/posts/{post.id}/vote", json={"vote_type": "upvote", "user_id": users[1].id})
+        response = client.get(f"/api/posts/{post.id}/votes", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert response.json()["upvote_count"] == 2
+
     def test_get_user_votes_list(self, db: Session):
         """Test getting list of user's votes"""
         user = User(
@@ -369,7 +369,42 @@ class TestVoteModel:
         assert post.downvote_count == 1
         assert post.net_votes == 2  # 3 - 1
         assert post.total_votes == 4  # 3 + 1
-    
+
+    def test_vote_counts_follow_changes(self, db: Session):
+        """Test vote type changes and deletes keep the denormalized counts in step"""
+        users = []
+        for i in range(3):
+            user = User(
+                username=f"user{i}",
+                email=f"user{i}@example.com",
+                password_hash="hashedpassword"
+            )
+            users.append(user)
+            db.add(user)
+        db.flush()
+
+        post = Post(
+            title="Test Post",
+            content="Test content",
+            author_id=users[0].id,
+            channel_id=1
+        )
+        db.add(post)
+        db.flush()
+
+        flipped = Vote(user_id=users[1].id, post_id=post.id, vote_type="upvote")
+        removed = Vote(user_id=users[2].id, post_id=post.id, vote_type="upvote")
+        db.add_all([flipped, removed])
+        db.commit()
+
+        flipped.vote_type = "downvote"
+        db.delete(removed)
+        db.commit()
+        db.refresh(post)
+
+        assert post.upvote_count == 0
+        assert post.downvote_count == 1
+
     def test_vote_update_changes_timestamp(self, db: Session):
         """Test updating vote changes updated_at timestamp"""
         user = User(